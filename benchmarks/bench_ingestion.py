@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measure ingestion throughput against a local stand-in for the /events/ingest API, without a Log Insight server::
+
+    python benchmarks/bench_ingestion.py --events 20000 --output results.json
+
+For each combination of event text size and field count, reports the cost of serialization (time and memory per
+event), then events per second, events per CPU-second of this process, and p50/p99 request latency for transmit, for
+BatchIngestor at each batch size, for BackgroundIngestor and for syslog over TCP. The stand-in runs in a separate
+process so its work isn't counted. Results are printed as a table, and written as JSON for regression tracking.
+"""
+
+from __future__ import print_function
+
+import argparse
+import gc
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import pytz
+from six.moves import BaseHTTPServer, socketserver
+
+import pyloginsight
+from pyloginsight import jsoncodec
+from pyloginsight.connection import Connection
+from pyloginsight.ingestion import transmit, serialize_event_object, serialize_columns, BatchIngestor, BackgroundIngestor
+from pyloginsight.models import Event
+from pyloginsight.syslog import SyslogSender
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+
+class IngestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Accepts POST /api/v1/events/ingest/<agent id> like the test suite's mock server, over keep-alive HTTP/1.1."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Otherwise the headers and body, written separately, meet delayed ACKs
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        if not self.path.startswith("/api/v1/events/ingest/"):
+            return self._reply(404, {'errorMessage': 'Not found'})
+        events = json.loads(body.decode('utf-8'))['events']
+        self._reply(200, {'ingested': len(events), 'status': 'ok', 'message': 'events ingested'})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandIn(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+def serve_http(ports):
+    server = StandIn(("127.0.0.1", 0), IngestHandler)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def serve_syslog(ports):
+    """Accepts syslog over TCP and discards it."""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(16)
+    ports.put(listener.getsockname()[1])
+    while True:
+        conn, _ = listener.accept()
+        threading.Thread(target=lambda c: [None for _ in iter(lambda: c.recv(1 << 20), b"")], args=(conn,)).start()
+
+
+def start(target):
+    ports = multiprocessing.Queue()
+    process = multiprocessing.Process(target=target, args=(ports,))
+    process.daemon = True
+    process.start()
+    return process, ports.get(timeout=10)
+
+
+def make_events(count, text_bytes, field_count, seed=0):
+    rng = random.Random(seed)
+    words = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet", u"café"]
+    when = datetime(2018, 1, 1, tzinfo=pytz.utc)
+    events = []
+    for n in range(count):
+        text = u" ".join(rng.choice(words) for _ in range(text_bytes // 6 + 1))[:text_bytes]
+        fields = dict(("field_{0}".format(f), "value-{0}".format(rng.randint(0, 1000))) for f in range(field_count))
+        events.append(Event(text=text, fields=fields, timestamp=when))
+    return events
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else None
+
+
+def measure(run, events):
+    """Run `run(events, latencies)`, returning throughput and the latencies it recorded."""
+    latencies = []
+    gc.collect()
+    wall, cpu = time.time(), time.process_time() if hasattr(time, 'process_time') else time.clock()
+    run(events, latencies)
+    wall = time.time() - wall
+    cpu = (time.process_time() if hasattr(time, 'process_time') else time.clock()) - cpu
+    return {
+        'events_per_second': len(events) / wall,
+        'events_per_cpu_second': len(events) / cpu if cpu else None,
+        'latency_p50_ms': percentile(latencies, 0.5) * 1000 if latencies else None,
+        'latency_p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+        'requests': len(latencies),
+    }
+
+
+def bench_serialization(events):
+    started = time.time()
+    for e in events:
+        serialize_event_object(e)
+    per_event = (time.time() - started) / len(events)
+
+    columns = {'text': [e['text'] for e in events], 'timestamp': [e.timestamp for e in events]}
+    for name in events[0].get('fields', {}):
+        columns[name] = [e['fields'][name] for e in events]
+    started = time.time()
+    serialize_columns(columns)
+    per_row = (time.time() - started) / len(events)
+
+    memory = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        serialized = [serialize_event_object(e) for e in events]
+        memory = tracemalloc.get_traced_memory()[0] / float(len(serialized))
+        tracemalloc.stop()
+    return {'serialize_event_us': per_event * 1e6, 'serialize_columns_us': per_row * 1e6, 'serialized_bytes_per_event': memory,
+            'encoded_bytes_per_event': len(jsoncodec.encode(serialize_event_object(events[0])))}
+
+
+def transports(http_port, syslog_port, batch_sizes):
+    def connection():
+        return Connection("127.0.0.1", port=http_port, ssl=False)
+
+    def one_at_a_time(events, latencies):
+        c = connection()
+        for e in events:
+            started = time.time()
+            transmit(c, e)
+            latencies.append(time.time() - started)
+
+    def batched(size):
+        def run(events, latencies):
+            with BatchIngestor(connection(), max_events=size, on_sent=lambda ev, n, seconds: latencies.append(seconds)) as batch:
+                batch.extend(events)
+        return run
+
+    def background(events, latencies):
+        with BackgroundIngestor(connection(), workers=2, max_events=max(batch_sizes)) as ingestor:
+            for e in events:
+                ingestor.log(e)
+        latencies.extend(ingestor._latencies)
+
+    def syslog(events, latencies):
+        with SyslogSender("127.0.0.1", syslog_port) as sender:
+            sender.send_many(events)
+
+    yield "transmit", one_at_a_time
+    for size in batch_sizes:
+        yield "batch-{0}".format(size), batched(size)
+    yield "background", background
+    yield "syslog-tcp", syslog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=5000, help="Events per measurement")
+    parser.add_argument("--transmit-events", type=int, default=500, help="Events for transmit, which sends one per request")
+    parser.add_argument("--batch-sizes", default="10,100,1000", help="Comma-separated BatchIngestor max_events")
+    parser.add_argument("--text-bytes", default="100,1000", help="Comma-separated event text sizes")
+    parser.add_argument("--fields", default="0,5,20", help="Comma-separated field counts")
+    parser.add_argument("--output", help="Write JSON results here rather than to stdout")
+    args = parser.parse_args()
+
+    batch_sizes = [int(n) for n in args.batch_sizes.split(",")]
+    http, http_port = start(serve_http)
+    syslog, syslog_port = start(serve_syslog)
+
+    results = []
+    for text_bytes, field_count in itertools.product([int(n) for n in args.text_bytes.split(",")],
+                                                     [int(n) for n in args.fields.split(",")]):
+        events = make_events(args.events, text_bytes, field_count)
+        serialization = bench_serialization(events)
+        print("text {0:>5} B, {1:>2} fields: serialize {2:6.1f} us/event, columns {3:6.1f} us/row, {4} B/event".format(
+            text_bytes, field_count, serialization['serialize_event_us'], serialization['serialize_columns_us'],
+            int(serialization['serialized_bytes_per_event'] or 0)), file=sys.stderr)
+        for name, run in transports(http_port, syslog_port, batch_sizes):
+            sample = events[:args.transmit_events] if name == "transmit" else events
+            result = measure(run, sample)
+            result.update(serialization, path=name, text_bytes=text_bytes, fields=field_count, events=len(sample))
+            results.append(result)
+            print("    {0:>12}: {1:9.0f} events/s {2:9.0f} events/cpu-s  p50 {3} ms  p99 {4} ms".format(
+                name, result['events_per_second'], result['events_per_cpu_second'] or 0,
+                "{0:.2f}".format(result['latency_p50_ms']) if result['latency_p50_ms'] is not None else "-",
+                "{0:.2f}".format(result['latency_p99_ms']) if result['latency_p99_ms'] is not None else "-"), file=sys.stderr)
+
+    http.terminate()
+    syslog.terminate()
+
+    document = {
+        'benchmark': 'ingestion',
+        'created': datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        'pyloginsight': pyloginsight.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpus': multiprocessing.cpu_count(),
+        'json_backend': jsoncodec.backend,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+        print("Wrote {0} results to {1}".format(len(results), os.path.abspath(args.output)), file=sys.stderr)
+    else:
+        json.dump(document, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the installed JSON codecs on realistic ingestion and query payloads::
+
+    python benchmarks/bench_jsoncodec.py --events 20000
+"""
+
+from __future__ import print_function
+
+import argparse
+import random
+import timeit
+import uuid
+
+from pyloginsight import jsoncodec
+
+
+def make_events(count, seed=0):
+    """A page of events shaped like the server's query responses: a text body, a timestamp and a dozen fields."""
+    rng = random.Random(seed)
+    events = []
+    for n in range(count):
+        fields = [{'name': name, 'content': str(uuid.UUID(int=rng.getrandbits(128)))[:rng.randint(4, 36)]}
+                  for name in ('hostname', 'appname', 'procid', 'msgid', 'facility', 'priority', 'source',
+                               'event_type', 'vmw_cluster', 'vmw_host', 'vmw_datacenter', 'filepath')]
+        text = " ".join(str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(rng.randint(2, 12)))
+        events.append({'text': u"{0} [{1}] café {2}".format(1514764800000 + n, n, text),
+                       'timestamp': 1514764800000 + n, 'fields': fields})
+    return {'complete': True, 'duration': 45, 'events': events}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=5000, help="Events per payload")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs per measurement; the fastest is reported")
+    args = parser.parse_args()
+
+    document = make_events(args.events)
+    encoded = jsoncodec.encode(document)
+    print("Payload: {0} events, {1:.1f} KiB".format(args.events, len(encoded) / 1024.0))
+
+    baseline = None
+    for name, loader in jsoncodec.BACKENDS[::-1]:
+        try:
+            jsoncodec.use(name)
+        except ImportError:
+            print("{0:>8}: not installed".format(name))
+            continue
+        encode = min(timeit.repeat(lambda: jsoncodec.encode(document), number=1, repeat=args.repeat))
+        decode = min(timeit.repeat(lambda: jsoncodec.decode(encoded), number=1, repeat=args.repeat))
+        if baseline is None:
+            baseline = encode, decode
+        print("{0:>8}: encode {1:7.2f} ms ({2:4.1f}x)   decode {3:7.2f} ms ({4:4.1f}x)".format(
+            name, encode * 1000, baseline[0] / encode, decode * 1000, baseline[1] / decode))
+    jsoncodec.use()
+
+
+if __name__ == "__main__":
+    main()
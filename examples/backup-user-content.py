@@ -11,15 +11,19 @@ if __name__ == '__main__':
     parser.add_argument('--password', required=True)
     parser.add_argument('--provider', default='Local')
     parser.add_argument('--hostname', required=True)
-    parser.add_argument('--uuid', required=True)
+    parser.add_argument('--uuid', required=True, nargs='+')
     args = parser.parse_args()
 
     creds = Credentials(username=args.username, password=args.password, provider=args.provider)
     conn = Connection(hostname=args.hostname, auth=creds, verify=False)
 
-    user = conn.get(url='/users/{}'.format(args.uuid))
-    username = user.get('user', {}).get('username', 'unknown')
-    namespace = 'com.{}.{}.{}.{}'.format(args.hostname, args.uuid, username, datetime.now().strftime('%Y.%m.%d.%H.%M'))
-    content = conn.get(url='/content/usercontent/{}'.format(args.uuid), params={'namespace': namespace})
+    def backup(uuid):
+        user = conn.get(url='/users/{}'.format(uuid))
+        username = user.get('user', {}).get('username', 'unknown')
+        namespace = 'com.{}.{}.{}.{}'.format(args.hostname, uuid, username, datetime.now().strftime('%Y.%m.%d.%H.%M'))
+        return conn.get(url='/content/usercontent/{}'.format(uuid), params={'namespace': namespace})
 
-    print(json.dumps(content, indent=4))
+    # Fetch every user's content in parallel
+    for content in conn.map(backup, args.uuid):
+        print(json.dumps(content, indent=4))
+    conn.close()
@@ -45,7 +45,41 @@ class DirectlyAddressableContainerMapping(object):
         return self._single.from_server(self._connection, url)
 
 
-class ServerDictMixin(collections.MutableMapping):
+class ServerDictParserMixin(object):
+    """
+    Turns a collection summary, as returned by the server, into keys and model instances.
+    Holds no I/O, so it's shared by the blocking and the asyncio collections.
+    """
+    _connection = None
+
+    def _items_from(self, data):
+        if not hasattr(self, '_schema'):
+            raise SyntaxWarning("Missing __model__ or @bind_to_model on {}".format(self.__class__))
+        ser = self._schema()
+
+        parse = ser.load(data, many=True, partial=False)
+
+        if parse.errors:
+            for e in parse.errors.items():
+                logger.warning("Parse error when loading items: {}".format(str(e)))
+
+        for item in parse.data:
+            item['_connection'] = self._connection
+            item['_url'] = "{0}/{1}".format(self._baseurl, item['id'])
+            yield (item['id'], item)
+
+    def _keys_from(self, data):
+        ser = self._schema()
+        parse = ser.load(data, many=True, partial=True)
+
+        if parse.errors:
+            for e in parse.errors:
+                logger.warning("Parse error when loading keys: {}".format(str(e)))
+
+        return [item['id'] for item in parse.data]
+
+
+class ServerDictMixin(ServerDictParserMixin, collections.MutableMapping):
     """
     A server-backed dictionary of items.
     Deleting or updating an item usually means DELETE/PUTing a single item's resource.
@@ -77,31 +111,11 @@ class ServerDictMixin(collections.MutableMapping):
         Retrieve full objects directly from the summary view. May be stale, but faster to iterate.
         This is an alternate to using d[k], which invokes __getitem__ to make an HTTP request.
         """
-
-        if not hasattr(self, '_schema'):
-            raise SyntaxWarning("Missing __model__ or @bind_to_model on {}".format(self.__class__))
-        ser = self._schema()
-
-        parse = ser.load(self._iterable, many=True, partial=False)
-
-        if parse.errors:
-            for e in parse.errors.items():
-                logger.warning("Parse error when loading items: {}".format(str(e)))
-
-        for item in parse.data:
-            item['_connection'] = self._connection
-            item['_url'] = "{0}/{1}".format(self._baseurl, item['id'])
-            yield (item['id'], item)
+        for item in self._items_from(self._iterable):
+            yield item
 
     def keys(self):
-        ser = self._schema()
-        parse = ser.load(self._iterable, many=True, partial=True)
-
-        if parse.errors:
-            for e in parse.errors:
-                logger.warning("Parse error when loading keys: {}".format(str(e)))
-
-        return [item['id'] for item in parse.data]
+        return self._keys_from(self._iterable)
 
     def __iter__(self):
         for key in self.keys():
@@ -170,6 +184,12 @@ class AppendableServerDictMixin(object):
         :return uuid: url-fragment identifier for the newly-created server-side object
         """
 
+        ser, body = self._append_body(value)
+        resp = self._connection.post(self._baseurl, json=body)
+        return self._append_id(ser, resp)
+
+    def _append_body(self, value):
+        """Serialize a new item into the request body expected by the collection's POST handler."""
         ser = self._schema()
 
         transmit = ser.dump(value, many=False)
@@ -182,8 +202,10 @@ class AppendableServerDictMixin(object):
             body = ser.__envelope__['append'](body)
         except KeyError:
             pass
-        resp = self._connection.post(self._baseurl, json=body)
+        return ser, body
 
+    def _append_id(self, ser, resp):
+        """Harvest the new item's UUID from the server's response to the POST, if it has one."""
         logger.debug("Server responded with new object {}/{}".format(self._baseurl, resp))
         # new UUID for this object, probably accessible at _baseurl/{id}
 
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Adapt ingestion batch size and concurrency to what the server sustains::
+
+    controller = AIMDController(max_workers=8)
+    ingestor = BackgroundIngestor(connection, controller=controller)
+    ...
+    controller.operating_point()
+
+Like TCP congestion control, the controller grows additively while batches are ingested in full within
+`target_latency`, and shrinks multiplicatively on a sign of overload: a slow or partly ingested batch, a rejection
+with 429, 503 or another overload status, or a timeout or connection failure. A batch rejected as too large, with 413,
+shrinks only the batch size. Batches grow first; once they reach `max_events`, further headroom adds a sender.
+"""
+
+import logging
+import threading
+
+import requests
+
+from .exceptions import IngestionIncomplete
+
+logger = logging.getLogger(__name__)
+
+OVERLOAD_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+def _status(exception):
+    """The HTTP status of an exception raised by interpret_response, or None."""
+    status = exception.args[0] if exception.args else None
+    return status if isinstance(status, int) else None
+
+
+class AIMDController(object):
+    """
+    :param target_latency: Seconds; slower batches count as overload
+    :param increase: Events added to the batch size after each batch within target
+    :param decrease: Factor the batch size and concurrency are multiplied by on overload
+    :param smoothing: Weight of the newest sample in the latency and throughput averages
+    """
+
+    def __init__(self, min_events=10, max_events=5000, initial_events=100, min_workers=1, max_workers=4, initial_workers=1,
+                 target_latency=1.0, increase=50, decrease=0.5, smoothing=0.2):
+        self.min_events = min_events
+        self.max_events = max_events
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self.smoothing = smoothing
+
+        self._batch_size = max(min_events, min(max_events, initial_events))
+        self._concurrency = max(min_workers, min(max_workers, initial_workers))
+        self.latency = None  # Seconds per batch, smoothed
+        self.throughput = None  # Events per second per sender, smoothed
+        self.increases = 0
+        self.decreases = 0
+        # Each sender's events of a batch rejected as too large, whose halves it has still to send
+        self._splitting = threading.local()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    @property
+    def concurrency(self):
+        return self._concurrency
+
+    def _average(self, current, sample):
+        return sample if current is None else current + self.smoothing * (sample - current)
+
+    def _grow(self):
+        if self._batch_size < self.max_events:
+            self._batch_size = min(self.max_events, self._batch_size + self.increase)
+        elif self._concurrency < self.max_workers:
+            self._concurrency += 1
+            self._changed.notify_all()
+        else:
+            return
+        self.increases += 1
+
+    def _shrink(self, batch=True, workers=True, reason=""):
+        before = self._batch_size, self._concurrency
+        if batch:
+            self._batch_size = max(self.min_events, int(self._batch_size * self.decrease))
+        if workers:
+            self._concurrency = max(self.min_workers, int(self._concurrency * self.decrease))
+        self.decreases += 1
+        logger.info("Ingestion backing off ({0}): batch size {1} -> {2}, concurrency {3} -> {4}".format(
+            reason, before[0], self._batch_size, before[1], self._concurrency))
+
+    def _split_half(self, events):
+        """
+        Count a batch of `events` the calling thread sent, whatever the outcome. Returns whether it was part of a batch
+        rejected as too large. A batch's halves are sent by the thread which sent it, so splits are kept per thread.
+        """
+        remaining = getattr(self._splitting, 'events', 0)
+        self._splitting.events = max(0, remaining - events)
+        return remaining > 0
+
+    def record_sent(self, events, ingested, seconds):
+        """Adjust for a batch of `events` the server answered in `seconds`, reporting `ingested` of them."""
+        splitting = self._split_half(events)
+        with self._lock:
+            self.latency = self._average(self.latency, seconds)
+            if seconds > 0:
+                self.throughput = self._average(self.throughput, ingested / float(seconds))
+            if ingested < events:
+                self._shrink(reason="{0} of {1} events ingested".format(ingested, events))
+            elif seconds > self.target_latency:
+                self._shrink(workers=False, reason="batch took {0:.2f}s".format(seconds))
+            elif not splitting:  # The halves of a split batch succeeding doesn't mean the whole would
+                self._grow()
+
+    def record_too_large(self, events):
+        """A batch of `events` was rejected with 413 Request Entity Too Large, and will be sent in halves."""
+        # A half split again is part of the same batch
+        self._splitting.events = max(getattr(self._splitting, 'events', 0), events)
+        with self._lock:
+            self._batch_size = max(self.min_events, min(self._batch_size, events // 2))
+            self.decreases += 1
+
+    def record_failure(self, exception, events=None):
+        """
+        Adjust for a batch of `events` which couldn't be sent. Errors unrelated to load, such as a rejected request, are
+        ignored, but still count towards the halves of a split batch.
+        """
+        if events is None and isinstance(exception, IngestionIncomplete):
+            events = exception.sent
+        self._split_half(events or 0)
+        if isinstance(exception, IngestionIncomplete):
+            with self._lock:
+                self._shrink(reason="{0} of {1} events ingested".format(exception.ingested, exception.sent))
+            return
+        status = _status(exception)
+        if status in OVERLOAD_STATUSES or (status is None and isinstance(exception, requests.RequestException)):
+            with self._lock:
+                self._shrink(reason=status or exception.__class__.__name__)
+
+    def admit(self, index, timeout=None):
+        """Wait until sender `index`, counting from 0, is within the current concurrency. Returns whether it is."""
+        with self._lock:
+            if index >= self._concurrency:
+                self._changed.wait(timeout)
+            return index < self._concurrency
+
+    def operating_point(self):
+        with self._lock:
+            return {
+                'batch_size': self._batch_size,
+                'concurrency': self._concurrency,
+                'latency': self.latency,
+                'throughput': self.throughput * self._concurrency if self.throughput is not None else None,
+                'increases': self.increases,
+                'decreases': self.decreases,
+            }
+
+    def __repr__(self):
+        return '{cls}(batch_size={x.batch_size!r}, concurrency={x.concurrency!r})'.format(cls=self.__class__.__name__, x=self)
@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+asyncio transport for the Log Insight API, built on aiohttp.
+
+Mirrors :py:class:`pyloginsight.connection.Connection` and the collection classes in
+:py:mod:`pyloginsight.models`, but every method that talks to the server is a coroutine.
+A single event loop can keep many requests in flight at once::
+
+    async with AsyncConnection("loginsight.example.com", auth=AsyncCredentials("admin", "secret", "Local")) as c:
+        users, roles = await asyncio.gather(c.server.users.items(), c.server.roles.items())
+
+Requires Python 3.5+ and ``aiohttp`` (``pip install pyloginsight[aio]``).
+"""
+
+import asyncio
+import logging
+
+import aiohttp
+
+from . import jsoncodec
+from .abstracts import ServerDictParserMixin, AppendableServerDictMixin
+from .connection import APIV1, default_user_agent, interpret_response
+from .exceptions import ResourceNotFound, Unauthorized, NotBootstrapped, ServerError
+from .ingestion import serialize_event_object
+from .models import HostPagesMixin, Users, Roles, Datasets, Version, EventSchema
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCredentials(object):
+    """
+    Username, password and provider, exchanged for a session bearer token on demand.
+    Counterpart of :py:class:`pyloginsight.connection.Credentials` for an :py:class:`AsyncConnection`.
+    Concurrent requests that are rejected with the same stale token share a single login.
+    """
+
+    def __init__(self, username, password, provider, sessionId=None):
+        """If passed an existing sessionId, try to use it."""
+        self.username = username
+        self.password = password
+        self.provider = provider
+        self.sessionId = sessionId  # An existing session id, like "hNhXgAM1xrl..."
+        self._lock = None
+
+    @property
+    def headers(self):
+        if self.sessionId:
+            return {"Authorization": "Bearer %s" % self.sessionId}
+        return {}
+
+    async def get_session(self, connection):
+        """Perform a session login and return a new session ID."""
+        if self.username is None or self.password is None:
+            raise Unauthorized("Cannot authenticate without username/password")
+        logger.info("Attempting to authenticate as {0}".format(self.username))
+        authdict = {"username": self.username, "password": self.password, "provider": self.provider}
+
+        status, headers, payload = await connection._request("POST", "/sessions", json=authdict)
+        try:
+            return payload['sessionId']
+        except (TypeError, KeyError):
+            if status == 503 and 'should be bootstrapped' in payload.get('errorMessage', ''):
+                raise NotBootstrapped(payload.get('errorMessage'), payload)
+            raise Unauthorized("Authentication failed", payload)
+
+    async def handle_401(self, connection, rejected_session_id):
+        """
+        Obtain a new session after the server rejected `rejected_session_id`.
+        If another task already replaced that session while we waited for the lock, reuse its result.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.sessionId is None or self.sessionId == rejected_session_id:
+                logger.debug("Not authenticated (session {0!r} rejected)".format(rejected_session_id))
+                self.sessionId = await self.get_session(connection)
+        return self.headers
+
+    def __repr__(self):
+        return '{cls}(username={x.username!r}, password=..., provider={x.provider!r})'.format(cls=self.__class__.__name__, x=self)
+
+
+class AsyncConnection(object):
+    """
+    Low-level asyncio HTTP transport connecting to a remote Log Insight server's API.
+    Attempts requests to the server which require authentication. If requests fail with HTTP 401 Unauthorized,
+    obtains a session bearer token and retries the request.
+    You should probably use the :py:class:: AsyncServer class instead"""
+
+    def __init__(self, hostname, port=9543, ssl=True, verify=True, auth=None, existing_session=None):
+        self._clientsession = existing_session
+        self._hostname = hostname
+        self._port = port
+        self._ssl = ssl
+        self._verify = verify
+        self._authprovider = auth
+
+        self._apiroot = '{method}://{hostname}:{port}{apiv1}'.format(method='https' if ssl else 'http',
+                                                                     hostname=hostname, port=port, apiv1=APIV1)
+        logger.debug("Connected to {0}".format(self))
+
+    @property
+    def _session(self):
+        # aiohttp sessions belong to the event loop they're created on, so defer creation until the first request.
+        if self._clientsession is None:
+            self._clientsession = aiohttp.ClientSession(headers={'User-Agent': default_user_agent()}, json_serialize=jsoncodec.dumps)
+        return self._clientsession
+
+    async def close(self):
+        if self._clientsession is not None:
+            await self._clientsession.close()
+            self._clientsession = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        await self.close()
+
+    async def _request(self, method, url, data=None, json=None, params=None, headers=None):
+        """Perform a single HTTP request, returning a tuple of (status, headers, payload)."""
+        async with self._session.request(method,
+                                         "%s%s" % (self._apiroot, url),
+                                         data=data,
+                                         json=json,
+                                         params=params,
+                                         headers=headers,
+                                         ssl=None if self._verify else False) as r:
+            body = await r.read()
+            try:
+                payload = jsoncodec.decode(body)
+            except ValueError:
+                payload = body.decode("utf-8", "replace")
+            return r.status, r.headers, payload
+
+    async def _call(self, method, url, data=None, json=None, params=None, sendauthorization=True):
+        logger.debug("{} {} data={} json={} params={}".format(method, url, data, json, params))
+
+        auth = self._authprovider if sendauthorization else None
+        headers = auth.headers if auth else None
+        status, response_headers, payload = await self._request(method, url, data=data, json=json, params=params, headers=headers)
+
+        if auth and status in [401, 440]:
+            rejected = headers.get("Authorization", "")[7:] or None
+            headers = await auth.handle_401(self, rejected)
+            status, response_headers, payload = await self._request(method, url, data=data, json=json, params=params, headers=headers)
+            if status in [401, 440]:
+                raise Unauthorized("Authentication failed", payload)
+            logger.debug("Authenticated successfully.")
+
+        return interpret_response(method, url, status, response_headers, payload)
+
+    async def post(self, url, data=None, json=None, params=None, sendauthorization=True):
+        """
+        Attempt to post to server with current authorization credentials.
+        If post fails with HTTP 401 Unauthorized, authenticate and retry.
+        """
+        return await self._call(method="POST", url=url, data=data, json=json, sendauthorization=sendauthorization, params=params)
+
+    async def get(self, url, params=None, sendauthorization=True):
+        return await self._call(method="GET", url=url, sendauthorization=sendauthorization, params=params)
+
+    async def delete(self, url, params=None, sendauthorization=True):
+        return await self._call(method="DELETE", url=url, sendauthorization=sendauthorization, params=params)
+
+    async def put(self, url, data=None, json=None, params=None, sendauthorization=True):
+        """Attempt to put to server with current authorization credentials. If put fails with HTTP 401 Unauthorized, retry."""
+        return await self._call(method="PUT", url=url, data=data, json=json, sendauthorization=sendauthorization, params=params)
+
+    async def patch(self, url, data=None, json=None, params=None, sendauthorization=True):
+        """Attempt to patch server with current authorization credentials. If patch fails with HTTP 401 Unauthorized, retry."""
+        return await self._call(method="PATCH", url=url, data=data, json=json, sendauthorization=sendauthorization, params=params)
+
+    def __repr__(self):
+        """Human-readable and machine-executable description of the current connection."""
+        return '{cls}(hostname={x._hostname!r}, port={x._port!r}, ssl={x._ssl!r}, verify={x._verify!r}, auth={x._authprovider!r})'.format(cls=self.__class__.__name__, x=self)
+
+    @property
+    def server(self):
+        return AsyncServer(self)
+
+
+class AsyncServerDictMixin(AppendableServerDictMixin, ServerDictParserMixin):
+    """
+    Awaitable counterpart of a server-backed dictionary, like :py:class:`pyloginsight.models.Users`.
+    Python has no asynchronous Mapping protocol, so the mapping operations are spelled as coroutine methods.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    async def asdict(self):
+        """GET against the collection's base url, producing a collection-specific summary."""
+        return await self._connection.get(self._baseurl)
+
+    async def items(self):
+        """Retrieve a list of (key, object) pairs from the summary view with one request."""
+        return list(self._items_from(await self.asdict()))
+
+    async def keys(self):
+        return self._keys_from(await self.asdict())
+
+    async def length(self):
+        return len((await self.asdict())[self._schema.__envelope__['many']])
+
+    async def get(self, item):
+        """Retrieve details for a single item from its own url. Could raise KeyError."""
+        url = "{0}/{1}".format(self._baseurl, item)
+        try:
+            body = await self._connection.get(url)
+        except ResourceNotFound:
+            raise KeyError(url)
+        return self._single.from_dict(self._connection, url, body)
+
+    async def contains(self, item):
+        try:
+            await self._connection.get("{0}/{1}".format(self._baseurl, item))
+        except ResourceNotFound:
+            return False
+        return True
+
+    async def delete(self, item):
+        try:
+            await self._connection.delete("{0}/{1}".format(self._baseurl, item))
+        except ResourceNotFound:
+            raise KeyError(item)
+        return True
+
+    async def append(self, value):
+        """Add a new item to the server-backed collection, returning its new UUID if the server provides one."""
+        ser, body = self._append_body(value)
+        resp = await self._connection.post(self._baseurl, json=body)
+        return self._append_id(ser, resp)
+
+
+class AsyncUsers(AsyncServerDictMixin):
+    _baseurl = Users._baseurl
+    _single = Users._single
+    _schema = Users._schema
+
+
+class AsyncRoles(AsyncServerDictMixin):
+    _baseurl = Roles._baseurl
+    _single = Roles._single
+    _schema = Roles._schema
+
+
+class AsyncDatasets(AsyncServerDictMixin):
+    _baseurl = Datasets._baseurl
+    _single = Datasets._single
+    _schema = Datasets._schema
+
+
+class AsyncHosts(HostPagesMixin):
+    """
+    Awaitable counterpart of :py:class:`pyloginsight.models.Hosts`.
+    The first page of each host list reports the total count, so the remaining pages are requested concurrently.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    async def _fetch(self, mode, sort_order):
+        first = await self._connection.post(self._baseurl, json=self._page(mode, 1, sort_order))
+        pages = await asyncio.gather(*[self._connection.post(self._baseurl, json=self._page(mode, hosts_from, sort_order))
+                                       for hosts_from in range(1 + self._page_size, first['count'], self._page_size)])
+        hosts = list(first['hosts'])
+        for page in pages:
+            hosts += page['hosts']
+        return hosts
+
+    async def list(self, sort_order='desc'):
+        """All hosts, sorted by their lastReceived property."""
+        assert sort_order in ['desc', 'asc']
+        hosts = []
+        for page in await asyncio.gather(self._fetch(True, sort_order), self._fetch(False, sort_order)):
+            hosts += page
+        return list(self._inflate(hosts, sort_order))
+
+    async def length(self):
+        counts = await asyncio.gather(*[self._connection.post(self._baseurl, json={'loadMissingHosts': mode}) for mode in [True, False]])
+        return sum(int(c['count']) for c in counts)
+
+
+class AsyncServer(object):
+    """Awaitable counterpart of :py:class:`pyloginsight.models.Server`."""
+    _connection = None
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    async def version(self):
+        return Version.from_dict(self._connection, "/version", await self._connection.get("/version"))
+
+    async def current_session(self):
+        return await self._connection.get("/sessions/current")
+
+    @property
+    def roles(self):
+        return AsyncRoles(self._connection)
+
+    @property
+    def users(self):
+        return AsyncUsers(self._connection)
+
+    @property
+    def datasets(self):
+        return AsyncDatasets(self._connection)
+
+    @property
+    def hosts(self):
+        return AsyncHosts(self._connection)
+
+    async def events(self, constraints=(), parameters=None):
+        url = "".join([str(c) for c in constraints])
+        result = await self._connection.get("/events" + url, params=parameters or {})
+        ser = EventSchema()
+        parse = ser.load(result, many=True, partial=False)
+        return parse.data
+
+    async def log(self, event, agent_id="1", trusted=False):
+        e = serialize_event_object(event)
+        r = await self._connection.post("/events/ingest/" + agent_id, json={"events": [e]}, sendauthorization=trusted)
+        if r.get("status", None) == 'ok':
+            return r.get("ingested", 0)
+        raise ServerError(r)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+An in-memory HTTP cache for API resources which rarely change::
+
+    c = Connection("loginsight", auth=Credentials(...), cache=ResponseCache())
+
+GET responses are kept for as long as the server's Cache-Control allows, or otherwise for the TTL configured for the
+endpoint. Once stale, a response carrying an ETag or Last-Modified validator is revalidated with a conditional GET, so
+an unchanged resource costs a 304 rather than its whole body. Any other request to a resource invalidates everything
+cached under its first path segment, so a POST to ``/users`` forgets ``/users`` and ``/users/{id}``.
+"""
+
+import collections
+import logging
+import re
+import threading
+import time
+import zlib
+
+from six.moves.urllib.parse import urlencode
+
+logger = logging.getLogger(__name__)
+
+# Seconds for which responses are considered fresh, by path prefix, when the server doesn't say.
+DEFAULT_TTLS = {
+    '/users': 60,
+    '/groups': 60,
+    '/roles': 60,
+    '/datasets': 60,
+    '/licenses': 300,
+    '/version': 3600,
+    '/auth-providers': 3600,
+}
+
+_MAX_AGE = re.compile(r'max-age\s*=\s*(\d+)')
+
+
+class CachedResponse(object):
+    """A stored response body, compressed, with its validators and freshness lifetime."""
+    __slots__ = ('body', 'etag', 'last_modified', 'fresh_until')
+
+    def __init__(self, body, etag, last_modified, fresh_until):
+        self.body = zlib.compress(body)
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh_until = fresh_until
+
+    @property
+    def content(self):
+        return zlib.decompress(self.body)
+
+    @property
+    def fresh(self):
+        return time.time() < self.fresh_until
+
+    @property
+    def validators(self):
+        """Request headers to revalidate this response with a conditional GET."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+def resource_prefix(path):
+    """The first segment of a path, under which writes invalidate cached responses."""
+    return "/" + path.lstrip("/").split("/", 1)[0]
+
+
+class ResponseCache(object):
+    """
+    Cache of GET responses for a single connection, keyed by path and query parameters.
+
+    :param ttls: Freshness lifetime in seconds by path prefix, for responses without Cache-Control. The longest matching
+    prefix wins. Paths which match no prefix are only cached if the server sends Cache-Control or validators.
+    :param max_entries: Least recently used responses are evicted beyond this many
+    """
+
+    def __init__(self, ttls=None, max_entries=1024):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url, params=None):
+        if not params:
+            return url
+        return url + "?" + urlencode(sorted(params.items()))
+
+    def ttl(self, url):
+        matches = [prefix for prefix in self.ttls if url == prefix or url.startswith(prefix.rstrip("/") + "/")]
+        return self.ttls[max(matches, key=len)] if matches else None
+
+    def get(self, key):
+        """The CachedResponse for `key`, fresh or stale, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.pop(key)
+                self._entries[key] = entry  # Most recently used
+            return entry
+
+    def store(self, key, url, headers, body):
+        """Keep a 200 response, if its headers and the TTLs allow. Returns the CachedResponse, or None."""
+        cache_control = headers.get('Cache-Control', '').lower()
+        if 'no-store' in cache_control:
+            return None
+        etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+
+        match = _MAX_AGE.search(cache_control)
+        if 'no-cache' in cache_control:
+            lifetime = 0
+        elif match:
+            lifetime = int(match.group(1))
+        else:
+            lifetime = self.ttl(url)
+        if lifetime is None:
+            if not (etag or last_modified):
+                return None
+            lifetime = 0
+        if lifetime == 0 and not (etag or last_modified):
+            return None
+
+        entry = CachedResponse(body, etag, last_modified, time.time() + lifetime)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def refresh(self, entry, url, headers):
+        """Extend the lifetime of a response the server confirmed is unchanged with 304 Not Modified."""
+        match = _MAX_AGE.search(headers.get('Cache-Control', '').lower())
+        entry.fresh_until = time.time() + (int(match.group(1)) if match else (self.ttl(url) or 0))
+
+    def invalidate(self, url):
+        """Forget every response under the resource prefix of `url`."""
+        prefix = resource_prefix(url)
+        with self._lock:
+            stale = [k for k in self._entries if k == prefix or k.startswith(prefix + "/") or k.startswith(prefix + "?")]
+            for k in stale:
+                del self._entries[k]
+        if stale:
+            logger.debug("Invalidated {0} cached responses under {1}".format(len(stale), prefix))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return '{cls}(max_entries={x.max_entries!r})'.format(cls=self.__class__.__name__, x=self)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Record a connection's traffic to a cassette file, and replay it later without a server::
+
+    with recording(connection, "job.cassette"):
+        run_job(connection)
+
+    connection = Connection("anywhere", auth=Credentials(...))
+    replay(connection, "job.cassette")           # As fast as possible
+    replay(connection, "job.cassette", speed=1)  # With the recorded latency
+    run_job(connection)
+
+Cassettes are gzip-compressed JSON lines, holding the status, headers, body and latency of each response. They hold no
+request headers or bodies, so no credentials, but they do contain whatever the server returned, including session ids.
+Responses are matched to requests by method and path, ignoring the hostname; requests repeated with the same method and
+path are answered in the order they were recorded, and the last response is repeated once they run out.
+
+The adapters mount on the connection's `requests.Session` in the same way as the test suite's mock server.
+"""
+
+import base64
+import collections
+import gzip
+import io
+import json
+import logging
+import threading
+import time
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.response import HTTPResponse
+
+from .exceptions import NotRecorded
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# Describe the transport, not the recorded body, which is stored decoded.
+_TRANSPORT_HEADERS = frozenset(['content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'])
+
+
+class Cassette(object):
+    """An ordered collection of recorded responses, saved to and loaded from `path`."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def append(self, method, path_url, response, elapsed):
+        """Record a requests.Response to `method` `path_url`, which took `elapsed` seconds."""
+        body = response.content
+        try:
+            text, binary = body.decode("utf-8"), False
+        except UnicodeDecodeError:
+            text, binary = base64.b64encode(body).decode("ascii"), True
+        entry = {
+            'method': method,
+            'url': path_url,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': dict((k, v) for k, v in response.headers.items() if k.lower() not in _TRANSPORT_HEADERS),
+            'body': text,
+            'base64': binary,
+            'elapsed': round(elapsed, 6),
+        }
+        with self._lock:
+            self.entries.append(entry)
+
+    def save(self):
+        with self._lock:
+            entries = list(self.entries)
+        with gzip.open(self.path, "wb") as f:
+            f.write(json.dumps({'version': FORMAT_VERSION}).encode("utf-8") + b"\n")
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(',', ':')).encode("utf-8") + b"\n")
+        logger.info("Saved {0} responses to {1}".format(len(entries), self.path))
+
+    def load(self):
+        with gzip.open(self.path, "rb") as f:
+            lines = f.read().decode("utf-8").splitlines()
+        header = json.loads(lines[0])
+        if header.get('version') != FORMAT_VERSION:
+            raise ValueError("{0} is a version {1} cassette; expected version {2}".format(self.path, header.get('version'), FORMAT_VERSION))
+        with self._lock:
+            self.entries = [json.loads(line) for line in lines[1:] if line]
+        return self
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return '{cls}(path={x.path!r})'.format(cls=self.__class__.__name__, x=self)
+
+
+class RecordingAdapter(BaseAdapter):
+    """Passes requests through to another transport adapter, recording each response in a cassette."""
+
+    def __init__(self, adapter, cassette):
+        super(RecordingAdapter, self).__init__()
+        self.adapter = adapter
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        started = time.time()
+        response = self.adapter.send(request, **kwargs)
+        self.cassette.append(request.method, request.path_url, response, time.time() - started)
+        response.connection = self  # Requests re-sent by response hooks, like a login, are recorded too
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Answers requests from a cassette instead of the network.
+
+    :param speed: None to answer immediately, or a multiple of the recorded speed, e.g. 1 to reproduce the latency
+    as recorded or 2 to halve it
+    """
+
+    def __init__(self, cassette, speed=None):
+        super(ReplayAdapter, self).__init__()
+        self.cassette = cassette
+        self.speed = speed
+        self._responses = collections.defaultdict(collections.deque)
+        for entry in cassette.entries:
+            self._responses[(entry['method'], entry['url'])].append(entry)
+        self._builder = HTTPAdapter()
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        key = (request.method, request.path_url)
+        with self._lock:
+            queue = self._responses.get(key)
+            if not queue:
+                raise NotRecorded("No response was recorded for {0} {1}".format(*key), request=request)
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+
+        if self.speed:
+            time.sleep(entry['elapsed'] / self.speed)
+
+        body = base64.b64decode(entry['body']) if entry['base64'] else entry['body'].encode("utf-8")
+        headers = CaseInsensitiveDict(entry['headers'])
+        headers['Content-Length'] = str(len(body))
+        raw = HTTPResponse(body=io.BytesIO(body), headers=headers, status=entry['status'], reason=entry['reason'],
+                           preload_content=False, decode_content=False)
+        response = self._builder.build_response(request, raw)
+        response.connection = self
+        return response
+
+    def close(self):
+        self._builder.close()
+
+
+class recording(object):
+    """
+    Context manager which records every response `connection` receives, and saves them to the cassette file `path`
+    on exit.
+    """
+
+    def __init__(self, connection, path):
+        self.session = connection._requestsession
+        self.cassette = Cassette(path)
+        self._original = None
+
+    def __enter__(self):
+        self._original = dict(self.session.adapters)
+        for prefix, adapter in self._original.items():
+            self.session.mount(prefix, RecordingAdapter(adapter, self.cassette))
+        return self.cassette
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for prefix, adapter in self._original.items():
+            self.session.mount(prefix, adapter)
+        self.cassette.save()
+
+
+def replay(connection, path, speed=None):
+    """Answer every request `connection` makes from the cassette file `path`. Returns the ReplayAdapter."""
+    adapter = ReplayAdapter(Cassette(path).load(), speed=speed)
+    for prefix in set(connection._requestsession.adapters) | set(['https://', 'http://']):
+        connection._requestsession.mount(prefix, adapter)
+    return adapter
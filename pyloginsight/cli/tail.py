@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+li-tail: follow log files and ship them to a Log Insight server.
+
+    li-tail --server loginsight.example.com --checkpoint /var/lib/li-tail.json \\
+        --field appname=myapp --multiline '^\\d{4}-' /var/log/myapp/*.log
+"""
+
+import argparse
+import glob
+import logging
+import sys
+
+from ..connection import Connection
+from ..tail import TailAgent
+
+
+def field(value):
+    name, sep, content = value.partition("=")
+    if not sep or not name:
+        raise argparse.ArgumentTypeError("Fields are name=value, not {0!r}".format(value))
+    return name, content
+
+
+def parser():
+    p = argparse.ArgumentParser(prog="li-tail", description="Follow log files and ship new lines to Log Insight.")
+    p.add_argument("paths", nargs="+", help="Files to follow; shell-style wildcards are expanded once, at startup")
+    p.add_argument("--server", required=True)
+    p.add_argument("--port", type=int, default=9543)
+    p.add_argument("--insecure", action="store_true", help="Don't verify the server's certificate")
+    p.add_argument("--agent-id", default="1", help="Agent UUID to ingest as")
+    p.add_argument("--checkpoint", help="File to record offsets in, so a restart resumes where it stopped")
+    p.add_argument("--field", type=field, action="append", default=[], help="name=value added to every event")
+    p.add_argument("--multiline", help="Regex matching the first line of each record")
+    p.add_argument("--from-end", action="store_true", help="Start files without a checkpoint at their end")
+    p.add_argument("--interval", type=float, default=1.0, help="Seconds between polls when files are idle")
+    p.add_argument("--max-events", type=int, default=1000, help="Events per ingestion request")
+    p.add_argument("--once", action="store_true", help="Ship what is there now, then exit")
+    p.add_argument("-v", "--verbose", action="store_true")
+    return p
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format=u'%(asctime)s %(name)s %(levelname)s: %(message)s', stream=sys.stderr)
+
+    paths = []
+    for pattern in args.paths:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])  # A file which doesn't exist yet is followed once it does
+
+    connection = Connection(args.server, port=args.port, verify=not args.insecure)
+    agent = TailAgent(connection, paths, checkpoint=args.checkpoint, fields=dict(args.field), multiline=args.multiline,
+                      from_end=args.from_end, agent_id=args.agent_id, max_events=args.max_events)
+    if args.once:
+        while agent.poll():
+            pass
+        agent.close()
+        return
+    try:
+        agent.run(interval=args.interval)
+    except KeyboardInterrupt:
+        agent.close()
+
+
+if __name__ == '__main__':
+    main()
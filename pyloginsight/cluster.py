@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Spread API requests across the nodes of a Log Insight cluster::
+
+    c = ClusterConnection(["li-node1", "li-node2", "li-node3"], auth=Credentials("admin", "secret", "Local"))
+    c.server.events(...)
+
+A :py:class:`ClusterConnection` can be used anywhere a :py:class:`pyloginsight.connection.Connection` is accepted.
+Session tokens are valid cluster-wide, so one :py:class:`pyloginsight.connection.Credentials` serves every node.
+"""
+
+import itertools
+import logging
+import threading
+import time
+
+import requests
+import six
+
+from . import deadline
+from .connection import Connection, APIV1
+from .retry import IDEMPOTENT_METHODS
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = "round-robin"
+LEAST_OUTSTANDING = "least-outstanding"
+
+
+class ClusterNode(object):
+    """Health and load bookkeeping for a single node of a cluster."""
+
+    def __init__(self, hostname, apiroot):
+        self.hostname = hostname
+        self.apiroot = apiroot
+        self.outstanding = 0  # Requests currently in flight
+        self.failures = 0  # Consecutive failed requests
+        self.ejected_until = None  # Unix time after which an ejected node is probed again
+        self.probing = False
+
+    @property
+    def healthy(self):
+        return self.ejected_until is None
+
+    def __repr__(self):
+        return '{cls}(hostname={x.hostname!r}, healthy={x.healthy!r}, outstanding={x.outstanding!r}, failures={x.failures!r})'.format(
+            cls=self.__class__.__name__, x=self)
+
+
+class ClusterConnection(Connection):
+    """
+    Low-level HTTP transport to the API of every node in a Log Insight cluster.
+
+    Each request goes to one node, chosen by `strategy`: ROUND_ROBIN, or LEAST_OUTSTANDING to prefer the node with
+    the fewest requests in flight. A node is ejected after a connection error or timeout, or after `eject_after` consecutive 5xx
+    responses. After `eject_for` seconds it's probed with GET /version, allowing it `probe_timeout` seconds, and readmitted
+    if it answers. Idempotent requests which fail to connect or time out are sent to the next node, with whatever remains
+    of the deadline, if any. A timeout cut short by the deadline says nothing about the node, so doesn't eject it.
+
+    Other keyword arguments, such as `retry` and `max_per_host`, are handled as by Connection. `max_per_host` applies to
+    each node separately.
+    """
+
+    def __init__(self, hostnames, port=9543, ssl=True, verify=True, auth=None, existing_session=None,
+                 strategy=ROUND_ROBIN, eject_after=3, eject_for=30, probe_timeout=5, **kwargs):
+        if isinstance(hostnames, six.string_types):
+            hostnames = [hostnames]
+        if not hostnames:
+            raise ValueError("A cluster needs at least one node")
+        if strategy not in (ROUND_ROBIN, LEAST_OUTSTANDING):
+            raise ValueError("Unknown load-balancing strategy {0!r}".format(strategy))
+
+        self.nodes = [ClusterNode(h, '{method}://{hostname}:{port}{apiv1}'.format(method='https' if ssl else 'http',
+                                                                                  hostname=h, port=port, apiv1=APIV1))
+                      for h in hostnames]
+        self.strategy = strategy
+        self.eject_after = eject_after
+        self.eject_for = eject_for
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._rotation = itertools.count()
+
+        super(ClusterConnection, self).__init__(hostnames[0], port=port, ssl=ssl, verify=verify, auth=auth, existing_session=existing_session, **kwargs)
+
+    def _send(self, method, url, apiroot=None, **kwargs):
+        if apiroot is not None:
+            return super(ClusterConnection, self)._send(method, url, apiroot=apiroot, **kwargs)
+
+        tried = []
+        while True:
+            node = self._select(exclude=tried)
+            failed, eject = None, False  # No verdict on the node's health unless it answers, fails or hangs
+            try:
+                r = super(ClusterConnection, self)._send(method, url, apiroot=node.apiroot, **kwargs)
+                failed = r.status_code >= 500
+                return r
+            except (requests.ConnectionError, requests.Timeout):
+                expires = kwargs.get('expires')
+                if expires is not None and deadline.remaining(expires) <= 0:
+                    raise  # The timeout was cut short to fit the deadline, and there's no time left for another node
+                failed, eject = True, True
+                tried.append(node)
+                # A request which failed may be sent to another node, if repeating it would be harmless.
+                if method.upper() in IDEMPOTENT_METHODS and len(tried) < len(self.nodes):
+                    logger.warning("Request to {0} failed, retrying {1} {2} on another node".format(node.hostname, method, url))
+                    continue
+                raise
+            finally:
+                self._release(node, failed, eject)
+
+    def _select(self, exclude=()):
+        """Choose a node for the next request and count it as outstanding."""
+        now = time.time()
+        with self._lock:
+            candidates = [n for n in self.nodes if n not in exclude]
+            due = [n for n in candidates if not n.healthy and not n.probing and n.ejected_until <= now]
+            for node in due:
+                node.probing = True
+
+        for node in due:
+            self._probe(node)
+
+        with self._lock:
+            healthy = [n for n in candidates if n.healthy]
+            start = next(self._rotation)
+            if not healthy:
+                # Every node is ejected. Rather than failing outright, try the one which is due back soonest.
+                node = min(candidates, key=lambda n: n.ejected_until)
+            elif self.strategy == LEAST_OUTSTANDING:
+                node = min(healthy, key=lambda n: (n.outstanding, (self.nodes.index(n) - start) % len(self.nodes)))
+            else:
+                node = healthy[start % len(healthy)]
+            node.outstanding += 1
+            return node
+
+    def _release(self, node, failed, eject=False):
+        """Count a request to `node` as finished. `failed` is None for an error which says nothing about the node."""
+        with self._lock:
+            node.outstanding -= 1
+            if failed is None:
+                return
+            if not failed:
+                node.failures = 0
+                return
+            node.failures += 1
+            if (eject or node.failures >= self.eject_after) and node.healthy:
+                logger.warning("Ejecting cluster node {0} for {1} seconds after {2} failure(s)".format(node.hostname, self.eject_for, node.failures))
+                node.ejected_until = time.time() + self.eject_for
+
+    def _probe(self, node):
+        """Check whether an ejected node is answering requests again."""
+        try:
+            r = super(ClusterConnection, self)._send("GET", "/version", sendauthorization=False, apiroot=node.apiroot,
+                                                     timeout=self.probe_timeout)
+            r.close()
+            ok = r.status_code < 500
+        except requests.RequestException:
+            ok = False
+
+        with self._lock:
+            node.probing = False
+            if ok:
+                logger.info("Readmitting cluster node {0}".format(node.hostname))
+                node.ejected_until = None
+                node.failures = 0
+            else:
+                node.ejected_until = time.time() + self.eject_for
+
+    def __repr__(self):
+        """Human-readable and machine-executable description of the current connection."""
+        return '{cls}(hostnames={hostnames!r}, port={x._port!r}, ssl={x._ssl!r}, verify={x._verify!r}, auth={x._authprovider!r}, strategy={x.strategy!r})'.format(
+            cls=self.__class__.__name__, hostnames=[n.hostname for n in self.nodes], x=self)
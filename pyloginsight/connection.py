@@ -20,9 +20,19 @@ from requests.compat import urlunparse, urlparse
 from . import __version__ as version
 
 import requests
+import contextlib
 import logging
+import re
+import threading
+import time
 import warnings
-from .exceptions import ResourceNotFound, TransportError, Unauthorized, ServerWarning, NotBootstrapped, AlreadyBootstrapped
+import zlib
+import six
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .exceptions import ResourceNotFound, TransportError, Unauthorized, ServerWarning, NotBootstrapped, AlreadyBootstrapped, DeadlineExceeded
+from . import deadline
+from .streaming import iter_json_array
+from . import jsoncodec
 
 from .models import Server
 
@@ -30,30 +40,149 @@ logger = logging.getLogger(__name__)
 APIV1 = '/api/v1'
 
 
+# Seconds to wait for a connection to be established, and then between bytes of the response.
+DEFAULT_TIMEOUT = (10, 120)
+
+
 def default_user_agent():
     return "pyloginsight/{0}".format(version)
 
 
+_IDENTIFIER_SEGMENT = re.compile(r'^(?:[0-9a-fA-F]+-[0-9a-fA-F-]+|\d+)$')
+
+
+def endpoint_template(url):
+    """
+    Reduce a request path to the API endpoint it addresses, so requests can be grouped per endpoint.
+    Object identifiers and query constraints are replaced with placeholders, so `/users/<uuid>` is a single endpoint.
+    """
+    path = urlparse(url).path
+    if path.startswith("/events/ingest/"):
+        return "/events/ingest/{id}"
+    for base in ("/events/", "/aggregated-events/"):
+        if path.startswith(base):
+            return base + "{constraints}"
+    return "/".join("{id}" if _IDENTIFIER_SEGMENT.match(segment) else segment for segment in path.split("/"))
+
+
+def gzip_compress(data, level=6):
+    """Compress bytes into a gzip stream, as sent with Content-Encoding: gzip."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decode_payload(content, text=None):
+    """
+    A response body parsed as JSON, or as text if it isn't JSON.
+    :param text: Called for the body as text, such as a requests.Response's `text`, only if it isn't JSON; decoding it
+    can be costly, as requests may first have to guess the encoding
+    """
+    try:
+        return jsoncodec.decode(content)
+    except:
+        return content.decode("utf-8", "replace") if text is None else text()
+
+
+def interpret_response(method, url, status_code, headers, payload):
+    """
+    Map a server response onto a return value or an exception.
+    Shared by every transport, so they all surface warnings and errors the same way.
+    :param payload: The decoded response body; a dict or list for JSON responses, otherwise text.
+    """
+    if 'Warning' in headers:
+        if 'VMware-LI-API-Status' in headers:
+            warnings.warn("Log Insight API resource {} {} is {}".format(method, url, headers['VMware-LI-API-Status']),
+                          ServerWarning,
+                          stacklevel=6)
+        else:
+            warnings.warn(headers.get('Warning'))
+
+    if status_code in [401, 440]:
+        raise Unauthorized(status_code, payload)
+    if status_code in [404]:
+        raise ResourceNotFound(status_code, payload)
+
+    """
+    if status_code in [200, 201]:
+        try:
+            if payload.keys() == ['id']:  # if there is only one key in the response, and it's "id", return it
+                return payload['id']
+        except (KeyError, AttributeError):
+            return True
+    """
+
+    logger.debug("{} {}: status_code[{}]: {}".format(method, url, status_code, payload))
+
+    # Success
+    if 200 <= status_code < 300:
+        return payload
+
+    # Failure. We're going to throw an exception. Try to harvest an errorMessage from the response.
+
+    try:
+        error_message = payload['errorMessage']
+    except (TypeError, KeyError):
+        error_message = None
+    try:
+        error_message = payload['errorDetails']
+    except (TypeError, KeyError):
+        error_message = None
+
+    if status_code == 418:
+        raise NotImplementedError("{} {}: {}".format(method, url, payload))
+
+    if error_message:
+        raise ValueError(status_code, error_message)
+    else:
+        raise TransportError(status_code, payload)
+
+
 class Credentials(requests.auth.AuthBase):
     """An authorization header, with bearer token, is included in each HTTP request.
-    Based on http://docs.python-requests.org/en/master/_modules/requests/auth/"""
+    Based on http://docs.python-requests.org/en/master/_modules/requests/auth/
+
+    The session's TTL, as reported by the server at login, is recorded. A session which has expired, or is
+    within `renew_before` seconds of expiring, is renewed before the next request instead of waiting for a 401.
+    Logins are serialized: threads which need a new session at the same time wait on a single login.
+
+    With a :py:class:`pyloginsight.sessioncache.SessionCache`, sessions are shared between processes. A cached
+    session is checked against /sessions/current before first use, and replaced by a fresh login if it's rejected."""
 
-    def __init__(self, username, password, provider, sessionId=None, reuse_session=None):
-        """If passed an existing sessionId, try to use it."""
+    def __init__(self, username, password, provider, sessionId=None, reuse_session=None, renew_before=60, cache=None, metrics=None):
+        """If passed an existing sessionId, try to use it. Logins are counted in `metrics`, if given."""
         self.username = username
         self.password = password
         self.provider = provider
         self.sessionId = sessionId  # An existing session id, like "hNhXgAM1xrl..."
+        self.expires = None  # Unix time at which sessionId is expected to expire, if known
+        self.renew_before = renew_before
+        self.cache = cache
+        self.metrics = metrics
         self.requests_session = reuse_session or requests.Session()
+        self._lock = threading.Lock()
+
+    @property
+    def expired(self):
+        """True if there is no session, or the session is about to reach its TTL."""
+        if not self.sessionId:
+            return True
+        return self.expires is not None and time.time() >= self.expires - self.renew_before
 
     def get_session(self, previousresponse, **kwargs):
         """Perform a session login and return a new session ID."""
+        return self._login(previousresponse.request.copy(), previousresponse.connection.send, **kwargs)
+
+    def _login(self, prep, send, **kwargs):
+        """
+        Rewrite a copy of a prepared request into a session login, send it, and record the new session and its TTL.
+        :param prep: a requests.PreparedRequest to the target server, whose scheme, host and headers are reused
+        :param send: a transport adapter's send method
+        """
         if self.username is None or self.password is None:
             raise Unauthorized("Cannot authenticate without username/password")
         logger.info("Attempting to authenticate as {0}".format(self.username))
         authdict = {"username": self.username, "password": self.password, "provider": self.provider}
 
-        prep = previousresponse.request.copy()
         try:
             del prep.headers['Authorization']
         except KeyError:
@@ -62,7 +191,7 @@ class Credentials(requests.auth.AuthBase):
             del prep.headers['Authorization']
 
         prep.prepare_method("post")
-        p = urlparse(previousresponse.request.url)
+        p = urlparse(prep.url)
         prep.prepare_url(urlunparse([p.scheme,
                                      p.netloc,
                                      APIV1 + "/sessions",
@@ -72,14 +201,78 @@ class Credentials(requests.auth.AuthBase):
 
         logger.debug("Authenticating via url: {0}".format(prep.url))
         prep.prepare_body(data=None, files=None, json=authdict)
-        authresponse = previousresponse.connection.send(prep, **kwargs)  # kwargs contains ssl _verify
+        started = time.time()
+        authresponse = send(prep, **kwargs)  # kwargs contains ssl _verify
         try:
-            return authresponse.json()['sessionId']
+            body = authresponse.json()
+            sessionId = body['sessionId']
         except:
             if authresponse.status_code == 503 and 'should be bootstrapped' in authresponse.json().get('errorMessage', ''):
                 raise NotBootstrapped(authresponse.json().get('errorMessage'), authresponse)
             raise Unauthorized("Authentication failed", authresponse)
 
+        self.expires = started + body['ttl'] if body.get('ttl') else None
+        self.sessionId = sessionId
+        if self.cache is not None:
+            self.cache.put(self.cache.key(p.netloc, self.username, self.provider), self.sessionId, self.expires)
+        return sessionId
+
+    def _adopt_cached_session(self, requests_session, url, **kwargs):
+        """Take over a session from the cache if the server still accepts it. Returns True on success."""
+        p = urlparse(url)
+        key = self.cache.key(p.netloc, self.username, self.provider)
+        cached = self.cache.get(key)
+        if cached is None:
+            return False
+
+        sessionId, expires = cached
+        if expires is not None and time.time() >= expires - self.renew_before:
+            return False
+        current = urlunparse([p.scheme, p.netloc, APIV1 + "/sessions/current", None, None, None])
+        prep = requests_session.prepare_request(requests.Request("GET", current))
+        prep.headers.update({"Authorization": "Bearer %s" % sessionId})
+        response = requests_session.get_adapter(current).send(prep, **kwargs)
+        response.close()
+
+        if response.status_code != 200:
+            logger.debug("Cached session for {0} was rejected with status {1}".format(key, response.status_code))
+            self.cache.discard(key)
+            return False
+
+        logger.debug("Reusing cached session for {0}".format(key))
+        self.sessionId, self.expires = sessionId, expires
+        return True
+
+    def _count_login(self, reason):
+        if self.metrics is not None:
+            self.metrics.record_authentication(reason)
+
+    def ensure_session(self, requests_session, url, **kwargs):
+        """
+        Log in ahead of a request to `url` if there is no session yet or it is about to expire, saving the round-trip
+        to collect a 401. Failure is not fatal here; the request is attempted regardless, and handle_401 has the final word.
+        """
+        if not self.expired or self.username is None:
+            return
+        # Sent straight to the adapter, bypassing Session.send, so take on the proxies and client certificate it would add
+        kwargs.update(requests_session.merge_environment_settings(url, {}, None, kwargs.pop('verify', None), None))
+        stale = self.sessionId
+        with self._lock:
+            if self.sessionId != stale and not self.expired:
+                return  # Another thread renewed the session while we waited
+            if self.sessionId is None and self.cache is not None and self._adopt_cached_session(requests_session, url, **kwargs):
+                self._count_login("cached")
+                return
+            if self.password is None:
+                return
+            reason = "initial" if self.sessionId is None else "renewal"
+            prep = requests_session.prepare_request(requests.Request("POST", url))
+            try:
+                self._login(prep, requests_session.get_adapter(url).send, **kwargs)
+                self._count_login(reason)
+            except (Unauthorized, NotBootstrapped) as e:
+                logger.debug("Could not renew session ahead of request to {0}: {1!r}".format(url, e))
+
     def handle_401(self, r, **kwargs):
         # method signature matches requests.Request.register_hook
 
@@ -90,7 +283,12 @@ class Credentials(requests.auth.AuthBase):
         r.content  # Drain previous response body, if any
         r.close()
 
-        self.sessionId = self.get_session(r, **kwargs)
+        # Many threads may have been rejected with the same session. Only the first to get the lock logs in again.
+        rejected = r.request.headers.get("Authorization", "")[7:] or None
+        with self._lock:
+            if self.sessionId is None or self.sessionId == rejected:
+                self.sessionId = self.get_session(r, **kwargs)
+                self._count_login("rejected")
 
         # Now that we have a good session, copy and retry the original request. If it fails again, raise Unauthorized.
         prep = r.request.copy()
@@ -106,13 +304,9 @@ class Credentials(requests.auth.AuthBase):
 
     def __call__(self, r):
         if self.sessionId:
-            # If we already have a Session ID Bearer Token, try to use it.
+            # If we already have a Session ID Bearer Token, try to use it. Connection renews it ahead of time if it's stale.
             r.headers.update({"Authorization": "Bearer %s" % self.sessionId})
 
-        # TODO: If the TTL has expired, or we have no Bearer token at all, we can reasonably expect this
-        # TODO.cont: request to fail with 401. In both cases, we could avoid a round-trip to the server.
-        # TODO.cont: This is an optimization and does not materially affect success.
-
         # Attempt the request. If it fails with a 401, generate a new sessionId
         r.register_hook('response', self.handle_401)
         return r
@@ -125,20 +319,61 @@ class Connection(object):
     """Low-level HTTP transport connecting to a remote Log Insight server's API.
     Attempts requests to the server which require authentication. If requests fail with HTTP 401 Unauthorized,
     obtains a session bearer token and retries the request.
-    You should probably use the :py:class:: Server class instead"""
+    You should probably use the :py:class:: Server class instead
+
+    Optionally, a :py:class:`pyloginsight.retry.RetryPolicy` repeats requests which failed with a transient error, and
+    a :py:class:`pyloginsight.retry.CircuitBreaker` stops sending requests to an endpoint which keeps failing.
+
+    Calls can be run in parallel with :py:meth:`submit` and :py:meth:`map`, on a pool of up to `max_workers` threads.
+    No more than `max_per_host` requests are in flight to a single host at once, whether or not they came from the pool.
+
+    Request bodies of at least `compress_threshold` bytes are gzip-compressed. If the server refuses a compressed body
+    with 415 Unsupported Media Type, the request is repeated uncompressed, and later bodies are sent uncompressed too.
+    Compressed responses are always accepted.
+
+    Each request gives up after `timeout` seconds: a number, or a tuple of (connect, read) timeouts as for requests.
+    Inside a :py:class:`pyloginsight.deadline.Deadline`, timeouts are shortened to fit the time remaining.
+
+    Requests and logins are recorded in `metrics`, a :py:class:`pyloginsight.metrics.MetricsRegistry`, if given.
 
-    def __init__(self, hostname, port=9543, ssl=True, verify=True, auth=None, existing_session=None):
-        self._requestsession = existing_session or requests.Session()
+    GET responses are kept in `cache`, a :py:class:`pyloginsight.cache.ResponseCache`, if given."""
+
+    def __init__(self, hostname, port=9543, ssl=True, verify=True, auth=None, existing_session=None, retry=None, circuit_breaker=None,
+                 max_workers=8, max_per_host=None, compress_threshold=None, timeout=DEFAULT_TIMEOUT, metrics=None,
+                 cache=None):
+        if existing_session is None:
+            existing_session = requests.Session()
+            # Let every worker of the thread pool keep its own connection alive, instead of discarding surplus ones
+            # after each request.
+            pool_maxsize = max(requests.adapters.DEFAULT_POOLSIZE, max_workers)
+            for prefix in ("https://", "http://"):
+                existing_session.mount(prefix, requests.adapters.HTTPAdapter(pool_maxsize=pool_maxsize))
+        self._requestsession = existing_session
         self._hostname = hostname
         self._port = port
         self._ssl = ssl
         self._verify = verify
         self._authprovider = auth
+        self.retry = retry
+        self.circuit_breaker = circuit_breaker
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self._executor = None
+        self._host_slots = {}
+        self._executor_lock = threading.Lock()
+        self.compress_threshold = compress_threshold
+        self._refuses_compression = set()  # API roots which rejected a compressed request body
+        self.timeout = timeout
+        self.metrics = metrics
+        self.cache = cache
+        if metrics is not None and isinstance(auth, Credentials) and auth.metrics is None:
+            auth.metrics = metrics  # Count its logins too
 
         self._apiroot = '{method}://{hostname}:{port}{apiv1}'.format(method='https' if ssl else 'http',
                                                                      hostname=hostname, port=port, apiv1=APIV1)
 
         self._requestsession.headers.update({'User-Agent': default_user_agent()})
+        self._requestsession.headers.setdefault('Accept-Encoding', 'gzip, deflate')
         logger.debug("Connected to {0}".format(self))
 
     @classmethod
@@ -154,65 +389,253 @@ class Connection(object):
     def _call(self, method, url, data=None, json=None, params=None, sendauthorization=True):
         logger.debug("{} {} data={} json={} params={}".format(method, url, data, json, params))
 
-        r = self._requestsession.request(method=method,
-                                         url="%s%s" % (self._apiroot, url),
-                                         data=data,
-                                         json=json,
-                                         verify=self._verify,
-                                         auth=self._authprovider if sendauthorization else None,
-                                         params=params)
-
-        if 'Warning' in r.headers:
-            if 'VMware-LI-API-Status' in r.headers:
-                warnings.warn("Log Insight API resource {} {} is {}".format(method, url, r.headers['VMware-LI-API-Status']),
-                              ServerWarning,
-                              stacklevel=5)
-            else:
-                warnings.warn(r.headers.get('Warning'))
+        cached = headers = None
+        if self.cache is not None and method == "GET":
+            key = self.cache.key(url, params)
+            cached = self.cache.get(key)
+            if cached is not None and cached.fresh:
+                self._count_cache(url, "hit")
+                return decode_payload(cached.content)
+            if cached is not None:
+                headers = cached.validators
 
         try:
-            payload = r.json()
-        except:
-            payload = r.text
+            r = self._request(method, url, data=data, json=json, params=params, sendauthorization=sendauthorization, expires=deadline.expiry(),
+                              headers=headers)
+        finally:
+            if self.cache is not None and method != "GET":
+                self.cache.invalidate(url)
+
+        if cached is not None and r.status_code == 304:
+            self._count_cache(url, "revalidated")
+            self.cache.refresh(cached, url, r.headers)
+            return decode_payload(cached.content)
 
-        if r.status_code in [401, 440]:
-            raise Unauthorized(r.status_code, payload)
-        if r.status_code in [404]:
-            raise ResourceNotFound(r.status_code, payload)
+        if self.cache is not None and method == "GET":
+            self._count_cache(url, "miss")
+            if r.status_code == 200:
+                self.cache.store(key, url, r.headers, r.content)
 
+        return interpret_response(method, url, r.status_code, r.headers, decode_payload(r.content, lambda: r.text))
+
+    def _count_cache(self, url, result):
+        if self.metrics is not None:
+            self.metrics.increment('cache_requests_total', (endpoint_template(url), result))
+
+    def _request(self, method, url, data=None, json=None, params=None, sendauthorization=True, stream=False, expires=None, headers=None):
         """
-        if r.status_code in [200, 201]:
+        Send a request, applying the retry policy and circuit breaker, and return the final requests.Response.
+        :param expires: Unix time by which the request and any retries must be complete
+        """
+        endpoint = endpoint_template(url)
+        attempt = 0
+        while True:
+            deadline.check(expires)
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before(endpoint)
             try:
-                if payload.keys() == ['id']:  # if there is only one key in the response, and it's "id", return it
-                    return payload['id']
-            except (KeyError, AttributeError):
-                return True
+                r = self._measured_send(endpoint, method, url, data=data, json=json, params=params, sendauthorization=sendauthorization,
+                                        stream=stream, expires=expires, headers=headers)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if expires is not None and deadline.remaining(expires) <= 0:
+                    # The timeout was cut short to fit the deadline, which says nothing about the server's health.
+                    if self.circuit_breaker is not None:
+                        self.circuit_breaker.abandon(endpoint)
+                    six.raise_from(DeadlineExceeded("Deadline exceeded during {0} {1}".format(method, url)), e)
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record(endpoint, None)
+                if self.retry is None or not self.retry.is_retryable(method, attempt):
+                    raise
+                wait = self.retry.backoff(attempt)
+                if expires is not None and deadline.remaining(expires) < wait:
+                    raise
+                self.retry.record(method, url, attempt, wait, repr(e))
+            except Exception:
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.abandon(endpoint)
+                raise
+            else:
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record(endpoint, r.status_code)
+                if self.retry is None or not self.retry.is_retryable(method, attempt, r.status_code):
+                    break
+                wait = self.retry.backoff(attempt, r.headers.get('Retry-After'))
+                if expires is not None and deadline.remaining(expires) < wait:
+                    break  # Not enough time left to wait for a retry
+                self.retry.record(method, url, attempt, wait, "status {0}".format(r.status_code))
+                r.close()
+            time.sleep(wait)
+            attempt += 1
+        return r
+
+    def _measured_send(self, endpoint, method, url, stream=False, **kwargs):
+        """_send, recording the request in the metrics registry, if any."""
+        if self.metrics is None:
+            return self._send(method, url, stream=stream, **kwargs)
+
+        started = time.time()
+        try:
+            with self.metrics.in_flight(method, endpoint):
+                r = self._send(method, url, stream=stream, **kwargs)
+        except Exception as e:
+            self.metrics.record_error(method, endpoint, e, time.time() - started)
+            raise
+        self.metrics.record_request(method, endpoint, r.status_code, time.time() - started,
+                                    sent=len(r.request.body or b""),
+                                    received=int(r.headers.get('Content-Length', 0)) if stream else len(r.content))
+        return r
+
+    def _timeout(self, expires=None):
+        """The requests timeout for a request which must be complete by the Unix time `expires`."""
+        left = deadline.remaining(expires) if expires is not None else None
+        if left is None:
+            return self.timeout
+        left = max(left, 0.001)
+        if self.timeout is None:
+            return left
+        if isinstance(self.timeout, tuple):
+            return tuple(left if t is None else min(t, left) for t in self.timeout)
+        return min(self.timeout, left)
+
+    def _send(self, method, url, data=None, json=None, params=None, sendauthorization=True, apiroot=None, stream=False, timeout=None,
+              headers=None, expires=None):
+        """
+        Issue a single HTTP request, authenticating if needed, and return the requests.Response.
+        :param expires: Unix time by which the request must be complete, shortening the connection's timeout to fit;
+        ignored if `timeout` is given
         """
+        apiroot = apiroot or self._apiroot
+        if timeout is None:
+            timeout = self._timeout(expires)
+
+        if sendauthorization and isinstance(self._authprovider, Credentials):
+            self._authprovider.ensure_session(self._requestsession, "%s%s" % (apiroot, url), verify=self._verify, timeout=timeout)
+
+        headers = dict(headers or {})
+        if json is not None:
+            data, headers['Content-Type'] = jsoncodec.encode(json), 'application/json'
+
+        def transmit(body):
+            with self._slot(apiroot):
+                return self._requestsession.request(method=method,
+                                                    url="%s%s" % (apiroot, url),
+                                                    data=body,
+                                                    headers=headers,
+                                                    verify=self._verify,
+                                                    auth=self._authprovider if sendauthorization else None,
+                                                    params=params,
+                                                    stream=stream,
+                                                    timeout=timeout)
+
+        if not (self.compress_threshold is not None and isinstance(data, six.binary_type) and
+                len(data) >= self.compress_threshold and apiroot not in self._refuses_compression):
+            return transmit(data)
+
+        headers['Content-Encoding'] = 'gzip'
+        compressed = gzip_compress(data)
+        logger.debug("Compressed {0} byte request body to {1} bytes".format(len(data), len(compressed)))
+        r = transmit(compressed)
+        if r.status_code != 415:
+            return r
+
+        logger.warning("{0} refused a compressed request body; sending uncompressed bodies from now on".format(apiroot))
+        self._refuses_compression.add(apiroot)
+        r.close()
+        del headers['Content-Encoding']
+        return transmit(data)
+
+    @contextlib.contextmanager
+    def _slot(self, apiroot):
+        """Hold one of the `max_per_host` request slots for a host while a request is in flight."""
+        if self.max_per_host is None:
+            yield
+            return
+        with self._executor_lock:
+            slots = self._host_slots.setdefault(apiroot, threading.BoundedSemaphore(self.max_per_host))
+        with slots:
+            yield
 
-        logger.debug("{} {}: status_code[{}]: {}".format(method, url, r.status_code, payload))
+    @property
+    def executor(self):
+        """The pool of threads running :py:meth:`submit` and :py:meth:`map` calls, created on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Schedule `fn(*args, **kwargs)` to run on the connection's thread pool, returning a
+        :py:class:`concurrent.futures.Future`. For example, ``c.submit(c.get, "/users/" + uuid)``.
+        The call runs under the same deadline as the caller, if any.
+        """
+        expires = deadline.expiry()
+        if expires is None:
+            return self.executor.submit(fn, *args, **kwargs)
 
-        # Success
-        if 200 <= r.status_code < 300:
-            return payload
+        def call():
+            with deadline.Deadline(expires=expires):
+                return fn(*args, **kwargs)
+        return self.executor.submit(call)
 
-        # Failure. We're going to throw an exception. Try to harvest an errorMessage from the response.
+    def map(self, fn, *iterables, **kwargs):
+        """
+        Call `fn` with arguments from each of `iterables` in parallel, and yield the results.
 
+        :param ordered: Yield results in the order of `iterables` (default), or otherwise as soon as each completes
+        :param return_exceptions: Yield the exception raised by a call in place of its result, instead of raising it
+        and cancelling the calls which haven't started yet
+        """
+        ordered = kwargs.pop('ordered', True)
+        return_exceptions = kwargs.pop('return_exceptions', False)
+        if kwargs:
+            raise TypeError("Unexpected keyword arguments {0}".format(sorted(kwargs)))
+
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        return self._results(futures, ordered, return_exceptions)
+
+    @staticmethod
+    def _results(futures, ordered, return_exceptions):
         try:
-            error_message = payload['errorMessage']
-        except (TypeError, KeyError):
-            error_message = None
-        try:
-            error_message = payload['errorDetails']
-        except (TypeError, KeyError):
-            error_message = None
+            for future in (futures if ordered else as_completed(futures)):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    result = e
+                yield result
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def close(self):
+        """Wait for calls submitted to the thread pool to finish, and release it."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stream(self, url, key, params=None, sendauthorization=True, chunk_size=65536):
+        """
+        Issue a GET and yield the elements of the array `key` in the response body one at a time, decoding them as they
+        arrive from the socket. The whole response is never held in memory. Errors are raised as by get(), before the
+        first element is yielded. A deadline in force when stream() is called still applies while the body is read.
+        """
+        return self._stream(url, key, params, sendauthorization, chunk_size, deadline.expiry())
 
-        if r.status_code == 418:
-            raise NotImplementedError("{} {}: {}".format(method, url, payload))
+    def _stream(self, url, key, params, sendauthorization, chunk_size, expires):
+        logger.debug("GET {} params={} (streaming {})".format(url, params, key))
 
-        if error_message:
-            raise ValueError(r.status_code, error_message)
-        else:
-            raise TransportError(r.status_code, payload)
+        r = self._request("GET", url, params=params, sendauthorization=sendauthorization, stream=True, expires=expires)
+        try:
+            if not 200 <= r.status_code < 300:
+                interpret_response("GET", url, r.status_code, r.headers, decode_payload(r.content, lambda: r.text))
+            for item in iter_json_array(r.iter_content(chunk_size), key):
+                deadline.check(expires)
+                yield item
+        finally:
+            r.close()
 
     def post(self, url, data=None, json=None, params=None, sendauthorization=True):
         """
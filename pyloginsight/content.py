@@ -2,6 +2,7 @@
 
 from marshmallow import Schema, fields, ValidationError
 import json
+from . import jsoncodec
 from six.moves import configparser
 import io
 
@@ -33,11 +34,12 @@ class JsonString(fields.Nested):
 
     def _deserialize(self, value, attr, data):
         try:
-            return super(JsonString, self)._deserialize(value=json.loads(value), attr=attr, data=data)
+            return super(JsonString, self)._deserialize(value=jsoncodec.decode(value), attr=attr, data=data)
         except ValueError:
             return None
 
     def _serialize(self, nested_obj, attr, obj):
+        # The standard library's default formatting, so exported content packs stay byte-for-byte as they were
         return json.dumps(super(JsonString, self)._serialize(nested_obj=nested_obj, attr=attr, obj=obj), sort_keys=True)
 
 
@@ -54,7 +56,7 @@ class AgentConfigString(fields.Field):
         for section_key, section_value in config_dict.items():
             for key, value in section_value.items():
                 if key == 'tags':
-                    config_dict[section_key]['tags'] = json.loads(value)
+                    config_dict[section_key]['tags'] = jsoncodec.decode(value)
 
         return config_dict
 
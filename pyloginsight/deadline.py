@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+An overall time budget for an operation which makes many requests::
+
+    with Deadline(30):
+        hosts = list(server.hosts)
+
+Every request made by the current thread inside the block has its timeouts shortened to fit in the time remaining, and
+once it runs out, requests raise :py:class:`pyloginsight.exceptions.DeadlineExceeded` instead of being sent. Nested
+deadlines can only shorten the budget. Calls handed to :py:meth:`pyloginsight.connection.Connection.submit` carry
+the submitter's deadline with them.
+"""
+
+import logging
+import threading
+import time
+
+from .exceptions import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def expiry():
+    """The Unix time at which the current thread's tightest deadline expires, or None."""
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+def remaining(expires=None):
+    """Seconds left before `expires`, by default the current deadline. None if there is no deadline."""
+    if expires is None:
+        expires = expiry()
+    if expires is None:
+        return None
+    return expires - time.time()
+
+
+def check(expires=None):
+    """Raise DeadlineExceeded if the deadline `expires`, by default the current one, has passed."""
+    left = remaining(expires)
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Deadline exceeded by {0:.3f} seconds".format(-left))
+
+
+class Deadline(object):
+    """
+    Context manager bounding the time taken by the requests made within it.
+
+    :param seconds: Budget from now; None for no limit, leaving any enclosing deadline in force
+    :param expires: Alternatively, the Unix time at which the budget runs out
+    """
+
+    def __init__(self, seconds=None, expires=None):
+        if seconds is not None:
+            expires = time.time() + seconds
+        self.expires = expires
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        candidates = [e for e in (self.expires, expiry()) if e is not None]
+        stack.append(min(candidates) if candidates else None)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.stack.pop()
+
+    def __repr__(self):
+        return '{cls}(expires={x.expires!r})'.format(cls=self.__class__.__name__, x=self)
@@ -19,6 +19,18 @@ class Unauthorized(TransportError):
     """Credentials are invalid, expired, or not suitible for attempted operation."""
 
 
+class CircuitOpen(TransportError):
+    """The endpoint has been failing repeatedly, so the request was not sent to the server."""
+
+
+class DeadlineExceeded(TransportError):
+    """The operation's time budget ran out before the request could be completed."""
+
+
+class NotRecorded(TransportError):
+    """A replayed connection made a request for which the cassette holds no response."""
+
+
 class Cancel(RuntimeError):
     """Update to server intentionally cancelled from within a context manager."""
 
@@ -27,6 +39,15 @@ class ServerWarning(UserWarning):
     """The remote Log Insight server emitted a warning for an API resource."""
 
 
+class IngestionIncomplete(ServerError):
+    """The server accepted a batch of events, but ingested fewer of them than were sent."""
+
+    def __init__(self, sent, ingested, response=None):
+        super(IngestionIncomplete, self).__init__("Server ingested {0} of {1} events".format(ingested, sent), response)
+        self.sent = sent
+        self.ingested = ingested
+
+
 class NotBootstrapped(ServerError):
     """The server has not yet been bootstrapped."""
 
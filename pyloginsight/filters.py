@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Reduce what is sent during event storms, before events are batched::
+
+    pipeline = Pipeline(Deduplicator(window=60), RateLimiter(100, key='hostname'), Sampler(10, key='appname'))
+    with BatchIngestor(connection, pipeline=pipeline) as batch:
+        batch.extend(events)
+
+Stages see serialized CFAPI events, in order, and each may pass, drop or hold them:
+
+- Deduplicator sends the first of identical events (same text and fields) and counts the rest within `window` seconds,
+  then sends one copy with a `repeat_count` field for them
+- RateLimiter drops events beyond a token bucket's rate, with a bucket per value of a field if given
+- Sampler keeps one in `rate` events, at random or by a hash of a field's value, adding a `sample_rate` field so that
+  counts can be scaled back up
+
+Each stage keeps state for at most `max_keys` distinct keys, evicting the oldest, so memory stays bounded however many
+distinct events there are.
+"""
+
+import collections
+import hashlib
+import logging
+import random
+import threading
+import time
+import zlib
+
+import six
+
+logger = logging.getLogger(__name__)
+
+
+def _field(event, name):
+    """The content of a serialized event's field, or None."""
+    for f in event.get('fields', ()):
+        if f['name'] == name:
+            return f['content']
+    return None
+
+
+def _with_field(event, name, value):
+    """A copy of a serialized event with a field added; the original may be sent again, so is left unchanged."""
+    return dict(event, fields=list(event.get('fields', ())) + [{'name': name, 'content': str(value)}])
+
+
+def _key(event, key):
+    """The value `key` names: a field's content, or the result of calling it with the event. Events without it share None."""
+    return key(event) if callable(key) else _field(event, key)
+
+
+class Stage(object):
+    """
+    A step of a :py:class:`Pipeline`. Subclasses implement :py:meth:`process`, and those which hold events back also
+    :py:meth:`expire` and :py:meth:`drain`.
+    """
+
+    def __init__(self):
+        self.counts = collections.Counter()
+
+    def process(self, event, now):
+        """The events to pass on, as a list, given one arriving at time `now`."""
+        raise NotImplementedError
+
+    def expire(self, now):
+        """Held events which are due by `now`."""
+        return []
+
+    def drain(self):
+        """Every held event, as the pipeline is closing."""
+        return []
+
+
+class RateLimiter(Stage):
+    """
+    :param rate: Events per second allowed through, on average
+    :param burst: Events allowed through at once after a quiet period; defaults to `rate`
+    :param key: A field name, or a function of a serialized event, whose values are limited separately, such as a
+    hostname field to limit each source; None for one limit across all events
+    """
+
+    def __init__(self, rate, burst=None, key=None, max_keys=10000):
+        super(RateLimiter, self).__init__()
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self.key = key
+        self.max_keys = max_keys
+        self._buckets = collections.OrderedDict()  # Key to [tokens, when last refilled], least recently used first
+
+    def process(self, event, now):
+        k = _key(event, self.key) if self.key is not None else None
+        bucket = self._buckets.pop(k, None)
+        if bucket is None:
+            bucket = [self.burst, now]
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)  # Forgotten, the key starts again with a full bucket
+        self._buckets[k] = bucket
+
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            self.counts['rate_limited'] += 1
+            return []
+        bucket[0] -= 1
+        return [event]
+
+
+class Sampler(Stage):
+    """
+    :param rate: Keep one in this many events
+    :param key: A field name, or a function of a serialized event, to sample by. The same value is always kept or
+    always dropped, so related events, such as those of one request, survive together.
+    :param deterministic: Without `key`, keep every `rate`-th event rather than each with probability 1/`rate`
+    :param field: Name of the field recording `rate` on kept events, or None to not record it
+    """
+
+    def __init__(self, rate, key=None, deterministic=False, field="sample_rate", seed=None):
+        super(Sampler, self).__init__()
+        if rate < 1:
+            raise ValueError("rate must be at least 1")
+        self.rate = rate
+        self.key = key
+        self.deterministic = deterministic
+        self.field = field
+        self._random = random.Random(seed)
+        self._seen = 0
+
+    def _keep(self, event):
+        if self.key is not None:
+            value = six.text_type(_key(event, self.key)).encode("utf-8")
+            return zlib.crc32(value) & 0xffffffff < 0x100000000 / float(self.rate)  # Stable across processes, unlike hash()
+        if self.deterministic:
+            self._seen += 1
+            return self._seen % self.rate == 1 % self.rate
+        return self._random.random() < 1.0 / self.rate
+
+    def process(self, event, now):
+        if self.rate == 1:
+            return [event]
+        if not self._keep(event):
+            self.counts['sampled_out'] += 1
+            return []
+        return [_with_field(event, self.field, self.rate) if self.field else event]
+
+
+class Deduplicator(Stage):
+    """
+    :param window: Seconds after the first of identical events during which the rest are counted rather than sent
+    :param field: Name of the field recording how many identical events a repeat stands for
+    :param max_keys: Distinct events remembered at once. When more arrive, the oldest window ends early.
+    """
+
+    def __init__(self, window=60.0, field="repeat_count", max_keys=10000):
+        super(Deduplicator, self).__init__()
+        self.window = window
+        self.field = field
+        self.max_keys = max_keys
+        # Digest of text and fields to [window start, repeats, latest repeat], in the order windows end
+        self._windows = collections.OrderedDict()
+
+    @staticmethod
+    def digest(event):
+        """Identifies events with the same text and fields, whatever their timestamps and field order."""
+        h = hashlib.sha1(six.text_type(event.get('text', u"")).encode("utf-8"))
+        for f in sorted((f['name'], f['content']) for f in event.get('fields', ())):
+            h.update(u"\0{0}\0{1}".format(*f).encode("utf-8"))
+        return h.digest()
+
+    def _close(self, state):
+        """The event standing for a window's repeats, if it had any."""
+        _, repeats, latest = state
+        return [_with_field(latest, self.field, repeats)] if repeats else []
+
+    def process(self, event, now):
+        passed = self.expire(now)
+        digest = self.digest(event)
+        state = self._windows.get(digest)
+        if state is not None:
+            state[1] += 1
+            state[2] = event
+            self.counts['deduplicated'] += 1
+            return passed
+        if len(self._windows) >= self.max_keys:
+            passed.extend(self._close(self._windows.popitem(last=False)[1]))
+        self._windows[digest] = [now, 0, None]
+        passed.append(event)
+        return passed
+
+    def expire(self, now):
+        passed = []
+        while self._windows:
+            digest, state = next(iter(self._windows.items()))
+            if now - state[0] < self.window:
+                break
+            del self._windows[digest]
+            passed.extend(self._close(state))
+        return passed
+
+    def drain(self):
+        passed = []
+        for state in self._windows.values():
+            passed.extend(self._close(state))
+        self._windows.clear()
+        return passed
+
+
+class Pipeline(object):
+    """
+    Stages applied to each serialized event in turn, safe to share between threads. Events a stage releases later,
+    from :py:meth:`expire` or :py:meth:`drain`, continue through the stages after it.
+    """
+
+    def __init__(self, *stages):
+        self.stages = stages
+        self.received = 0
+        self.passed = 0
+        self._lock = threading.Lock()
+
+    def _release(self, release, now):
+        """Events each stage releases, through the stages after it."""
+        events = []
+        for stage in self.stages:
+            events = [out for event in events for out in stage.process(event, now)] + release(stage)
+        return events
+
+    def process(self, event):
+        """The events to send, as a list, given a serialized event."""
+        with self._lock:
+            now = time.time()
+            events = [event]
+            for stage in self.stages:
+                events = [out for e in events for out in stage.process(e, now)]
+            self.received += 1
+            return self._count(events)
+
+    def expire(self):
+        """Held events which are now due, such as repeats whose window has ended."""
+        with self._lock:
+            now = time.time()
+            return self._count(self._release(lambda stage: stage.expire(now), now))
+
+    def drain(self):
+        """Every held event."""
+        with self._lock:
+            return self._count(self._release(lambda stage: stage.drain(), time.time()))
+
+    def _count(self, events):
+        self.passed += len(events)
+        return events
+
+    def stats(self):
+        """Events received and passed, and those each stage dropped or collapsed."""
+        with self._lock:
+            stats = collections.Counter()
+            for stage in self.stages:
+                stats.update(stage.counts)
+            stats['received'] = self.received
+            stats['passed'] = self.passed
+            return dict(stats)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A handler for Python's `logging` which sends records to Log Insight::
+
+    handler = LogInsightHandler(connection, fields={'appname': 'myapp'})
+    logging.getLogger().addHandler(handler)
+
+Like the standard library's QueueHandler, emitting a record only formats its message and puts it on a queue. A
+:py:class:`pyloginsight.ingestion.BackgroundIngestor` serializes and sends the queued records in batches, so logging
+never waits for the server.
+"""
+
+import copy
+import logging
+
+from .ingestion import BackgroundIngestor, serialize_cfapi_event, _FieldNames
+
+_exception_formatter = logging.Formatter()
+
+
+class LogInsightHandler(logging.Handler):
+    """
+    Sends each record's message as an event, with its level, logger name, module and any exception text as fields.
+
+    :param fields: Fields added to every event, such as an appname
+    :param record_fields: Names of other LogRecord attributes to add as fields when present, such as those passed to a
+    logger with `extra`
+    :param ingestor_options: Passed to the BackgroundIngestor, such as `workers`, `when_full` or `max_queue`
+    """
+
+    def __init__(self, connection, level=logging.NOTSET, fields=None, record_fields=(), agent_id="1", trusted=False,
+                 **ingestor_options):
+        logging.Handler.__init__(self, level)
+        self.fields = dict(fields or {})
+        self.record_fields = tuple(record_fields)
+        self._names = _FieldNames()
+        self.ingestor = BackgroundIngestor(connection, agent_id, trusted, serialize=self.serialize, **ingestor_options)
+        # Records logged by the ingestor's own threads, such as about a failed request, would feed back into the queue
+        self._ignore_threads = frozenset(t.ident for t in self.ingestor.threads)
+
+    def prepare(self, record):
+        """
+        A copy of the record, as QueueHandler makes, so that handlers after this one see it as logged. The message and
+        exception text are formatted while the arguments are still as logged, and references the queue shouldn't keep
+        alive are dropped. The exception text is sent as its own field, so the formatter leaves it out of the message.
+        """
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+        exc_text = record.exc_text
+        record.exc_info = record.exc_text = None
+        record.message = self.format(record) if self.formatter else record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_text = exc_text
+        return record
+
+    def serialize(self, record):
+        """The CFAPI event for a prepared record."""
+        fields = dict(self.fields)
+        fields['level'] = record.levelname
+        fields['logger'] = record.name
+        fields['module'] = record.module
+        if record.exc_text:
+            fields['exception'] = record.exc_text
+        for name in self.record_fields:
+            value = getattr(record, name, None)
+            if value is not None:
+                fields[name] = value
+        return serialize_cfapi_event(record.message, int(record.created * 1000), fields, crush=self._names.__getitem__)
+
+    def emit(self, record):
+        if record.thread in self._ignore_threads:
+            return
+        try:
+            self.ingestor.log(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Wait until every record emitted so far has been sent."""
+        self.ingestor.flush()
+
+    def close(self):
+        """Send the queued records, and stop the ingestor's threads."""
+        self.ingestor.close()
+        logging.Handler.close(self)
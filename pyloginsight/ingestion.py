@@ -16,15 +16,31 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import atexit
+import collections
 import re
 import logging
+import threading
+import time
 import pytz
+import requests
+import six
 from datetime import datetime
-from .exceptions import ServerError
+from six.moves import queue
+from . import jsoncodec
+from .exceptions import ServerError, IngestionIncomplete, TransportError, CircuitOpen, DeadlineExceeded
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 logger = logging.getLogger(__name__)
 
 MAXIMUM_BYTES_TEXT_FIELD = 1024 * 16  # 16 KB (text field)
+MAXIMUM_BYTES_REQUEST = 1024 * 1024 * 4  # 4 MB (ingestion request body)
+
+_ENVELOPE_BYTES = len(b'{"events":[]}')
 
 
 def datetime_in_milliseconds(dt):
@@ -39,6 +55,19 @@ def datetime_in_milliseconds(dt):
         return int((dt - _EPOCH).total_seconds() * 1000)
 
 
+def truncate_utf8(text, max_bytes):
+    """
+    Shorten text to at most `max_bytes` when encoded as UTF-8, without splitting a multi-byte character.
+    :return: `text` itself if it already fits
+    """
+    if len(text) * 4 <= max_bytes:  # No character encodes to more than 4 bytes
+        return text
+    encoded = text.encode('utf-8') if isinstance(text, six.text_type) else text
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[:max_bytes].decode('utf-8', 'ignore')  # Drops the partial character left at the end, if any
+
+
 def crush_invalid_field_name(name):
     """
     Log Insight field names must start with an underscore or an alpha character.
@@ -51,22 +80,34 @@ def crush_invalid_field_name(name):
     return re.sub(r'__*', "_", name, flags=re.I)
 
 
-def serialize_cfapi_event(message, timestamp_milliseconds, fields):
+class _FieldNames(dict):
+    """Memo of crush_invalid_field_name, for the handful of distinct field names a source produces."""
+
+    def __missing__(self, name):
+        crushed = self[name] = crush_invalid_field_name(name)
+        return crushed
+
+
+_field_names = _FieldNames()
+
+
+def serialize_cfapi_event(message, timestamp_milliseconds, fields, crush=crush_invalid_field_name):
     """
 
     :param message: A str to use as the message body
     :param timestamp_milliseconds: An integer
     :param fields: A dict of fields.
+    :param crush: Function to make field names valid, such as a memoized crush_invalid_field_name
     :return:
     """
     o = {}
     if message:
-        o['text'] = message[:MAXIMUM_BYTES_TEXT_FIELD]
+        o['text'] = truncate_utf8(message, MAXIMUM_BYTES_TEXT_FIELD)
     if timestamp_milliseconds:
         o['timestamp'] = timestamp_milliseconds
     if fields:
         pass
-        o['fields'] = [{'name': crush_invalid_field_name(str(k)), 'content': str(v)} for k, v in fields.items()]
+        o['fields'] = [{'name': crush(str(k)), 'content': str(v)} for k, v in fields.items()]
     return o
 
 
@@ -79,14 +120,498 @@ def serialize_event_object(event_object):
     return serialize_cfapi_event(event_object.get('text', None), ms, event_object.get('fields', None))
 
 
-def transmit(connection, event_object, agent_id="1", trusted=False):
-    """Transmit a single Event object to a remote Log Insight server."""
+def _values(column):
+    """A column's values as a list of Python objects. Columns may be sequences, NumPy arrays or pandas Series."""
+    values = getattr(column, 'values', column)
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+
+def _milliseconds(column):
+    """
+    Timestamps as Unix milliseconds, or None where missing (None, NaN or NaT). Numbers are taken to be milliseconds
+    already. NumPy arrays, which includes the values of a pandas Series, are converted in one operation.
+    """
+    values = getattr(column, 'values', column)
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        if values.dtype.kind in 'Mf':
+            if values.dtype.kind == 'M':
+                missing = numpy.isnat(values)
+                ms = values.astype('datetime64[ms]').astype('int64').tolist()
+            else:
+                missing = numpy.isnan(values)  # Such as a pandas column of integers with gaps
+                ms = numpy.where(missing, 0, values).astype('int64').tolist()
+            if missing.any():  # Cast to integers, NaN and NaT would become the smallest int64
+                ms = [None if m else v for v, m in zip(ms, missing.tolist())]
+            return ms
+        if values.dtype.kind in 'iu':
+            return values.astype('int64').tolist()
+        values = values.tolist()
+    return [None if v is None or v != v else int(v) if isinstance(v, (six.integer_types, float)) else datetime_in_milliseconds(v)
+            for v in values]
+
+
+def serialize_columns(columns, text="text", timestamp="timestamp"):
+    """
+    Serialize many events at once from columns of equal length, such as a dict of lists or a pandas DataFrame.
+    Every column other than `text` and `timestamp` becomes a field; missing values (None or NaN) are left out.
+    Equivalent to calling serialize_cfapi_event for each row, but field names are crushed once per column and
+    NumPy timestamps are converted in bulk.
+
+    :param text: Name of the column holding each event's message, or None
+    :param timestamp: Name of the column holding each event's datetime or Unix milliseconds, or None for the server
+    to assign the time of ingestion. Naive datetime64 values are taken to be UTC.
+    :return: A list of CFAPI event dicts, to send as ``{"events": [...]}``
+    """
+    names = [name for name in columns.keys() if name not in (text, timestamp)]
+    lengths = set(len(columns[name]) for name in columns.keys())
+    if len(lengths) > 1:
+        raise ValueError("Columns have different lengths: {0}".format(sorted(lengths)))
+    rows = lengths.pop() if lengths else 0
+
+    texts = _values(columns[text]) if text in columns else [None] * rows
+    stamps = _milliseconds(columns[timestamp]) if timestamp in columns else [None] * rows
+    crushed = [_field_names[str(name)] for name in names]
+    contents = [[None if v is None or v != v else str(v) for v in _values(columns[name])] for name in names]
+
+    events = []
+    for message, ms, row in zip(texts, stamps, zip(*contents) if contents else [()] * rows):
+        o = {}
+        if message and message == message:  # NaN, as pandas marks missing values, isn't equal to itself
+            o['text'] = truncate_utf8(message if isinstance(message, six.string_types) else str(message), MAXIMUM_BYTES_TEXT_FIELD)
+        if ms:
+            o['timestamp'] = ms
+        fields = [{'name': n, 'content': c} for n, c in zip(crushed, row) if c is not None]
+        if fields:
+            o['fields'] = fields
+        events.append(o)
+    return events
 
-    e = serialize_event_object(event_object)
 
-    r = connection.post("/events/ingest/" + agent_id, json={"events": [e]}, sendauthorization=trusted)
+def _too_large(exception):
+    """Whether a request failed with 413 Request Entity Too Large, as raised by interpret_response."""
+    return bool(exception.args) and exception.args[0] == 413
+
+
+def _transient(exception):
+    """
+    Whether a request which failed with `exception` may succeed if sent again later: the server couldn't be reached or
+    was overloaded, rather than rejecting the events.
+    """
+    if isinstance(exception, (requests.ConnectionError, requests.Timeout, CircuitOpen, DeadlineExceeded)):
+        return True
+    status = exception.args[0] if exception.args else None
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+def _post_events(connection, events, agent_id, trusted):
+    """POST a list of serialized events in a single request. Returns the number ingested by the server."""
+    r = connection.post("/events/ingest/" + agent_id, json={"events": events}, sendauthorization=trusted)
 
     if r.get("status", None) == 'ok':
         return r.get("ingested", 0)
 
     raise ServerError(r)
+
+
+def transmit(connection, event_object, agent_id="1", trusted=False, spool=None):
+    """
+    Transmit a single Event object to a remote Log Insight server.
+    :param spool: A :py:class:`pyloginsight.spool.Spool` to keep the event in if the server can't be reached or is
+    overloaded, in which case 0 is returned. Events the server rejects are not spooled.
+    """
+
+    e = serialize_event_object(event_object)
+    if spool is None:
+        return _post_events(connection, [e], agent_id, trusted)
+    try:
+        return _post_events(connection, [e], agent_id, trusted)
+    except requests.RequestException as exception:
+        if not _transient(exception):
+            raise
+        logger.warning("Spooling an event which couldn't be sent: {0!r}".format(exception))
+        spool.append([e])
+        return 0
+
+
+class BatchIngestor(object):
+    """
+    Collects Event objects and transmits them to a remote Log Insight server many per request::
+
+        with BatchIngestor(connection) as batch:
+            for line in lines:
+                batch.append(Event(text=line))
+
+    A batch is sent once it holds `max_events` events or its request body would reach `max_bytes`, by default the
+    server's limit of MAXIMUM_BYTES_REQUEST, measured as each event is serialized, or when an event is appended more than `max_delay` seconds after the batch's first. A batch
+    the server nonetheless rejects as too large, with 413, is split in half and each half sent again. Whatever remains is sent by :py:meth:`flush`,
+    which leaving the context manager calls. There's no background thread, so a batch which stops growing waits for
+    the next append or flush.
+
+    :param agent_id: Agent UUID to ingest as, as for :py:func:`transmit`
+    :param trusted: Send the connection's authorization with each batch
+    :param serialize: Function turning each appended object into a CFAPI event dict
+    :param on_sent: Called as `on_sent(events, ingested, seconds)` after each batch the server accepts
+    :param on_failure: Called as `on_failure(events, exception)` for each batch which couldn't be sent or was only
+    partly ingested, instead of raising the exception. `events` are the batch's serialized events.
+    :param on_too_large: Called as `on_too_large(events)` for each batch the server rejected with 413, before its halves
+    are sent
+    :param pipeline: A :py:class:`pyloginsight.filters.Pipeline` to rate limit, sample or deduplicate serialized events
+    before they join the batch
+    """
+
+    def __init__(self, connection, agent_id="1", trusted=False, max_events=1000, max_bytes=MAXIMUM_BYTES_REQUEST, max_delay=5.0,
+                 serialize=serialize_event_object, on_sent=None, on_failure=None, on_too_large=None, pipeline=None):
+        self.connection = connection
+        self.agent_id = agent_id
+        self.trusted = trusted
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.serialize = serialize
+        self.on_sent = on_sent
+        self.on_failure = on_failure
+        self.on_too_large = on_too_large
+        self.pipeline = pipeline
+
+        self.batches = 0  # Sent
+        self.ingested = 0  # Events, across all batches
+
+        self._pending = []
+        self._pending_bytes = 0
+        self._started = None
+        self._lock = threading.Lock()
+
+    def append(self, event_object):
+        """
+        Add an event to the batch, sending the batch if that fills it.
+        :return: The number of events ingested by a batch sent as a result, or 0
+        """
+        e = self.serialize(event_object)
+        if self.pipeline is None:
+            return self._add(e)
+        return sum(self._add(passed) for passed in self.pipeline.process(e))
+
+    def _add(self, e):
+        size = len(jsoncodec.encode(e)) + 1  # Plus its separating comma
+        ingested = 0
+
+        if size + _ENVELOPE_BYTES > self.max_bytes:
+            logger.warning("A serialized event of {0} bytes exceeds the batch limit of {1} bytes".format(size, self.max_bytes))
+
+        with self._lock:
+            if self._pending and _ENVELOPE_BYTES + self._pending_bytes + size > self.max_bytes:
+                ingested += self._send(*self._take())
+            if not self._pending:
+                self._started = time.time()
+            self._pending.append(e)
+            self._pending_bytes += size
+            if self._full():
+                ingested += self._send(*self._take())
+        return ingested
+
+    def extend(self, event_objects):
+        """Add many events. Returns the number ingested by batches sent as a result."""
+        return sum(self.append(e) for e in event_objects)
+
+    def flush(self, drain=True):
+        """
+        Send any pending events. Returns the number ingested, or 0 if there were none.
+        :param drain: Also send every event the pipeline holds, rather than only those now due
+        """
+        if self.pipeline is not None:
+            for e in self.pipeline.drain() if drain else self.pipeline.expire():
+                self._add(e)
+        with self._lock:
+            if not self._pending:
+                return 0
+            return self._send(*self._take())
+
+    def _full(self):
+        return (len(self._pending) >= self.max_events or _ENVELOPE_BYTES + self._pending_bytes >= self.max_bytes or
+                time.time() - self._started >= self.max_delay)
+
+    def _take(self):
+        events, size = self._pending, self._pending_bytes
+        self._pending, self._pending_bytes, self._started = [], 0, None
+        return events, size
+
+    def _send(self, events, size):
+        """
+        Transmit a batch, in halves if the server finds it too large. It is discarded whether or not the server accepts it.
+        :raises IngestionIncomplete: if the server ingested only some of the batch's events
+        """
+        logger.debug("Sending a batch of {0} events, {1} bytes".format(len(events), size))
+        started = time.time()
+        try:
+            try:
+                ingested = _post_events(self.connection, events, self.agent_id, self.trusted)
+            except (ValueError, TransportError) as e:
+                if len(events) < 2 or not _too_large(e):
+                    raise
+                logger.info("Server rejected a batch of {0} events as too large; sending it in halves".format(len(events)))
+                if self.on_too_large is not None:
+                    self.on_too_large(events)
+                half = len(events) // 2
+                return self._send(events[:half], size // 2) + self._send(events[half:], size - size // 2)
+            self.batches += 1
+            self.ingested += ingested
+            if ingested < len(events):
+                raise IngestionIncomplete(len(events), ingested)
+        except (Exception, ServerError) as e:
+            if self.on_failure is None:
+                raise
+            self.on_failure(events, e)
+            return 0 if not isinstance(e, IngestionIncomplete) else e.ingested
+        if self.on_sent is not None:
+            self.on_sent(events, ingested, time.time() - started)
+        return ingested
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def __repr__(self):
+        return '{cls}(agent_id={x.agent_id!r}, max_events={x.max_events!r}, max_bytes={x.max_bytes!r}, max_delay={x.max_delay!r})'.format(
+            cls=self.__class__.__name__, x=self)
+
+
+BLOCK = "block"
+DROP = "drop"
+SPILL = "spill"
+
+
+class BackgroundIngestor(object):
+    """
+    Transmits events from background threads, so that logging one costs a queue append rather than a request::
+
+        ingestor = BackgroundIngestor(connection, workers=2)
+        ingestor.log(Event(text="..."))
+        ...
+        ingestor.close()  # Sends whatever is still queued
+
+    Each worker takes events from a bounded queue, waiting up to `max_delay` seconds to gather a batch, and sends them
+    with a :py:class:`BatchIngestor`. When the queue is full, `when_full` decides what :py:meth:`log` does:
+
+    - BLOCK: wait for space, for up to `put_timeout` seconds if given, then drop the event
+    - DROP: drop the event immediately
+    - SPILL: pass the event, serialized, to `spill`
+
+    With a `controller`, such as an :py:class:`pyloginsight.adaptive.AIMDController`, its batch size replaces
+    `max_events` and its concurrency decides how many of its `max_workers` send at once, both adapting to the server.
+
+    Events are serialized by the workers with `serialize`, so anything it accepts can be logged, then pass through
+    `pipeline`, if given, which the workers share. `spill` is a callable taking a list of serialized events. It also receives batches the server couldn't be reached
+    for; without it, such batches are logged and counted as failed. Counters are available from :py:meth:`stats`, and
+    the ingestor is closed at interpreter exit if not before.
+    """
+
+    _STOP = object()
+
+    def __init__(self, connection, agent_id="1", trusted=False, workers=1, max_queue=10000, when_full=BLOCK, spill=None,
+                 put_timeout=None, max_events=1000, max_bytes=MAXIMUM_BYTES_REQUEST, max_delay=1.0, serialize=serialize_event_object,
+                 controller=None, pipeline=None):
+        if when_full not in (BLOCK, DROP, SPILL):
+            raise ValueError("when_full must be one of {0!r}".format((BLOCK, DROP, SPILL)))
+        if when_full == SPILL and spill is None:
+            raise ValueError("when_full={0!r} requires spill".format(SPILL))
+        self.connection = connection
+        self.agent_id = agent_id
+        self.trusted = trusted
+        self.when_full = when_full
+        self.spill = spill
+        self.put_timeout = put_timeout
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.serialize = serialize
+        self.controller = controller
+        self.pipeline = pipeline
+        if controller is not None:
+            workers = controller.max_workers
+
+        self._queue = queue.Queue(max_queue)
+        self._counts = dict.fromkeys(('queued', 'ingested', 'batches', 'dropped', 'spilled', 'failed'), 0)
+        self._latencies = collections.deque(maxlen=1024)  # Seconds, of recent batches
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.threads = [threading.Thread(target=self._run, args=(n,), name="pyloginsight-ingest-{0}".format(n)) for n in range(workers)]
+        for worker in self.threads:
+            worker.daemon = True
+            worker.start()
+        atexit.register(self.close)
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counts[name] += n
+
+    def log(self, event_object):
+        """Queue an event for transmission. Returns False if it was dropped or spilled rather than queued."""
+        if self._closed:
+            raise ValueError("{0!r} is closed".format(self))
+        try:
+            if self.when_full == BLOCK:
+                self._queue.put(event_object, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(event_object)
+        except queue.Full:
+            if self.when_full == SPILL:
+                self._spill([self.serialize(event_object)])
+            else:
+                self._count('dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def _spill(self, events):
+        try:
+            self.spill(events)
+        except Exception:
+            logger.exception("Failed to spill {0} events; they are lost".format(len(events)))
+            self._count('failed', len(events))
+        else:
+            self._count('spilled', len(events))
+
+    def _sent(self, events, ingested, seconds):
+        with self._lock:
+            self._counts['ingested'] += ingested
+            self._counts['batches'] += 1
+            self._latencies.append(seconds)
+        if self.controller is not None:
+            self.controller.record_sent(len(events), ingested, seconds)
+
+    def _too_large(self, events):
+        if self.controller is not None:
+            self.controller.record_too_large(len(events))
+
+    def _failed(self, events, exception):
+        if self.controller is not None:
+            self.controller.record_failure(exception, len(events))
+        if isinstance(exception, IngestionIncomplete):
+            logger.warning("Server ingested {0} of a batch of {1} events".format(exception.ingested, exception.sent))
+            with self._lock:
+                self._counts['ingested'] += exception.ingested
+                self._counts['batches'] += 1
+                self._counts['failed'] += exception.sent - exception.ingested
+        elif self.spill is not None:
+            logger.warning("Spilling a batch of {0} events which couldn't be sent: {1!r}".format(len(events), exception))
+            self._spill(events)
+        else:
+            logger.error("Lost a batch of {0} events which couldn't be sent: {1!r}".format(len(events), exception))
+            self._count('failed', len(events))
+
+    def _run(self, index):
+        batch = BatchIngestor(self.connection, self.agent_id, self.trusted, max_events=self.max_events,
+                              max_bytes=self.max_bytes, max_delay=float("inf"), serialize=self.serialize,
+                              on_sent=self._sent, on_failure=self._failed, on_too_large=self._too_large,
+                              pipeline=self.pipeline)
+        stopping = False
+        while not stopping:
+            # Senders beyond the controller's concurrency idle, until it grows or the ingestor closes
+            while self.controller is not None and not self._closed and not self.controller.admit(index, timeout=0.1):
+                pass
+            if self.controller is not None:
+                batch.max_events = self.controller.batch_size
+            try:
+                # A pipeline may hold events, such as repeats, which are due to be sent even if no more arrive
+                gathered = [self._queue.get(timeout=self.max_delay if self.pipeline is not None else None)]
+            except queue.Empty:
+                self._release(batch)
+                continue
+            if gathered[0] is self._STOP:
+                self._release(batch, drain=True)
+                break
+            until = time.time() + self.max_delay
+            while len(gathered) < batch.max_events:
+                try:
+                    event_object = self._queue.get(timeout=max(0, until - time.time()))
+                except queue.Empty:
+                    break
+                if event_object is self._STOP:
+                    stopping = True
+                    break
+                gathered.append(event_object)
+
+            try:
+                for event_object in gathered:
+                    pending = len(batch)
+                    try:
+                        batch.append(event_object)
+                    except Exception:
+                        # Batches already sent were counted by _sent or _failed; only this event and any batch it
+                        # was sending with are lost
+                        lost = 1 + (pending if len(batch) < pending else 0)
+                        logger.exception("Failed to serialize or send {0} events".format(lost))
+                        self._count('failed', lost)
+                try:
+                    batch.flush(drain=stopping)
+                except Exception:
+                    lost = len(batch._take()[0])
+                    logger.exception("Failed to send {0} events".format(lost))
+                    self._count('failed', lost)
+            finally:
+                for _ in gathered:
+                    self._queue.task_done()
+        self._queue.task_done()  # For the stop marker
+
+    def _release(self, batch, drain=False):
+        """Send what the pipeline holds which is due, or all of it."""
+        if self.pipeline is None:
+            return
+        try:
+            batch.flush(drain=drain)
+        except Exception:
+            logger.exception("Failed to send events released by the pipeline")
+            batch._take()
+
+    def flush(self):
+        """Wait until every event queued so far has been sent, spilled or counted as failed."""
+        if self.threads:  # Without workers, nothing will ever be sent
+            self._queue.join()
+
+    def close(self):
+        """Stop accepting events, send those queued and wait for the workers to finish."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self.threads:
+            self._queue.put(self._STOP)
+        for worker in self.threads:
+            worker.join()
+        try:
+            atexit.unregister(self.close)
+        except AttributeError:  # Python 2
+            pass
+
+    def stats(self):
+        """
+        Queue depth, counts of events queued, ingested, dropped, spilled and failed, batches sent, and the median and
+        99th percentile latency of recent batches in seconds. With a pipeline, `filtered` holds its counts.
+        """
+        with self._lock:
+            stats = dict(self._counts)
+            latencies = sorted(self._latencies)
+        stats['depth'] = self._queue.qsize()
+        if self.controller is not None:
+            stats.update(self.controller.operating_point())
+        if self.pipeline is not None:
+            stats['filtered'] = self.pipeline.stats()
+        stats['latency_p50'] = latencies[len(latencies) // 2] if latencies else None
+        stats['latency_p99'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else None
+        return stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        return '{cls}(agent_id={x.agent_id!r}, workers={n}, when_full={x.when_full!r})'.format(
+            cls=self.__class__.__name__, x=self, n=len(self.threads))
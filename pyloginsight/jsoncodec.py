@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The JSON codec used for request bodies, responses, ingestion payloads and reading content packs. Content packs are
+written with the standard library's default formatting, so exports don't change.
+
+The fastest installed implementation is used: orjson, then ujson, then the standard library's json module.
+Every backend produces compact, equivalent JSON: strings, integers and structure come out the same, but floats may be
+spelled differently (1e16 is ``1e+16`` from the standard library, ``1e16`` from some others) while meaning the same value.
+A specific backend can be selected with :py:func:`use`::
+
+    pyloginsight.jsoncodec.use("json")
+"""
+
+import json as _stdlib
+import logging
+
+import six
+
+logger = logging.getLogger(__name__)
+
+_SEPARATORS = (',', ':')
+
+
+def _stdlib_dumps(obj, sort_keys=False):
+    return _stdlib.dumps(obj, separators=_SEPARATORS, ensure_ascii=False, sort_keys=sort_keys)
+
+
+def _stdlib_encode(obj, sort_keys=False):
+    return _stdlib_dumps(obj, sort_keys).encode("utf-8")
+
+
+def _stdlib_decode(data):
+    if isinstance(data, six.binary_type):
+        data = data.decode("utf-8")
+    return _stdlib.loads(data)
+
+
+def _load_orjson():
+    import orjson
+
+    def encode(obj, sort_keys=False):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+        except TypeError:  # Non-string keys, integers beyond 64 bits, ...
+            return _stdlib_encode(obj, sort_keys)
+
+    return encode, orjson.loads
+
+
+def _load_ujson():
+    import ujson
+
+    def encode(obj, sort_keys=False):
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False, sort_keys=sort_keys).encode("utf-8")
+
+    return encode, ujson.loads
+
+
+def _load_stdlib():
+    return _stdlib_encode, _stdlib_decode
+
+
+BACKENDS = (("orjson", _load_orjson), ("ujson", _load_ujson), ("json", _load_stdlib))
+
+backend = None
+_encode = _decode = None
+
+
+def use(name=None):
+    """Select the backend `name`, or the fastest one installed. Raises ImportError if it's unavailable."""
+    global backend, _encode, _decode
+    for candidate, loader in BACKENDS:
+        if name not in (None, candidate):
+            continue
+        try:
+            _encode, _decode = loader()
+        except ImportError:
+            if name is not None:
+                raise
+            continue
+        backend = candidate
+        logger.debug("Using the {0} JSON codec".format(backend))
+        return backend
+    raise ImportError("Unknown JSON codec {0!r}".format(name))
+
+
+def encode(obj, sort_keys=False):
+    """Serialize `obj` to UTF-8 JSON bytes, ready to be sent as a request body."""
+    return _encode(obj, sort_keys)
+
+
+def dumps(obj, sort_keys=False):
+    """Serialize `obj` to a JSON str."""
+    return _encode(obj, sort_keys).decode("utf-8")
+
+
+def decode(data):
+    """Deserialize JSON from bytes or str. Raises ValueError if it's malformed."""
+    return _decode(data)
+
+
+use()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Request metrics, per API endpoint::
+
+    registry = MetricsRegistry()
+    c = Connection("loginsight", auth=Credentials(...), metrics=registry)
+    ...
+    print(registry.prometheus())
+
+Endpoints are URL templates such as ``/users/{id}``, so every object of a collection shares one series. Metrics can be
+scraped in the Prometheus text exposition format, or pushed to StatsD as they are recorded by a :py:class:`StatsdExporter`.
+"""
+
+import bisect
+import contextlib
+import logging
+import re
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+_UNSAFE_STATSD = re.compile(r'[^A-Za-z0-9-]+')
+
+# name: (type, help text, label names)
+FAMILIES = {
+    'requests_total': (COUNTER, "API requests, by response status or 'error' if no response was received.", ('method', 'endpoint', 'status')),
+    'request_duration_seconds': (HISTOGRAM, "Time from sending an API request until its response headers arrived.", ('method', 'endpoint')),
+    'request_bytes_total': (COUNTER, "Bytes of request bodies sent, after compression.", ('method', 'endpoint')),
+    'response_bytes_total': (COUNTER, "Bytes of response bodies received.", ('method', 'endpoint')),
+    'requests_in_flight': (GAUGE, "API requests awaiting a response.", ('method', 'endpoint')),
+    'request_errors_total': (COUNTER, "API requests which failed without a response, by exception.", ('method', 'endpoint', 'error')),
+    'authentications_total': (COUNTER, "Session logins, by reason: 'initial', 'renewal', 'rejected' or 'cached'.", ('reason',)),
+    'cache_requests_total': (COUNTER, "GET requests to a connection with a response cache, by 'hit', 'revalidated' or 'miss'.", ('endpoint', 'result')),
+}
+
+
+class Histogram(object):
+    """Cumulative counts of observations falling under each bucket's upper bound, plus their sum."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Pairs of (upper bound, observations at or below it), ending with +Inf."""
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('{0}="{1}"'.format(k, _escape(v)) for k, v in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry(object):
+    """
+    Thread-safe store of the metrics in :py:data:`FAMILIES`, shared by any number of connections.
+
+    :param prefix: Prepended to every metric name on export
+    :param buckets: Upper bounds of the latency histogram buckets, in seconds
+    """
+
+    def __init__(self, prefix="pyloginsight_", buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._series = dict((name, {}) for name in FAMILIES)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """Have `listener(name, kind, labels, value)` called for every increment, gauge change and observation."""
+        self._listeners.append(listener)
+
+    def _notify(self, name, labels, value):
+        for listener in self._listeners:
+            try:
+                listener(name, FAMILIES[name][0], dict(zip(FAMILIES[name][2], labels)), value)
+            except Exception:
+                logger.exception("Metrics listener {0!r} failed".format(listener))
+
+    def increment(self, name, labels, value=1):
+        """Add `value` to the counter or gauge `name`, for the series identified by the tuple `labels`."""
+        with self._lock:
+            series = self._series[name]
+            series[labels] = series.get(labels, 0) + value
+        self._notify(name, labels, value)
+
+    def observe(self, name, labels, value):
+        """Record `value` in the histogram `name`."""
+        with self._lock:
+            series = self._series[name]
+            if labels not in series:
+                series[labels] = Histogram(self.buckets)
+            series[labels].observe(value)
+        self._notify(name, labels, value)
+
+    def value(self, name, **labels):
+        """The current value of a counter or gauge, or a histogram's number of observations. 0 if never recorded."""
+        key = tuple(labels[n] for n in FAMILIES[name][2])
+        with self._lock:
+            v = self._series[name].get(key, 0)
+            return v.count if isinstance(v, Histogram) else v
+
+    @contextlib.contextmanager
+    def in_flight(self, method, endpoint):
+        self.increment('requests_in_flight', (method, endpoint))
+        try:
+            yield
+        finally:
+            self.increment('requests_in_flight', (method, endpoint), -1)
+
+    def record_request(self, method, endpoint, status, seconds, sent=0, received=0):
+        """Record a request which received a response."""
+        self.increment('requests_total', (method, endpoint, str(status)))
+        self.observe('request_duration_seconds', (method, endpoint), seconds)
+        if sent:
+            self.increment('request_bytes_total', (method, endpoint), sent)
+        if received:
+            self.increment('response_bytes_total', (method, endpoint), received)
+
+    def record_error(self, method, endpoint, error, seconds, sent=0):
+        """Record a request which failed without a response."""
+        self.increment('requests_total', (method, endpoint, "error"))
+        self.increment('request_errors_total', (method, endpoint, error.__class__.__name__))
+        self.observe('request_duration_seconds', (method, endpoint), seconds)
+        if sent:
+            self.increment('request_bytes_total', (method, endpoint), sent)
+
+    def record_authentication(self, reason):
+        self.increment('authentications_total', (reason,))
+
+    def prometheus(self):
+        """Every metric in the Prometheus text exposition format, version 0.0.4."""
+        lines = []
+        with self._lock:
+            for name in sorted(FAMILIES):
+                kind, description, names = FAMILIES[name]
+                series = self._series[name]
+                if not series:
+                    continue
+                full = self.prefix + name
+                lines.append("# HELP {0} {1}".format(full, description))
+                lines.append("# TYPE {0} {1}".format(full, kind))
+                for labels in sorted(series):
+                    v = series[labels]
+                    if kind != HISTOGRAM:
+                        lines.append("{0}{1} {2}".format(full, _labels(names, labels), _number(v)))
+                        continue
+                    for bound, count in v.cumulative():
+                        lines.append("{0}_bucket{1} {2}".format(full, _labels(names, labels, [('le', _number(bound))]), count))
+                    lines.append("{0}_sum{1} {2}".format(full, _labels(names, labels), _number(v.sum)))
+                    lines.append("{0}_count{1} {2}".format(full, _labels(names, labels), v.count))
+        return "\n".join(lines) + "\n"
+
+    def __repr__(self):
+        return '{cls}(prefix={x.prefix!r})'.format(cls=self.__class__.__name__, x=self)
+
+
+class StatsdExporter(object):
+    """
+    Push metrics to a StatsD server over UDP as they are recorded::
+
+        registry.add_listener(StatsdExporter("statsd.example.com"))
+
+    Counters are sent as increments, gauges as relative changes, and histogram observations as timings in milliseconds.
+    Labels become dotted name components, e.g. ``pyloginsight.requests_total.GET.users_id.200``. Send failures are
+    ignored, as UDP metrics are best-effort.
+    """
+
+    def __init__(self, host="localhost", port=8125, prefix="pyloginsight"):
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self._destination = (socket.gethostbyname(host), port)  # Resolved once, rather than for every packet
+        except socket.error:
+            self._destination = self.address
+
+    @staticmethod
+    def _component(value):
+        return _UNSAFE_STATSD.sub("_", str(value)).strip("_") or "_"
+
+    def format(self, name, kind, labels, value):
+        path = ".".join([self.prefix, name] + [self._component(labels[n]) for n in FAMILIES[name][2]])
+        if kind == HISTOGRAM:
+            return "{0}:{1:.3f}|ms".format(path, value * 1000.0)
+        if kind == GAUGE:
+            return "{0}:{1:+d}|g".format(path, value)
+        return "{0}:{1}|c".format(path, value)
+
+    def __call__(self, name, kind, labels, value):
+        try:
+            self._socket.sendto(self.format(name, kind, labels, value).encode("utf-8"), self._destination)
+        except (socket.error, OSError) as e:
+            logger.debug("Could not send metric to StatsD at {0}: {1!r}".format(self.address, e))
+
+    def close(self):
+        self._socket.close()
+
+    def __repr__(self):
+        return '{cls}(host={x.address[0]!r}, port={x.address[1]!r}, prefix={x.prefix!r})'.format(cls=self.__class__.__name__, x=self)
@@ -24,6 +24,7 @@ from .abstracts import ServerProperty, RemoteObjectProxy, ObjectSchema, Envelope
 import attrdict
 from marshmallow import fields
 from .exceptions import TransportError
+from .deadline import Deadline
 from datetime import datetime
 import pytz
 
@@ -114,7 +115,27 @@ class HostSchema(ObjectSchema):
     sourcePath = fields.Str(attribute='source', missing=None)
 
 
-class Hosts(collections.Sequence, ServerAddressableObject):
+class HostPagesMixin(object):
+    """Request bodies and response handling for the paginated /hosts resource, shared with the asyncio client."""
+    _baseurl = '/hosts'
+    _single = Host
+    _basekey = 'hosts'
+    _page_size = 200
+
+    def _page(self, mode, hosts_from, sort_order):
+        """Request body for one page of hosts, starting at the 1-based offset `hosts_from`."""
+        return {'loadMissingHosts': mode, 'from': hosts_from, 'to': hosts_from + self._page_size - 1, 'sortOrder': sort_order}
+
+    def _inflate(self, hosts, sort_order):
+        """Sort raw host dicts by lastReceived and produce Host objects."""
+        for host in sorted(hosts, key=lambda k: k['lastReceived'], reverse=True if sort_order == 'desc' else False):
+            last_received_in_seconds = int(host['lastReceived'] / 1000)
+            date_format = '%Y-%m-%dT%H:%M:%SZ'
+            host['lastReceived'] = datetime.utcfromtimestamp(last_received_in_seconds).strftime(date_format)
+            yield Host.from_dict(connection=self._connection, url=None, data=host)
+
+
+class Hosts(HostPagesMixin, collections.Sequence, ServerAddressableObject):
     """ A Sequence of Host objects returned from Log Insight sorted by their lastReceived property. """
     _baseurl = '/hosts'
     _single = Host
@@ -127,21 +148,14 @@ class Hosts(collections.Sequence, ServerAddressableObject):
         for mode in [True, False]:
             maximum = 100000
             hosts_from = 1
-            hosts_to = 200
             while hosts_from < maximum:
-                response = self._connection.post(self._baseurl, json={'loadMissingHosts': mode,
-                                                                      'from': hosts_from, 'to': hosts_to,
-                                                                      'sortOrder': sort_order})
+                response = self._connection.post(self._baseurl, json=self._page(mode, hosts_from, sort_order))
                 hosts += response['hosts']
-                hosts_from += 200
-                hosts_to += 200
+                hosts_from += self._page_size
                 maximum = response['count']
 
-        for host in sorted(hosts, key=lambda k: k['lastReceived'], reverse=True if sort_order == 'desc' else False):
-            last_received_in_seconds = int(host['lastReceived'] / 1000)
-            date_format = '%Y-%m-%dT%H:%M:%SZ'
-            host['lastReceived'] = datetime.utcfromtimestamp(last_received_in_seconds).strftime(date_format)
-            yield Host.from_dict(connection=self._connection, url=None, data=host)
+        for host in self._inflate(hosts, sort_order):
+            yield host
 
     def __len__(self):
         total = 0
@@ -430,14 +444,89 @@ class Server(object):
 
     # TODO: Model the server features as properties
 
-    def events(self, constraints=(), parameters=None):
+    def events(self, constraints=(), parameters=None, stream=False, timeout=None):
+        """
+        Query for events matching all `constraints`.
+        With `stream=True`, returns a generator which decodes and yields one Event at a time as the response arrives,
+        so memory use doesn't grow with the size of the result.
+        :param timeout: Seconds allowed for the whole query, including retries and reading a streamed response
+        """
         url = "".join([str(c) for c in constraints])
-        result = self._connection.get("/events" + url, params=parameters or {})
         ser = EventSchema()
+        with Deadline(timeout):
+            if stream:
+                return (ser.load({'events': [e]}, many=True, partial=False).data[0]
+                        for e in self._connection.stream("/events" + url, 'events', params=parameters or {}))
+            result = self._connection.get("/events" + url, params=parameters or {})
         parse = ser.load(result, many=True, partial=False)
         return parse.data
 
+    def iter_events(self, constraints=(), start=None, end=None, order="ASC", page_size=1000, parameters=None):
+        """
+        Yield every Event matching all `constraints` from `start` until before `end`, in timestamp order, however many
+        there are. Each page of `page_size` events is streamed, and the next requested from the last timestamp seen,
+        skipping events at that timestamp which were already yielded. A page made up of a single timestamp is
+        requested again with a larger limit, so a run of identical timestamps longer than a page isn't cut short.
+        :param start: datetime or Unix timestamp in milliseconds; None for the beginning of time
+        :param end: datetime or Unix timestamp in milliseconds, excluded; None for now
+        :param order: "ASC" for oldest first, or "DESC" for newest first
+        :param parameters: Other query parameters, such as a Parameter; its limit and order are replaced
+        """
+        from .ingestion import datetime_in_milliseconds
+        from .query import Constraint
+        from . import operator
+
+        order = order.upper()
+        if order not in ("ASC", "DESC"):
+            raise ValueError("order must be 'ASC' or 'DESC'")
+        start, end = [datetime_in_milliseconds(t) if isinstance(t, datetime) else t for t in (start, end)]
+        ser = EventSchema()
+        params = dict(parameters or {})
+        params["order-by-direction"] = order
+
+        cursor = None  # Timestamp of the last event yielded
+        yielded_at_cursor = collections.Counter()  # Those events, by identity
+        limit = page_size
+        while True:
+            bounds = []
+            if start is not None:
+                bounds.append(Constraint("timestamp", operator.GE, start))
+            if end is not None:
+                bounds.append(Constraint("timestamp", operator.LT, end))
+            if cursor is not None:
+                bounds.append(Constraint("timestamp", operator.GE if order == "ASC" else operator.LE, cursor))
+            params["limit"] = limit
+            url = "".join([str(c) for c in list(constraints) + bounds])
+
+            received = 0
+            first = None
+            skip = collections.Counter(yielded_at_cursor)
+            for e in self._connection.stream("/events" + url, 'events', params=params):
+                received += 1
+                timestamp = int(e.get('timestamp', 0))
+                if first is None:
+                    first = timestamp
+                identity = (e.get('text'), timestamp, tuple(sorted((f['name'], f['content']) for f in e.get('fields', []))))
+                if timestamp == cursor and skip[identity] > 0:
+                    skip[identity] -= 1  # Already yielded from the previous page
+                    continue
+                if timestamp != cursor:
+                    cursor = timestamp
+                    yielded_at_cursor.clear()
+                yielded_at_cursor[identity] += 1
+                yield ser.load({'events': [e]}, many=True, partial=False).data[0]
+
+            if received < limit:
+                return
+            # A full page of one timestamp may have more at that timestamp; ask for more than the page at once
+            limit = limit * 2 if first == cursor else page_size
+
     def log(self, event):
-        from .ingestion import transmit
+        """Ingest an Event, or a list of Events in as few requests as possible. Returns the number ingested."""
+        from .ingestion import transmit, BatchIngestor
 
+        if isinstance(event, (list, tuple)):
+            with BatchIngestor(self._connection) as batch:
+                batch.extend(event)
+            return batch.ingested
         return transmit(self._connection, event)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Policies which let a :py:class:`pyloginsight.connection.Connection` ride out an overloaded server::
+
+    Connection("loginsight", auth=..., retry=RetryPolicy(total=5), circuit_breaker=CircuitBreaker())
+
+:py:class:`RetryPolicy` repeats requests which failed with a transient error, after a jittered exponential backoff.
+:py:class:`CircuitBreaker` stops sending requests to an endpoint which keeps failing, and periodically lets one through
+to find out whether it has recovered.
+"""
+
+import email.utils
+import logging
+import random
+import threading
+import time
+
+from .exceptions import CircuitOpen
+
+logger = logging.getLogger(__name__)
+
+# Methods which can be repeated without changing the outcome.
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+def parse_retry_after(value):
+    """Seconds to wait, from a Retry-After header holding either a number of seconds or an HTTP date. None if absent or invalid."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(parsed) - time.time())
+
+
+class RetryPolicy(object):
+    """
+    Decide whether, and after how long, to repeat a failed request.
+
+    Only `methods` are retried; by default those which are idempotent. A request is retried when the connection fails,
+    or when the server responds with one of `statuses`. The n-th retry waits for a random time up to
+    `backoff_factor * 2**n` seconds, capped at `max_backoff`, unless the server asked for a specific delay with Retry-After.
+    That delay is also capped at `max_backoff`, so a bad or hostile value can't stall the caller.
+
+    Retries are logged, counted in `retries` and `waited`, and reported to `on_retry(method, url, attempt, wait, reason)`.
+    """
+
+    def __init__(self, total=3, backoff_factor=0.5, max_backoff=30, statuses=(429, 502, 503, 504), methods=IDEMPOTENT_METHODS,
+                 respect_retry_after=True, on_retry=None):
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(m.upper() for m in methods)
+        self.respect_retry_after = respect_retry_after
+        self.on_retry = on_retry
+
+        self.retries = 0  # Total retries performed under this policy
+        self.waited = 0.0  # Total seconds spent waiting before retries
+        self._lock = threading.Lock()
+
+    def is_retryable(self, method, attempt, status_code=None):
+        """
+        :param attempt: How many times the request has already been retried
+        :param status_code: The response's status, or None if the connection failed
+        """
+        if attempt >= self.total or method.upper() not in self.methods:
+            return False
+        return status_code is None or status_code in self.statuses
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait before the retry numbered `attempt` (from 0)."""
+        if self.respect_retry_after:
+            wait = parse_retry_after(retry_after)
+            if wait is not None:
+                return min(wait, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+    def record(self, method, url, attempt, wait, reason):
+        with self._lock:
+            self.retries += 1
+            self.waited += wait
+        logger.warning("Retrying {0} {1} in {2:.2f}s (retry {3} of {4}) after {5}".format(method, url, wait, attempt + 1, self.total, reason))
+        if self.on_retry is not None:
+            self.on_retry(method, url, attempt, wait, reason)
+
+    def __repr__(self):
+        return '{cls}(total={x.total!r}, backoff_factor={x.backoff_factor!r}, max_backoff={x.max_backoff!r})'.format(cls=self.__class__.__name__, x=self)
+
+
+class CircuitBreaker(object):
+    """
+    Fail fast while an endpoint is saturated, instead of piling more load onto it.
+
+    Each endpoint has its own circuit. After `failure_threshold` consecutive failures (connection errors or responses
+    with one of `statuses`) the circuit opens, and requests raise :py:class:`pyloginsight.exceptions.CircuitOpen` without
+    reaching the server. After `reset_timeout` seconds the circuit is half-open: a single trial request is let through,
+    and its outcome closes the circuit again or re-opens it.
+
+    State changes are logged and reported to `on_state_change(endpoint, old_state, new_state)`.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, statuses=(429, 500, 502, 503, 504), on_state_change=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.statuses = frozenset(statuses)
+        self.on_state_change = on_state_change
+        self._circuits = {}  # endpoint -> [state, consecutive failures, opened at]
+        self._lock = threading.Lock()
+
+    def _transition(self, endpoint, circuit, state):
+        """Change a circuit's state, under the lock. Returns the change, to be reported by :py:meth:`_report`."""
+        old, circuit[0] = circuit[0], state
+        if state == OPEN:
+            circuit[2] = time.time()
+        if state == CLOSED:
+            circuit[1] = 0
+        return endpoint, old, state
+
+    def _report(self, change):
+        """Log and report a change, outside the lock, so `on_state_change` may inspect the breaker."""
+        if change is None:
+            return
+        endpoint, old, state = change
+        logger.warning("Circuit for {0} is {1} (was {2})".format(endpoint, state, old))
+        if self.on_state_change is not None:
+            self.on_state_change(endpoint, old, state)
+
+    def state(self, endpoint):
+        with self._lock:
+            return self._circuits.get(endpoint, [CLOSED])[0]
+
+    def states(self):
+        """A snapshot of every endpoint's circuit state."""
+        with self._lock:
+            return dict((endpoint, circuit[0]) for endpoint, circuit in self._circuits.items())
+
+    def before(self, endpoint):
+        """Called before each request. Raises CircuitOpen if the request should not be attempted."""
+        with self._lock:
+            circuit = self._circuits.setdefault(endpoint, [CLOSED, 0, None])
+            if circuit[0] == CLOSED:
+                return
+            if circuit[0] != OPEN or time.time() - circuit[2] < self.reset_timeout:
+                raise CircuitOpen("Circuit for {0} is {1}; not sending request".format(endpoint, circuit[0]))
+            change = self._transition(endpoint, circuit, HALF_OPEN)  # This request is the trial
+        self._report(change)
+
+    def record(self, endpoint, status_code=None):
+        """Called after each attempt with the response status, or None if the connection failed."""
+        failed = status_code is None or status_code in self.statuses
+        change = None
+        with self._lock:
+            circuit = self._circuits.setdefault(endpoint, [CLOSED, 0, None])
+            if not failed:
+                if circuit[0] != CLOSED:
+                    change = self._transition(endpoint, circuit, CLOSED)
+                circuit[1] = 0
+            else:
+                circuit[1] += 1
+                if circuit[0] == HALF_OPEN or (circuit[0] == CLOSED and circuit[1] >= self.failure_threshold):
+                    change = self._transition(endpoint, circuit, OPEN)
+        self._report(change)
+
+    def abandon(self, endpoint):
+        """Called when an attempt ended without a verdict on the server's health, so a half-open circuit can try again."""
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is not None and circuit[0] == HALF_OPEN:
+                logger.debug("Trial request for {0} was abandoned".format(endpoint))
+                circuit[0] = OPEN  # Keeps the original opened-at time, so the next request is another trial
+
+    def __repr__(self):
+        return '{cls}(failure_threshold={x.failure_threshold!r}, reset_timeout={x.reset_timeout!r})'.format(cls=self.__class__.__name__, x=self)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Persistent cache of session bearer tokens, so short-lived processes can skip the login::
+
+    creds = Credentials("admin", "secret", "Local", cache=SessionCache())
+
+The cache is a JSON file readable only by its owner. Concurrent processes serialize on an adjacent lock file,
+and every write replaces the file atomically, so readers never observe a partial update.
+"""
+
+import contextlib
+import errno
+import json
+import logging
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows; rely on the atomic rename alone
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+def default_path():
+    return os.path.join(os.path.expanduser("~"), ".pyloginsight", "sessions.json")
+
+
+class SessionCache(object):
+    """A file of session tokens keyed by server hostname, port, username and authentication provider."""
+
+    def __init__(self, path=None):
+        self.path = path or default_path()
+
+    @staticmethod
+    def key(netloc, username, provider):
+        """
+        :param netloc: The server's "hostname:port"
+        """
+        return "{0}@{1}/{2}".format(username, provider, netloc)
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive):
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, 0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            os.close(fd)  # Releases the lock
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _write(self, entries):
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix=".sessions")  # mkstemp creates 0600 files
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+            _replace(temporary, self.path)
+        finally:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+
+    def get(self, key):
+        """Return a tuple of (sessionId, expires) for an unexpired session, or None."""
+        with self._locked(exclusive=False):
+            entry = self._read().get(key)
+        if entry is None:
+            return None
+        if entry.get('expires') is not None and entry['expires'] <= time.time():
+            return None
+        return entry['sessionId'], entry.get('expires')
+
+    def put(self, key, sessionId, expires):
+        """Record a session, and forget any others which have expired."""
+        now = time.time()
+        with self._locked(exclusive=True):
+            entries = dict((k, v) for k, v in self._read().items() if v.get('expires') is None or v['expires'] > now)
+            entries[key] = {'sessionId': sessionId, 'expires': expires}
+            self._write(entries)
+        logger.debug("Cached session for {0} in {1}".format(key, self.path))
+
+    def discard(self, key):
+        with self._locked(exclusive=True):
+            entries = self._read()
+            if entries.pop(key, None) is not None:
+                self._write(entries)
+
+    def __repr__(self):
+        return '{cls}(path={x.path!r})'.format(cls=self.__class__.__name__, x=self)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A write-ahead spool on disk for events which couldn't be sent, replayed once the server is reachable again::
+
+    spool = Spool("/var/spool/myapp")
+    transmit(connection, event, spool=spool)            # Spooled if the server can't be reached
+    ingestor = BackgroundIngestor(connection, when_full=SPILL, spill=spool.append)
+    ...
+    spool.replay(connection)
+
+The spool is a directory of append-only segment files. Each record is a batch of serialized CFAPI events, as JSON,
+behind its length and CRC-32. A closed segment's number of events is kept beside it, in a file of the same name ending
+``.count``, so discarding a segment doesn't mean reading it. Segments are read back through mmap and replayed in order. A record which is truncated or
+fails its checksum, such as one being written when the process died, ends its segment. The position of the last
+acknowledged record is checkpointed so a restarted process resumes where the last one stopped, and fully acknowledged
+segments are deleted. When the spool grows beyond `max_bytes`, its oldest segments are discarded. A record the server
+rejects outright, rather than failing to answer, is logged and passed to `on_rejected`, and replay moves past it.
+"""
+
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+
+import requests
+
+from . import jsoncodec
+from .exceptions import ServerError
+
+logger = logging.getLogger(__name__)
+
+_RECORD = struct.Struct(">II")  # Length of the JSON which follows, and its CRC-32
+_SEGMENT = re.compile(r'^(\d{20})\.seg$')
+_CHECKPOINT = "acknowledged"
+_COUNT = "{0:020d}.count"
+
+_replace = getattr(os, "replace", os.rename)  # Python 2 has only rename, which is atomic on POSIX
+
+
+class Spool(object):
+    """
+    :param directory: Created if it doesn't exist. Only one Spool should use a directory at a time.
+    :param segment_bytes: A new segment is started once the current one reaches this size
+    :param max_bytes: The oldest segments are discarded to keep the spool below this size
+    :param fsync: Sync each record to disk before append returns, to survive power loss as well as process exit
+    :param on_rejected: Called as `on_rejected(events, exception)` with each replayed record the server rejected, such
+    as to keep it elsewhere for inspection
+    """
+
+    def __init__(self, directory, segment_bytes=16 * 1024 * 1024, max_bytes=512 * 1024 * 1024, fsync=False, on_rejected=None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.on_rejected = on_rejected
+        self.discarded = 0  # Events, in segments discarded to stay under max_bytes
+        self.rejected = 0  # Events, in replayed records the server rejected
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._lock = threading.RLock()
+        self._replaying = threading.Lock()
+        self._file = None
+        self._events = 0  # In the current segment
+        self._sequence = max(self.segments() + [self._checkpoint()[0]])  # Appends always start a new segment
+        self._bytes = self.size
+        for sequence in self.segments():
+            if self._segment_events(sequence) is None:  # The process stopped while writing it
+                self._write_count(sequence, sum(len(events) for _, events in self.read(sequence)))
+
+    def _path(self, sequence):
+        return os.path.join(self.directory, "{0:020d}.seg".format(sequence))
+
+    def _segment_events(self, sequence):
+        """The number of events in a closed segment, from its count file; None if there isn't one."""
+        try:
+            with open(os.path.join(self.directory, _COUNT.format(sequence))) as f:
+                return int(f.read())
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _write_count(self, sequence, events):
+        with open(os.path.join(self.directory, _COUNT.format(sequence)), "w") as f:
+            f.write(str(events))
+
+    def segments(self):
+        """Sequence numbers of the segments on disk, oldest first."""
+        return sorted(int(m.group(1)) for m in (_SEGMENT.match(name) for name in os.listdir(self.directory)) if m)
+
+    @property
+    def size(self):
+        """Bytes on disk, including acknowledged records in segments which haven't been deleted yet."""
+        return sum(os.path.getsize(self._path(s)) for s in self.segments())
+
+    def append(self, events):
+        """Write a list of serialized events as one record."""
+        if not events:
+            return
+        body = jsoncodec.encode(list(events))
+        record = _RECORD.pack(len(body), zlib.crc32(body) & 0xffffffff) + body
+        with self._lock:
+            if self._file is None or self._file.tell() >= self.segment_bytes:
+                self._roll()
+            self._file.write(record)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._events += len(events)
+            self._bytes += len(record)
+            if self.max_bytes is not None and self._bytes > self.max_bytes:
+                self._enforce_cap()
+
+    def _roll(self):
+        """Close the current segment and start another."""
+        self._close_current()
+        self._sequence += 1
+        self._file = open(self._path(self._sequence), "ab")
+
+    def _close_current(self):
+        """Close the current segment, recording its number of events; the next append starts another."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._write_count(self._sequence, self._events)
+            self._events = 0
+
+    def _enforce_cap(self):
+        with self._lock:
+            segments = self.segments()
+            sizes = dict((s, os.path.getsize(self._path(s))) for s in segments)
+            total = sum(sizes.values())
+            for sequence in segments:
+                if total <= self.max_bytes or sequence == self._sequence:
+                    break
+                events = self._segment_events(sequence) or 0
+                logger.warning("Spool is over {0} bytes; discarding segment {1} of {2} events".format(self.max_bytes, sequence, events))
+                self._remove(sequence)
+                self.discarded += events
+                total -= sizes[sequence]
+            self._bytes = total
+
+    def read(self, sequence, offset=0):
+        """Yield (offset after record, events) for each intact record of a segment, starting at byte `offset`."""
+        with open(self._path(sequence), "rb") as f:
+            if os.fstat(f.fileno()).st_size <= offset:
+                return
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                while offset + _RECORD.size <= len(view):
+                    length, crc = _RECORD.unpack_from(view, offset)
+                    start, end = offset + _RECORD.size, offset + _RECORD.size + length
+                    body = view[start:end]
+                    if len(body) < length or zlib.crc32(body) & 0xffffffff != crc:
+                        logger.warning("Spool segment {0} has a damaged record at byte {1}; skipping the rest".format(sequence, offset))
+                        return
+                    offset = end
+                    yield offset, jsoncodec.decode(body)
+            finally:
+                view.close()
+
+    def _checkpoint(self):
+        try:
+            with open(os.path.join(self.directory, _CHECKPOINT)) as f:
+                sequence, offset = f.read().split()
+            return int(sequence), int(offset)
+        except (IOError, OSError, ValueError):
+            return 0, 0
+
+    def _acknowledge(self, sequence, offset):
+        """Record the position of the last acknowledged record, replacing the checkpoint atomically."""
+        path = os.path.join(self.directory, _CHECKPOINT)
+        with open(path + ".tmp", "w") as f:
+            f.write("{0} {1}".format(sequence, offset))
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(path + ".tmp", path)
+
+    def replay(self, connection, agent_id="1", trusted=False):
+        """
+        Send every spooled record to the server in order, deleting segments as they are fully acknowledged.
+        Records the server rejects are skipped. Stops at the first record which fails for want of a working server,
+        raising its exception; the next replay resumes from it. Events may be appended while a replay is sending.
+        :return: The number of events ingested
+        """
+        from .ingestion import _post_events, _transient
+
+        ingested = 0
+        with self._replaying:
+            with self._lock:
+                self._close_current()  # Appends from here on go to a new segment, replayed next time
+                acknowledged, position = self._checkpoint()
+                segments = self.segments()
+            try:
+                for sequence in segments:
+                    if sequence < acknowledged:
+                        self._remove(sequence)  # Acknowledged, but not yet deleted when the process stopped
+                        continue
+                    records = self.read(sequence, position if sequence == acknowledged else 0)
+                    while True:
+                        with self._lock:  # Read a record under the lock, but send it outside, so appends go on
+                            try:
+                                record = next(records, None)
+                            except (IOError, OSError):
+                                logger.warning("Spool segment {0} was discarded during replay".format(sequence))
+                                record = None
+                        if record is None:
+                            break
+                        offset, events = record
+                        ingested += self._replay_record(connection, agent_id, trusted, events, _post_events, _transient)
+                        with self._lock:
+                            self._acknowledge(sequence, offset)
+                    with self._lock:
+                        self._remove(sequence)
+                        self._acknowledge(sequence + 1, 0)
+            finally:
+                with self._lock:
+                    self._bytes = self.size
+        if ingested:
+            logger.info("Replayed {0} spooled events".format(ingested))
+        return ingested
+
+    def _replay_record(self, connection, agent_id, trusted, events, post, transient):
+        """Send one record. Returns the number of events ingested; 0 if the server rejected it."""
+        try:
+            n = post(connection, events, agent_id, trusted)
+        except (requests.RequestException, ValueError, ServerError) as e:
+            if transient(e):
+                raise
+            logger.error("Server rejected {0} replayed events; skipping them: {1!r}".format(len(events), e))
+            self.rejected += len(events)
+            if self.on_rejected is not None:
+                self.on_rejected(events, e)
+            return 0
+        if n < len(events):
+            logger.warning("Server ingested {0} of {1} replayed events".format(n, len(events)))
+        return n
+
+    def _remove(self, sequence):
+        for path in (self._path(sequence), os.path.join(self.directory, _COUNT.format(sequence))):
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Already discarded to stay under max_bytes
+
+    def __len__(self):
+        """The number of events awaiting replay."""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            acknowledged, position = self._checkpoint()
+            return sum(len(events) for sequence in self.segments() if sequence >= acknowledged
+                       for _, events in self.read(sequence, position if sequence == acknowledged else 0))
+
+    def close(self):
+        with self._lock:
+            self._close_current()
+
+    def __repr__(self):
+        return '{cls}(directory={x.directory!r}, max_bytes={x.max_bytes!r})'.format(cls=self.__class__.__name__, x=self)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Incremental decoding of large JSON responses::
+
+    for event in iter_json_array(response.iter_content(65536), "events"):
+        ...
+
+Only the array being iterated over and a single one of its elements are ever held in memory at once, instead of the
+whole response body and its parsed form.
+"""
+
+import codecs
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = " \t\n\r"
+
+
+class _Reader(object):
+    """A text buffer over an iterable of byte chunks, which is refilled on demand and discarded as it's consumed."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._decodejson = json.JSONDecoder().raw_decode
+        self.buffer = u""
+        self.position = 0
+        self.exhausted = False
+
+    def fill(self):
+        """Read another chunk. Returns False at the end of the stream."""
+        if self.exhausted:
+            return False
+        self.buffer = self.buffer[self.position:]
+        self.position = 0
+        for chunk in self._chunks:
+            if chunk:
+                self.buffer += self._decoder.decode(chunk)
+                return True
+        self.buffer += self._decoder.decode(b"", final=True)
+        self.exhausted = True
+        return True
+
+    def peek(self):
+        """The next character other than whitespace, without consuming it. None at the end of the stream."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return None
+
+    def expect(self, characters):
+        c = self.peek()
+        if c is None or c not in characters:
+            raise ValueError("Expected one of {0!r} at offset {1} but found {2!r}".format(characters, self.position, c))
+        self.position += 1
+        return c
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decodejson(self.buffer, self.position)
+            except ValueError:
+                if self.fill():
+                    continue
+                raise
+            # A number which runs to the end of the buffer may continue in the next chunk.
+            if end < len(self.buffer) or self.exhausted:
+                self.position = end
+                return value
+            self.fill()
+
+
+def iter_json_array(chunks, key):
+    """
+    Yield the elements of the array `key` in a JSON object, decoding `chunks` of UTF-8 bytes as they arrive.
+    Other members of the object are skipped. Raises ValueError if the document is malformed, or KeyError if the
+    object has no member `key`.
+    """
+    reader = _Reader(chunks)
+    reader.expect("{")
+    if reader.peek() == "}":
+        raise KeyError(key)
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key:
+            break
+        reader.value()  # Skipped
+        if reader.expect(",}") == "}":
+            raise KeyError(key)
+
+    if reader.peek() == "n" and reader.value() is None:
+        return
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.value()
+        if reader.expect(",]") == "]":
+            return
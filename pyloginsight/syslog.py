@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Send Events to Log Insight as RFC 5424 syslog, an alternative to the ingestion API for high-volume streams::
+
+    with SyslogSender("loginsight.example.com", transport=TLS) as sender:
+        for line in lines:
+            sender.send(Event(text=line, fields={'appname': 'myapp'}))
+
+Over TCP and TLS, messages are framed by octet counting (RFC 6587) and written in batches on a persistent connection,
+which is re-established if it drops. Over UDP, each message is a datagram, and delivery isn't confirmed. An event's
+fields become the parameters of a structured data element, and its text the message.
+"""
+
+import logging
+import select
+import socket
+import ssl
+import threading
+import time
+from datetime import datetime
+
+import pytz
+import six
+
+from .ingestion import truncate_utf8, _FieldNames
+
+logger = logging.getLogger(__name__)
+
+TCP = "tcp"
+TLS = "tls"
+UDP = "udp"
+
+DEFAULT_PORTS = {TCP: 514, UDP: 514, TLS: 6514}
+
+FACILITY_USER = 1
+SEVERITY_INFORMATIONAL = 6
+
+# SD-ID for event fields; an SD-ID with an "@" must carry a private enterprise number, and 6876 is VMware's.
+STRUCTURED_DATA_ID = "fields@6876"
+
+MAXIMUM_DATAGRAM = 8192  # Bytes; longer UDP messages are truncated, on a character boundary
+
+
+def _header_field(value, limit):
+    """A header field of printable US-ASCII without spaces, or the nil value "-"."""
+    value = "".join(c for c in six.text_type(value or "") if "!" <= c <= "~")[:limit]
+    return value or "-"
+
+
+def _escape(value):
+    return six.text_type(value).replace("\\", "\\\\").replace('"', '\\"').replace("]", "\\]")
+
+
+def format_timestamp(dt):
+    """An RFC 3339 timestamp with milliseconds, in UTC. Naive datetimes are taken to be UTC."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(pytz.utc)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + "{0:03d}Z".format(dt.microsecond // 1000)
+
+
+class SyslogSender(object):
+    """
+    :param transport: TCP, TLS or UDP
+    :param port: Defaults to 514, or 6514 for TLS
+    :param ssl_context: For TLS; defaults to one which verifies the server's certificate
+    :param batch_bytes: Over TCP and TLS, messages are buffered and written together once this many bytes are pending,
+    or by :py:meth:`flush`
+    :param hostname: Sent as the HOSTNAME of each message
+    :param app_name: Sent as the APP-NAME of each message
+    """
+
+    def __init__(self, host, port=None, transport=TCP, ssl_context=None, timeout=10, batch_bytes=64 * 1024,
+                 facility=FACILITY_USER, severity=SEVERITY_INFORMATIONAL, hostname=None, app_name="pyloginsight",
+                 reconnect_attempts=3, reconnect_backoff=0.5):
+        if transport not in DEFAULT_PORTS:
+            raise ValueError("transport must be one of {0!r}".format(sorted(DEFAULT_PORTS)))
+        self.address = (host, port or DEFAULT_PORTS[transport])
+        self.transport = transport
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.batch_bytes = batch_bytes
+        self.reconnect_attempts = reconnect_attempts
+        self.reconnect_backoff = reconnect_backoff
+        self.sent = 0  # Messages written to the socket
+
+        self._prefix = "<{0}>1 ".format(facility * 8 + severity)
+        self._origin = " {0} {1} - - ".format(_header_field(hostname or socket.gethostname(), 255), _header_field(app_name, 48))
+        self._names = _FieldNames()
+        self._socket = None
+        self._destination = None  # For UDP, the resolved address datagrams are sent to
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._lock = threading.Lock()
+
+    def format(self, event_object):
+        """The RFC 5424 message for an Event, as bytes."""
+        timestamp = getattr(event_object, 'timestamp', None)
+        fields = event_object.get('fields', None)
+        text = event_object.get('text', None)
+
+        parts = [self._prefix, format_timestamp(timestamp) if isinstance(timestamp, datetime) else "-", self._origin]
+        if fields:
+            parts.append("[" + STRUCTURED_DATA_ID)
+            for k, v in fields.items():
+                parts.append(' {0}="{1}"'.format(self._names[str(k)][:32], _escape(v)))
+            parts.append("]")
+        else:
+            parts.append("-")
+        if text:
+            parts.append(" ")
+            parts.append(text)
+        return u"".join(parts).encode("utf-8")
+
+    def _connect(self):
+        if self.transport == UDP:
+            # The first address the host resolves to, IPv4 or IPv6, as create_connection does for TCP
+            family, socktype, proto, _, self._destination = socket.getaddrinfo(
+                self.address[0], self.address[1], 0, socket.SOCK_DGRAM)[0]
+            self._socket = socket.socket(family, socktype, proto)
+            return
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        if self.transport == TLS:
+            context = self.ssl_context or ssl.create_default_context()
+            sock = context.wrap_socket(sock, server_hostname=self.address[0])
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # Writes are already batched
+        self._socket = sock
+        logger.debug("Connected to syslog at {0}:{1} over {2}".format(self.address[0], self.address[1], self.transport))
+
+    def _disconnect(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except (socket.error, OSError):
+                pass
+            self._socket = None
+
+    def _closed_by_peer(self):
+        """
+        Whether the server has closed the connection. Syslog servers never write, so over TCP a readable socket means it
+        has; without this check, the first write after a close would appear to succeed and be lost. Over TLS, the socket
+        is also readable when the server sends a record other than data, such as a TLS 1.3 session ticket, so it's read
+        without blocking, and a read which needs more input means the connection is still open.
+        """
+        try:
+            readable, _, _ = select.select([self._socket], [], [], 0)
+            if not readable:
+                return False
+            if not isinstance(self._socket, ssl.SSLSocket):
+                return not self._socket.recv(1)
+            self._socket.setblocking(False)
+            try:
+                return not self._socket.recv(1)
+            except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                return False
+            finally:
+                self._socket.settimeout(self.timeout)
+        except (socket.error, OSError, ValueError):
+            return True
+
+    def send(self, event_object):
+        """Send an Event; over TCP and TLS, once enough are buffered or on :py:meth:`flush`."""
+        message = self.format(event_object)
+        with self._lock:
+            if self.transport == UDP:
+                self._send_datagram(message)
+                return
+            self._buffer.append(str(len(message)).encode("ascii") + b" " + message)
+            self._buffered_bytes += len(self._buffer[-1])
+            if self._buffered_bytes >= self.batch_bytes:
+                self._write()
+
+    def send_many(self, event_objects):
+        for event_object in event_objects:
+            self.send(event_object)
+
+    def _send_datagram(self, message):
+        if self._socket is None:
+            self._connect()
+        try:
+            if len(message) > MAXIMUM_DATAGRAM:
+                message = truncate_utf8(message, MAXIMUM_DATAGRAM).encode("utf-8")
+            self._socket.sendto(message, self._destination)
+            self.sent += 1
+        except (socket.error, OSError) as e:
+            logger.debug("Could not send a syslog datagram to {0}: {1!r}".format(self.address, e))
+
+    def _write(self):
+        """Write the buffered messages, reconnecting if the connection has dropped."""
+        if not self._buffer:
+            return
+        data = b"".join(self._buffer)
+        for attempt in range(self.reconnect_attempts + 1):
+            try:
+                if self._socket is not None and self._closed_by_peer():
+                    self._disconnect()
+                if self._socket is None:
+                    self._connect()
+                self._socket.sendall(data)
+                break
+            except (socket.error, OSError) as e:  # ssl.SSLError is a socket.error
+                self._disconnect()
+                if attempt == self.reconnect_attempts:
+                    raise
+                logger.warning("Syslog connection to {0}:{1} failed ({2!r}); reconnecting".format(self.address[0], self.address[1], e))
+                time.sleep(self.reconnect_backoff * 2 ** attempt)
+        self.sent += len(self._buffer)
+        self._buffer = []
+        self._buffered_bytes = 0
+
+    def flush(self):
+        """Write any buffered messages."""
+        with self._lock:
+            self._write()
+
+    def close(self):
+        with self._lock:
+            try:
+                self._write()
+            finally:
+                self._disconnect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        return '{cls}(host={x.address[0]!r}, port={x.address[1]!r}, transport={x.transport!r})'.format(
+            cls=self.__class__.__name__, x=self)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# VMware vRealize Log Insight SDK
+# Copyright (c) 2018 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Follow log files and ship new lines to Log Insight, for hosts without the Log Insight agent::
+
+    agent = TailAgent(connection, ["/var/log/app.log"], checkpoint="/var/lib/app/tail.json",
+                      fields={'appname': 'app'}, multiline=r'\\d{4}-\\d\\d-\\d\\d ')
+    agent.run()
+
+Files are read in large chunks and split into lines. With `multiline`, a regex matching the first line of each
+record, following lines which don't match, such as a stack trace, join the record before them. Rotation by renaming
+and truncation in place are both followed. After each batch the server acknowledges, the byte offset of the last
+record sent from each file is written to the checkpoint file, so a restarted agent neither skips nor repeats lines.
+Should a send fail because the server couldn't be reached or was overloaded, the same events are sent again on the
+next poll, so delivery is at least once. A batch the server rejects outright is logged, passed to `on_rejected`, and
+moved past, so that one malformed event can't stop the agent.
+
+The ``li-tail`` command runs an agent from the command line.
+"""
+
+import json
+import logging
+import os
+import re
+import time
+
+import requests
+import six
+
+from .exceptions import ServerError
+from .ingestion import BatchIngestor, MAXIMUM_BYTES_TEXT_FIELD, truncate_utf8, _FieldNames, _transient
+from .spool import _replace
+
+logger = logging.getLogger(__name__)
+
+
+class FileFollower(object):
+    """
+    Reads complete lines appended to a file, across rotation and truncation.
+
+    :param inode: With `offset`, where a previous follower stopped; used only if the file is still the same inode
+    :param from_end: Start a file without a usable checkpoint at its end, rather than its beginning
+    """
+
+    def __init__(self, path, offset=0, inode=None, chunk_size=1024 * 1024, from_end=False):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.inode = None
+        self.offset = 0  # Just past the last complete line returned
+        self._file = None
+        self._buffer = b""
+        self._open(offset, inode, from_end)
+
+    def _open(self, offset=0, inode=None, from_end=False):
+        try:
+            f = open(self.path, "rb")
+        except (IOError, OSError):
+            return False
+        st = os.fstat(f.fileno())
+        if inode is not None and st.st_ino == inode and offset <= st.st_size:
+            start = offset
+        elif from_end:
+            start = st.st_size
+        else:
+            start = 0
+        f.seek(start)
+        self._file, self.inode, self.offset, self._buffer = f, st.st_ino, start, b""
+        return True
+
+    def _replaced(self):
+        """Whether the path now names a different file, or ours was truncated below what was read."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False  # Rotated away, and not yet recreated
+        return st.st_ino != self.inode or st.st_size < self.offset + len(self._buffer)
+
+    def read_lines(self):
+        """
+        Lines appended since the last call, without their line endings, each with the offset just past it.
+        Reads at most one chunk. At the end of a file which has been rotated or truncated, returns any unterminated
+        last line and moves on to the start of the file now at the path.
+        """
+        if self._file is None and not self._open():
+            return []
+        data = self._file.read(self.chunk_size)
+        lines = self._split(data)
+        if len(data) < self.chunk_size and self._replaced():
+            if self._buffer:  # The old file ended without a newline
+                self.offset += len(self._buffer)
+                lines.append((self._buffer.rstrip(b"\r"), self.offset))
+            logger.info("{0} was rotated or truncated; reading it from the start".format(self.path))
+            self._file.close()
+            self._file = None
+            self._open()
+        return lines
+
+    def _split(self, data):
+        if not data:
+            return []
+        data = self._buffer + data
+        end = data.rfind(b"\n")
+        if end < 0:
+            self._buffer = data
+            return []
+        self._buffer = data[end + 1:]
+        lines = []
+        position = self.offset
+        for line in data[:end].split(b"\n"):
+            position += len(line) + 1
+            lines.append((line[:-1] if line.endswith(b"\r") else line, position))
+        self.offset = position
+        return lines
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class MultilineAssembler(object):
+    """
+    Joins lines into records. A line matching `start` begins a new record, and other lines are appended to the
+    current one. Without `start`, every line is a record.
+    """
+
+    def __init__(self, start=None, max_lines=1000):
+        if isinstance(start, six.text_type):
+            start = start.encode("utf-8")
+        self.start = re.compile(start) if start else None
+        self.max_lines = max_lines
+        self.updated = None  # When the pending record last grew
+        self._lines = []
+        self._end = None
+
+    def feed(self, line, end):
+        """Add a line ending at offset `end`. Returns the records it completes, as (text, offset after the record)."""
+        if self.start is None:
+            return [(line, end)]
+        done = self.flush() if self._lines and self.start.match(line) else []
+        self._lines.append(line)
+        self._end = end
+        self.updated = time.time()
+        if len(self._lines) >= self.max_lines:
+            done.extend(self.flush())
+        return done
+
+    def flush(self):
+        """Complete the pending record, if there is one."""
+        if not self._lines:
+            return []
+        record = (b"\n".join(self._lines), self._end)
+        self._lines, self._end = [], None
+        return [record]
+
+    @property
+    def pending(self):
+        return bool(self._lines)
+
+
+class Checkpoint(object):
+    """Offsets of each followed file, by path, as JSON. Saved by replacing the file, so it's never left half-written."""
+
+    def __init__(self, path):
+        self.path = path
+        self.positions = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.positions = dict((k, tuple(v)) for k, v in json.load(f).items())
+
+    def get(self, path):
+        """(inode, offset) of a file, or (None, 0)."""
+        return self.positions.get(path, (None, 0))
+
+    def save(self, positions):
+        self.positions.update(positions)
+        if not self.path:
+            return
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(self.positions, f)
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(self.path + ".tmp", self.path)
+
+
+class TailAgent(object):
+    """
+    Ships lines appended to `paths`, each as an event with a `filepath` field and any others in `fields`.
+
+    :param checkpoint: File to record offsets in, or None to keep them only in memory
+    :param multiline: Regex matching the first line of each record, if records span lines
+    :param multiline_timeout: Seconds after which a record no more lines have joined is sent anyway
+    :param on_rejected: Called as `on_rejected(events, exception)` with the events of each poll the server rejected,
+    such as to keep them elsewhere for inspection
+    :param batch_options: Passed to the :py:class:`pyloginsight.ingestion.BatchIngestor`, such as `max_events`
+    """
+
+    def __init__(self, connection, paths, checkpoint=None, fields=None, multiline=None, multiline_timeout=2.0,
+                 from_end=False, chunk_size=1024 * 1024, agent_id="1", trusted=False, on_rejected=None, **batch_options):
+        self.connection = connection
+        self.checkpoint = Checkpoint(checkpoint)
+        self.multiline_timeout = multiline_timeout
+        self.agent_id = agent_id
+        self.trusted = trusted
+        self.on_rejected = on_rejected
+        self.batch_options = batch_options
+        self.ingested = 0
+        self.rejected = 0  # Events, in polls the server rejected
+
+        names = _FieldNames()
+        self._files = []
+        for path in paths:
+            inode, offset = self.checkpoint.get(path)
+            content = dict(fields or {}, filepath=path)
+            self._files.append((FileFollower(path, offset, inode, chunk_size, from_end), MultilineAssembler(multiline),
+                                [{'name': names[str(k)], 'content': str(v)} for k, v in content.items()]))
+        self._unsent = []  # Events from a poll whose batch failed, with the positions they'd acknowledge
+        self._positions = {}
+
+    def _event(self, text, fields):
+        return {'text': truncate_utf8(text.decode("utf-8", "replace"), MAXIMUM_BYTES_TEXT_FIELD), 'fields': fields}
+
+    def poll(self):
+        """
+        Read what has been appended to each file and send it.
+        :return: The number of events ingested
+        """
+        if not self._unsent:
+            now = time.time()
+            for follower, assembler, fields in self._files:
+                inode = follower.inode
+                records = []
+                for line, end in follower.read_lines():  # All from the file as it was before any rotation
+                    records.extend(assembler.feed(line, end))
+                if follower.inode != inode or (assembler.pending and now - assembler.updated >= self.multiline_timeout):
+                    records.extend(assembler.flush())
+                if records:
+                    self._unsent.extend(self._event(text, fields) for text, _ in records)
+                    self._positions[follower.path] = (inode, records[-1][1])
+                if follower.inode != inode and follower.inode is not None:
+                    self._positions[follower.path] = (follower.inode, follower.offset)
+        if not self._unsent:
+            return 0
+
+        batch = BatchIngestor(self.connection, self.agent_id, self.trusted, serialize=_unchanged, **self.batch_options)
+        try:
+            with batch:
+                batch.extend(self._unsent)
+        except (requests.RequestException, ValueError, ServerError) as e:
+            if _transient(e):
+                raise
+            logger.error("Server rejected {0} events; skipping them: {1!r}".format(len(self._unsent), e))
+            self.rejected += len(self._unsent)
+            if self.on_rejected is not None:
+                self.on_rejected(self._unsent, e)
+        self._unsent = []
+        self.checkpoint.save(self._positions)
+        self._positions = {}
+        self.ingested += batch.ingested
+        return batch.ingested
+
+    def run(self, interval=1.0, stop=None, retry_interval=5.0):
+        """
+        Poll until `stop`, a threading.Event, is set; forever if it's None. Polls again immediately while files have
+        more to read, and waits `retry_interval` after a send which failed but may succeed later.
+        """
+        while stop is None or not stop.is_set():
+            try:
+                busy = self.poll()
+            except (Exception, ServerError):
+                logger.exception("Failed to send {0} events; retrying in {1}s".format(len(self._unsent), retry_interval))
+                self._wait(stop, retry_interval)
+                continue
+            if not busy:
+                self._wait(stop, interval)
+        self.close()
+
+    @staticmethod
+    def _wait(stop, seconds):
+        if stop is None:
+            time.sleep(seconds)
+        else:
+            stop.wait(seconds)
+
+    def close(self):
+        for follower, _, _ in self._files:
+            follower.close()
+
+
+def _unchanged(event):
+    return event
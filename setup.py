@@ -58,7 +58,7 @@ class ToxTest(TestCommand):
         errno = main(args)
         sys.exit(errno)
 
-runtime_requirements = ['requests', 'marshmallow', 'attrdict', 'six', 'pytz']
+runtime_requirements = ['requests', 'marshmallow', 'attrdict', 'six', 'pytz', 'futures; python_version < "3"']
 
 setup(
     name='pyloginsight',
@@ -67,6 +67,11 @@ setup(
     license='Apache Software License 2.0',
     author='Alan Castonguay',
     install_requires=runtime_requirements,
+    extras_require={
+        'aio': ['aiohttp'],
+        'speedups': ['orjson'],
+        'columns': ['numpy'],
+    },
     tests_require=runtime_requirements + ["requests_mock", "pytest", "pytest-catchlog", "pytest-flakes", "pytest-pep8"],
     description='VMware vRealize Log Insight Client',
     author_email='acastonguay@vmware.com',
@@ -87,7 +92,8 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            'li = pyloginsight.cli.__main__:main'
+            'li = pyloginsight.cli.__main__:main',
+            'li-tail = pyloginsight.cli.tail:main',
         ]
     },
     cmdclass={'test': PyTest, 'tox': ToxTest}
@@ -10,7 +10,6 @@ import logging
 import pytest
 from requests.adapters import HTTPAdapter
 
-import socket
 import urllib3
 import warnings
 
@@ -27,12 +26,20 @@ if ROOTLOGGER:
     logging.captureWarnings(True)
 
 
-socket.setdefaulttimeout(1)
 urllib3.disable_warnings()
 warnings.simplefilter("ignore", ServerWarning)
 
 ConnectionContainer = namedtuple("Connections", ["clazz", "hostname", "port", "auth", "verify"])
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+collect_ignore = []
+if aiohttp is None or sys.version_info < (3, 5):
+    collect_ignore.append("test_aio.py")  # asyncio transport requires Python 3.5+ and aiohttp
+
 
 def pytest_addoption(parser):
     parser.addoption(
@@ -123,7 +130,7 @@ def licensekey(pytestconfig):
 def connection(servers, licensekey):
     """A pyloginsight.connection to a remote server."""
     c = servers
-    connection_instance = c.clazz(c.hostname, auth=c.auth, port=c.port, verify=c.verify)
+    connection_instance = c.clazz(c.hostname, auth=c.auth, port=c.port, verify=c.verify, timeout=1)
 
     # Lie about port number
     if c.clazz is Connection:
@@ -134,12 +141,30 @@ def connection(servers, licensekey):
     return connection_instance
 
 
+@pytest.fixture
+def mocked_options():
+    """
+    Extra keyword arguments for the `mocked` connection, such as a cache or metrics registry. Override this fixture
+    in a test module, or parametrize it indirectly.
+    """
+    return {}
+
+
+@pytest.fixture
+def mocked(mocked_options):
+    """A MockedConnection, and the mock adapter behind it, for tests which inspect or override the requests it makes."""
+    connection = MockedConnection("mockserverlocal", auth=Credentials("admin", "VMware123!", "Local"), verify=False,
+                                  **mocked_options)
+    yield connection, connection._requestsession.get_adapter(connection._apiroot)
+    connection.close()
+
+
 # Matrix of bad credentials multipled by server list
 @pytest.fixture(params=[Credentials("fake", "fake", "Local"), None])
 def wrong_credential_connection(servers, request, licensekey):
     """A pyloginsight.connection to a remote server, with non-functional credentials."""
     c = servers._replace(auth=request.param)
-    connection_instance = c.clazz(c.hostname, auth=c.auth, port=c.port, verify=c.verify)
+    connection_instance = c.clazz(c.hostname, auth=c.auth, port=c.port, verify=c.verify, timeout=1)
     # Lie about port number
     if c.clazz is Connection:
         adapter = SetHostHeaderAdapter("%s:9543" % c.hostname)
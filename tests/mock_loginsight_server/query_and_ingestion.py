@@ -7,6 +7,7 @@ import logging
 import re
 from functools import wraps
 import time
+import zlib
 from six.moves import urllib
 from pyloginsight import operator
 
@@ -65,6 +66,8 @@ def query_components(fn):
 
 
 class MockedEventDataMixin(requests_mock.Adapter):
+    accept_compressed_bodies = True  # Respond 415 Unsupported Media Type to gzipped ingestion if False
+
     def __init__(self, **kwargs):
         super(MockedEventDataMixin, self).__init__(**kwargs)
 
@@ -84,7 +87,13 @@ class MockedEventDataMixin(requests_mock.Adapter):
 
     @guid
     def __ingest(self, request, context, guid):
-        body = request.json()
+        if request.headers.get('Content-Encoding') == 'gzip':
+            if not self.accept_compressed_bodies:
+                context.status_code = 415
+                return json.dumps({'errorMessage': 'Unsupported Content-Encoding'})
+            body = json.loads(zlib.decompress(request.body, 16 + zlib.MAX_WBITS).decode('utf-8'))
+        else:
+            body = request.json()
         print("Got blob from client", body)
 
         try:
@@ -114,7 +123,12 @@ class MockedEventDataMixin(requests_mock.Adapter):
     @query_components
     def __events(self, request, context, constraints, params, session_id, user_id):
         # (?P<field>[0-9a-z_]+)/(?P<operator>[<>=] (?P)
-        return json.dumps({'events': list(self.__query_filter(constraints))})
+        events = list(self.__query_filter(constraints))
+        if 'order-by-direction' in request.qs:  # Stable, so events sharing a timestamp keep the order they arrived in
+            events.sort(key=lambda e: e['timestamp'], reverse=request.qs['order-by-direction'][0].upper() == "DESC")
+        if 'limit' in request.qs:
+            events = events[:int(request.qs['limit'][0])]
+        return json.dumps({'events': events})
 
     @requiresauthentication
     def __aggregate(self, request, context, session_id, user_id):
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import json
+import threading
+from datetime import datetime
+
+import pytest
+import pytz
+import requests
+
+from pyloginsight.adaptive import AIMDController
+from pyloginsight.exceptions import IngestionIncomplete, TransportError
+from pyloginsight.ingestion import BackgroundIngestor
+from pyloginsight.models import Event
+
+pytestmark = pytest.mark.exampleapi  # Inspects requests made to the mock server
+
+
+def test_grows_batches_then_senders():
+    controller = AIMDController(max_events=200, initial_events=100, max_workers=2, increase=50)
+    controller.record_sent(100, 100, 0.1)
+    assert (controller.batch_size, controller.concurrency) == (150, 1)
+    controller.record_sent(150, 150, 0.1)
+    controller.record_sent(200, 200, 0.1)
+    assert (controller.batch_size, controller.concurrency) == (200, 2)
+    controller.record_sent(200, 200, 0.1)
+    assert (controller.batch_size, controller.concurrency) == (200, 2)
+    assert controller.increases == 3
+    assert controller.latency == pytest.approx(0.1)
+
+
+def test_backs_off_on_overload():
+    controller = AIMDController(initial_events=400, max_workers=4, initial_workers=4, target_latency=1.0)
+    controller.record_sent(400, 400, 2.5)  # Slow: only the batch size shrinks
+    assert (controller.batch_size, controller.concurrency) == (200, 4)
+    controller.record_failure(TransportError(503, {'errorMessage': 'Service unavailable'}))
+    assert (controller.batch_size, controller.concurrency) == (100, 2)
+    controller.record_failure(IngestionIncomplete(100, 60))
+    assert (controller.batch_size, controller.concurrency) == (50, 1)
+    controller.record_failure(requests.ConnectionError())
+    assert (controller.batch_size, controller.concurrency) == (25, 1)
+    assert controller.decreases == 4
+
+    controller.record_failure(TransportError(400, {'errorMessage': 'Bad request'}))
+    assert controller.operating_point()['batch_size'] == 25
+
+
+def test_too_large_caps_the_batch_size():
+    controller = AIMDController(min_events=10, initial_events=1000)
+    controller.record_too_large(600)
+    assert (controller.batch_size, controller.concurrency) == (300, 1)
+    controller.record_too_large(12)
+    assert controller.batch_size == 10
+
+
+def test_halves_of_a_split_batch_do_not_grow_it_back():
+    controller = AIMDController(initial_events=1000, increase=50)
+    controller.record_too_large(1000)
+    controller.record_too_large(500)  # The first half was split again
+    for events in (250, 250, 500):
+        controller.record_sent(events, events, 0.1)
+    assert controller.batch_size == 250
+    controller.record_sent(250, 250, 0.1)
+    assert controller.batch_size == 300
+
+
+def test_failed_half_of_a_split_batch_ends_the_split():
+    controller = AIMDController(initial_events=1000, increase=50)
+    controller.record_too_large(1000)
+    controller.record_sent(500, 500, 0.1)
+    controller.record_failure(TransportError(503, {'errorMessage': 'Service unavailable'}), 500)
+    assert controller.batch_size == 250
+    controller.record_sent(250, 250, 0.1)
+    assert controller.batch_size == 300
+
+
+def test_a_split_only_holds_back_its_own_sender():
+    controller = AIMDController(initial_events=1000, increase=50)
+    controller.record_too_large(1000)
+    other = threading.Thread(target=controller.record_sent, args=(500, 500, 0.1))
+    other.start()
+    other.join()
+    assert controller.batch_size == 550
+
+
+def test_admit():
+    controller = AIMDController(max_events=10, initial_events=10, max_workers=2)
+    assert controller.admit(0, timeout=0)
+    assert not controller.admit(1, timeout=0.01)
+
+    admitted = []
+    waiting = threading.Thread(target=lambda: admitted.append(controller.admit(1, timeout=5)))
+    waiting.start()
+    controller.record_sent(10, 10, 0.01)
+    waiting.join()
+    assert admitted == [True]
+
+
+def test_background_ingestion_with_controller(mocked):
+    connection, adapter = mocked
+    sizes = []
+
+    def ingest(request, context):
+        sizes.append(len(request.json()['events']))
+        return json.dumps({'status': 'ok', 'ingested': sizes[-1]})
+    adapter.register_uri("POST", "https://mockserverlocal:9543/api/v1/events/ingest/1", text=ingest)
+
+    controller = AIMDController(min_events=5, max_events=20, initial_events=5, increase=5, max_workers=2)
+    with BackgroundIngestor(connection, controller=controller, max_delay=0.05) as ingestor:
+        assert len(ingestor.threads) == 2
+        for n in range(200):
+            ingestor.log(Event(text="adaptive {0}".format(n), timestamp=datetime(2018, 1, 1, tzinfo=pytz.utc)))
+        ingestor.flush()
+
+    assert sum(sizes) == 200
+    assert max(sizes) <= 20
+    stats = ingestor.stats()
+    assert stats['ingested'] == 200
+    assert stats['batch_size'] == controller.batch_size > 5
+    assert stats['increases'] > 0
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from pyloginsight.aio import AsyncConnection, AsyncCredentials
+from pyloginsight.exceptions import Unauthorized, ResourceNotFound
+from pyloginsight.models import User
+
+"""asyncio transport, exercised against a minimal aiohttp stand-in for the Log Insight API."""
+
+
+USERS = {"012345678-9ab-cdef-0123-456789abcdef": {"username": "admin", "type": "DEFAULT", "email": "admin@example.com"}}
+
+
+class StandIn(object):
+    def __init__(self):
+        self.logins = 0
+        self.sessions = set()
+        self.app = web.Application()
+        self.app.router.add_post('/api/v1/sessions', self.session_new)
+        self.app.router.add_get('/api/v1/version', self.version)
+        self.app.router.add_get('/api/v1/users', self.users)
+        self.app.router.add_get('/api/v1/users/{guid}', self.user)
+
+    def authorized(self, request):
+        return request.headers.get('Authorization', '')[7:] in self.sessions
+
+    async def session_new(self, request):
+        body = await request.json()
+        if (body['username'], body['password']) != ('admin', 'VMware123!'):
+            return web.json_response({"errorMessage": "Invalid username or password."}, status=401)
+        await asyncio.sleep(0.01)  # Widen the window for concurrent logins
+        self.logins += 1
+        session = "session-%d" % self.logins
+        self.sessions.add(session)
+        return web.json_response({"userId": "012345678-9ab-cdef-0123-456789abcdef", "sessionId": session, "ttl": 1800})
+
+    async def version(self, request):
+        return web.json_response({"version": "4.5.0-5654101", "releaseName": "GA"})
+
+    async def users(self, request):
+        if not self.authorized(request):
+            return web.Response(status=401)
+        return web.json_response({"users": [dict(v, id=k) for k, v in USERS.items()]})
+
+    async def user(self, request):
+        if not self.authorized(request):
+            return web.Response(status=401)
+        guid = request.match_info['guid']
+        if guid not in USERS:
+            return web.Response(status=404, text=json.dumps({"errorMessage": "not found"}))
+        return web.json_response({"user": dict(USERS[guid], id=guid)})
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+@pytest.fixture
+def standin():
+    s = StandIn()
+    server = TestServer(s.app)
+    run(server.start_server())
+    s.port = server.port
+    yield s
+    run(server.close())
+
+
+def connect(standin, auth):
+    return AsyncConnection("127.0.0.1", port=standin.port, ssl=False, auth=auth)
+
+
+def test_unauthenticated_get(standin):
+    async def go():
+        async with connect(standin, None) as c:
+            return await c.server.version()
+    assert run(go()).build == 5654101
+
+
+def test_concurrent_requests_share_one_login(standin):
+    async def go():
+        async with connect(standin, AsyncCredentials("admin", "VMware123!", "Local")) as c:
+            return await asyncio.gather(*[c.server.users.items() for _ in range(20)])
+    results = run(go())
+    assert len(results) == 20
+    assert all(isinstance(item, User) for r in results for _, item in r)
+    assert standin.logins == 1
+
+
+def test_stale_session_is_replaced(standin):
+    creds = AsyncCredentials("admin", "VMware123!", "Local", sessionId="expired")
+
+    async def go():
+        async with connect(standin, creds) as c:
+            return await c.server.users.keys()
+    assert run(go()) == list(USERS.keys())
+    assert creds.sessionId == "session-1"
+
+
+def test_error_mapping(standin):
+    async def go(auth, guid):
+        async with connect(standin, auth) as c:
+            return await c.get("/users/" + guid)
+
+    with pytest.raises(Unauthorized):
+        run(go(AsyncCredentials("admin", "wrong", "Local"), "x"))
+    with pytest.raises(ResourceNotFound):
+        run(go(AsyncCredentials("admin", "VMware123!", "Local"), "nonexistent"))
+
+
+def test_collection_get_raises_keyerror(standin):
+    async def go():
+        async with connect(standin, AsyncCredentials("admin", "VMware123!", "Local")) as c:
+            assert await c.server.users.contains("012345678-9ab-cdef-0123-456789abcdef")
+            assert not await c.server.users.contains("nonexistent")
+            user = await c.server.users.get("012345678-9ab-cdef-0123-456789abcdef")
+            assert user.username == "admin"
+            await c.server.users.get("nonexistent")
+    with pytest.raises(KeyError):
+        run(go())
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import time
+
+import pytest
+import requests_mock
+
+from pyloginsight.cache import ResponseCache
+from pyloginsight.connection import Connection, decode_payload
+from pyloginsight.metrics import MetricsRegistry
+from pyloginsight.models import Users, User
+
+
+pytestmark = pytest.mark.exampleapi  # Inspects requests made to the mock server
+
+
+def requested(adapter, path, method="GET"):
+    return len([r for r in adapter.request_history if r.method == method and r.path == "/api/v1" + path])
+
+
+@pytest.fixture
+def mocked_options():
+    return {'cache': ResponseCache(), 'metrics': MetricsRegistry()}
+
+
+def test_fresh_responses_are_reused(mocked):
+    connection, adapter = mocked
+    users = Users(connection)
+    first = dict((k, v.username) for k, v in users.items())
+    assert dict((k, v.username) for k, v in users.items()) == first
+    assert len(users) == len(first)
+
+    assert requested(adapter, "/users") == 1
+    assert connection.metrics.value('cache_requests_total', endpoint="/users", result="hit") == 2
+
+
+def test_cached_payloads_are_not_shared(mocked):
+    connection, adapter = mocked
+    connection.get("/users")['users'].append("tampered")
+    assert "tampered" not in connection.get("/users")['users']
+
+
+def test_writes_invalidate_the_resource(mocked):
+    connection, adapter = mocked
+    users = Users(connection)
+    before = len(users)
+    new = users.append(User(username="cached", email="c@local.localdom", password="abc!-DEF!-123!"))
+    assert len(users) == before + 1
+    assert users[new].username == "cached"
+
+    del users[new]
+    assert len(users) == before
+    assert requested(adapter, "/users") == 3
+
+
+def test_stale_responses_are_revalidated():
+    served = []
+
+    def version(request, context):
+        if request.headers.get('If-None-Match') == '"v1"':
+            context.status_code = 304
+            served.append(304)
+            return ""
+        context.headers['ETag'] = '"v1"'
+        context.headers['Cache-Control'] = 'no-cache'
+        served.append(200)
+        return '{"version": "4.6.0-1234"}'
+
+    connection = Connection("cachehost", verify=False, cache=ResponseCache())
+    adapter = requests_mock.Adapter()
+    adapter.register_uri("GET", "https://cachehost:9543/api/v1/version", text=version)
+    connection._requestsession.mount("https://", adapter)
+
+    assert connection.get("/version", sendauthorization=False) == {"version": "4.6.0-1234"}
+    assert connection.get("/version", sendauthorization=False) == {"version": "4.6.0-1234"}
+    assert served == [200, 304]
+
+
+def test_cache_control():
+    cache = ResponseCache(ttls={'/users': 60})
+    assert cache.store("/users", "/users", {'Cache-Control': 'no-store'}, b"{}") is None
+    assert cache.store("/hosts", "/hosts", {}, b"{}") is None  # No TTL and no validators
+    assert cache.store("/hosts", "/hosts", {'Cache-Control': 'max-age=5'}, b"{}").fresh
+    assert not cache.store("/users", "/users", {'Cache-Control': 'no-cache', 'ETag': '"x"'}, b"{}").fresh
+    assert cache.store("/users/1", "/users/1", {}, b"{}").fresh_until > time.time() + 50
+    assert len(cache) == 3
+
+    cache.invalidate("/users/1/groups")
+    assert len(cache) == 1
+
+
+def test_entries_are_compressed_and_evicted():
+    cache = ResponseCache(max_entries=2)
+    body = b'{"users": [' + b",".join([b'{"username": "someone"}'] * 1000) + b']}'
+    entry = cache.store("/users", "/users", {}, body)
+    assert len(entry.body) < len(body) / 10
+    assert entry.content == body
+
+    cache.store("/groups", "/groups", {}, b"{}")
+    cache.get("/users")
+    cache.store("/roles", "/roles", {}, b"{}")
+    assert cache.get("/groups") is None
+    assert cache.get("/users") is entry
+
+
+def test_payload_text_is_only_decoded_if_not_json():
+    def text():
+        raise AssertionError("JSON bodies shouldn't be decoded as text")
+    assert decode_payload(b'{"a": 1}', text) == {'a': 1}
+    assert decode_payload(b'<html>', lambda: u"<html>") == u"<html>"
+    assert decode_payload(b'caf\xc3\xa9') == u"café"
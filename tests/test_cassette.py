@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import gzip
+import time
+from datetime import datetime
+
+import pytest
+import pytz
+
+from mock_loginsight_server import MockedConnection
+from pyloginsight import operator
+from pyloginsight.cassette import Cassette, recording, replay
+from pyloginsight.connection import Connection, Credentials
+from pyloginsight.exceptions import NotRecorded
+from pyloginsight.models import Event, Users, User
+from pyloginsight.query import Constraint
+
+
+pytestmark = pytest.mark.exampleapi  # Records the mock server
+
+
+def job(connection):
+    """A little of everything: a login, a collection, objects, a query and an ingestion."""
+    users = Users(connection)
+    new = users.append(User(username="cassette", email="c@local.localdom", password="abc!-DEF!-123!"))
+    return {
+        'users': sorted((k, v.username) for k, v in users.items()),
+        'new': users[new].username,
+        'version': str(connection.server.version),
+        'events': [e.text for e in connection.server.events([Constraint("text", operator.CONTAINS, "time")])],
+        'streamed': [e.text for e in connection.server.events([Constraint("text", operator.CONTAINS, "time")], stream=True)],
+        'ingested': connection.server.log(Event(text="recorded", fields={'appname': 'pyloginsight test'},
+                                                timestamp=datetime(2018, 1, 1, tzinfo=pytz.utc))),
+    }
+
+
+@pytest.fixture
+def cassette_path(tmpdir):
+    return str(tmpdir.join("job.cassette"))
+
+
+def test_record_and_replay(cassette_path):
+    live = MockedConnection("mockserverlocal", auth=Credentials("admin", "VMware123!", "Local"), verify=False)
+    with recording(live, cassette_path) as cassette:
+        expected = job(live)
+    assert len(cassette) > 5
+    assert len(Cassette(cassette_path).load()) == len(cassette)
+    assert expected['events']
+
+    offline = Connection("elsewhere", auth=Credentials("admin", "VMware123!", "Local"))
+    replay(offline, cassette_path)
+    assert job(offline) == expected
+
+    with pytest.raises(NotRecorded):
+        offline.get("/never/requested")
+
+
+def test_cassette_holds_no_credentials(cassette_path):
+    live = MockedConnection("mockserverlocal", auth=Credentials("admin", "VMware123!", "Local"), verify=False)
+    with recording(live, cassette_path):
+        live.get("/sessions/current")
+
+    with gzip.open(cassette_path, "rb") as f:
+        assert b"VMware123!" not in f.read()
+
+
+def test_replay_with_recorded_latency(cassette_path, monkeypatch):
+    live = MockedConnection("mockserverlocal", auth=Credentials("admin", "VMware123!", "Local"), verify=False)
+    with recording(live, cassette_path) as cassette:
+        live.get("/version")
+    for entry in cassette.entries:
+        entry['elapsed'] = 0.5
+    cassette.save()
+
+    waits = []
+    offline = Connection("elsewhere", auth=Credentials("admin", "VMware123!", "Local"))
+    replay(offline, cassette_path, speed=2)
+    monkeypatch.setattr(time, "sleep", waits.append)
+    offline.get("/version")
+    assert waits == [0.25] * len(cassette)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import collections
+import time
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from mock_loginsight_server import LogInsightMockAdapter
+from pyloginsight.cluster import ClusterConnection, LEAST_OUTSTANDING
+from pyloginsight.connection import Credentials
+from pyloginsight.deadline import Deadline
+from pyloginsight.exceptions import DeadlineExceeded
+from pyloginsight.models import Server
+
+
+pytestmark = pytest.mark.exampleapi  # Simulates node failures with the mock server
+
+NODES = ["node1", "node2", "node3"]
+
+
+class RefusingAdapter(BaseAdapter):
+    def send(self, request, **kwargs):
+        raise requests.ConnectionError("Connection refused by {0}".format(request.url))
+
+    def close(self):
+        pass
+
+
+class OverloadedAdapter(LogInsightMockAdapter):
+    def send(self, request, **kwargs):
+        r = super(OverloadedAdapter, self).send(request, **kwargs)
+        r.status_code = 503
+        return r
+
+
+@pytest.fixture
+def cluster():
+    """Three nodes backed by one mock server, so they share sessions and data like a real cluster."""
+    c = ClusterConnection(NODES, auth=Credentials("admin", "VMware123!", "Local"), verify=False, eject_for=60)
+    c.adapter = LogInsightMockAdapter()
+    c._requestsession.mount("https://", c.adapter)
+    return c
+
+
+def nodes_used(cluster):
+    return collections.Counter(r.hostname for r in cluster.adapter.request_history if r.path != "/api/v1/sessions")
+
+
+def test_round_robin_spreads_requests(cluster):
+    for _ in range(6):
+        cluster.get("/version")
+    assert nodes_used(cluster) == {"node1": 2, "node2": 2, "node3": 2}
+
+
+def test_least_outstanding_rotates_ties(cluster):
+    cluster.strategy = LEAST_OUTSTANDING
+    for _ in range(6):
+        cluster.get("/version")
+    assert nodes_used(cluster) == {"node1": 2, "node2": 2, "node3": 2}
+
+
+def test_drop_in_for_server_with_shared_session(cluster):
+    server = Server(cluster)
+    for _ in range(3):
+        assert server.version
+        assert "ttl" in server.current_session
+    assert len(set(nodes_used(cluster))) == 3
+    assert len([r for r in cluster.adapter.request_history if r.path == "/api/v1/sessions"]) == 1
+
+
+def test_connection_error_ejects_node_and_fails_over(cluster):
+    cluster._requestsession.mount("https://node2:9543", RefusingAdapter())
+    for _ in range(6):
+        cluster.get("/version")
+    assert not cluster.nodes[1].healthy
+    assert "node2" not in nodes_used(cluster)
+    assert sum(nodes_used(cluster).values()) == 6
+
+
+def test_connection_error_on_post_is_not_repeated(cluster):
+    cluster._requestsession.mount("https://node1:9543", RefusingAdapter())
+    with pytest.raises(requests.ConnectionError):
+        cluster.post("/events/ingest/0", json={"events": []}, sendauthorization=False)
+    assert not cluster.nodes[0].healthy
+
+
+def test_consecutive_5xx_eject_node(cluster):
+    cluster._requestsession.mount("https://node3:9543", OverloadedAdapter())
+    for _ in range(9):
+        try:
+            cluster.get("/version")
+        except Exception:
+            pass
+    assert not cluster.nodes[2].healthy
+    assert cluster.nodes[0].healthy and cluster.nodes[1].healthy
+
+
+def test_ejected_node_is_probed_and_readmitted(cluster):
+    cluster._requestsession.mount("https://node2:9543", RefusingAdapter())
+    cluster.eject_for = 0
+    for _ in range(3):
+        cluster.get("/version")
+    assert not cluster.nodes[1].healthy
+
+    cluster._requestsession.mount("https://node2:9543", cluster.adapter)
+    cluster.get("/version")
+    assert cluster.nodes[1].healthy
+    assert all(n.outstanding == 0 for n in cluster.nodes)
+
+
+class HangingAdapter(BaseAdapter):
+    def send(self, request, **kwargs):
+        raise requests.ReadTimeout("Read timed out from {0}".format(request.url))
+
+    def close(self):
+        pass
+
+
+def test_timeout_ejects_node_and_releases_it(cluster):
+    cluster.strategy = LEAST_OUTSTANDING
+    cluster._requestsession.mount("https://node1:9543", HangingAdapter())
+    cluster.get("/version")
+    assert not cluster.nodes[0].healthy
+    assert all(n.outstanding == 0 for n in cluster.nodes)
+
+    for node in NODES:
+        cluster._requestsession.mount("https://{0}:9543".format(node), HangingAdapter())
+    with pytest.raises(requests.ReadTimeout):
+        cluster.post("/events/ingest/0", json={"events": []}, sendauthorization=False)
+    assert all(n.outstanding == 0 for n in cluster.nodes)
+
+
+class SlowAdapter(BaseAdapter):
+    """Times out after `seconds`, or the request's whole timeout if that's shorter. Records the timeouts it was given."""
+    def __init__(self, seconds=None):
+        super(SlowAdapter, self).__init__()
+        self.seconds = seconds
+        self.timeouts = []
+
+    def send(self, request, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        limit = max(timeout) if isinstance(timeout, tuple) else timeout
+        time.sleep(limit if self.seconds is None else min(self.seconds, limit))
+        raise requests.ReadTimeout("Read timed out from {0}".format(request.url))
+
+    def close(self):
+        pass
+
+
+def test_timeout_cut_short_by_deadline_does_not_eject(cluster):
+    slow = SlowAdapter()
+    cluster._requestsession.mount("https://node1:9543", slow)
+    with pytest.raises(DeadlineExceeded):
+        with Deadline(0.2):
+            cluster.get("/version")
+    assert len(slow.timeouts) == 1  # Not sent to another node, with no time left
+    assert all(n.healthy and n.outstanding == 0 for n in cluster.nodes)
+
+
+def test_failover_gets_the_deadline_remaining(cluster):
+    slow = SlowAdapter(0.3)
+    cluster._requestsession.mount("https://", slow)
+    with pytest.raises(requests.ReadTimeout):
+        with Deadline(5):
+            cluster.get("/version")
+    timeouts = [t[1] if isinstance(t, tuple) else t for t in slow.timeouts]
+    assert len(timeouts) == 3 and timeouts[0] <= 5
+    assert all(later <= earlier - 0.25 for earlier, later in zip(timeouts, timeouts[1:]))
+    assert not any(n.healthy for n in cluster.nodes)
+
+
+def test_probe_has_a_short_timeout(cluster):
+    slow = SlowAdapter(0)
+    cluster._requestsession.mount("https://node1:9543", slow)
+    cluster.probe_timeout = 0.5
+    cluster.get("/version")
+    cluster.nodes[0].ejected_until = 0
+    cluster.get("/version")
+    assert slow.timeouts[-1] == 0.5
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import json
+import zlib
+
+import pytest
+
+from mock_loginsight_server import MockedConnection
+from pyloginsight.connection import Credentials, gzip_compress
+
+
+pytestmark = pytest.mark.exampleapi  # Inspects the mock server's request history
+
+
+def batch(count):
+    return {"events": [{"text": "repetitive message {0}".format(n), "fields": [{"name": "appname", "content": "pyloginsight test"}]}
+                       for n in range(count)]}
+
+
+def connect(**kwargs):
+    connection = MockedConnection("mockserverlocal", auth=Credentials("admin", "VMware123!", "Local"), verify=False, **kwargs)
+    adapter = connection._requestsession.get_adapter(connection._apiroot)
+    return connection, adapter
+
+
+def test_gzip_compress_round_trip():
+    data = json.dumps(batch(100)).encode("utf-8")
+    compressed = gzip_compress(data)
+    assert zlib.decompress(compressed, 16 + zlib.MAX_WBITS) == data
+    assert len(compressed) * 5 < len(data)
+
+
+def test_large_bodies_are_compressed():
+    connection, adapter = connect(compress_threshold=1024)
+
+    assert connection.post("/events/ingest/0", json=batch(100), sendauthorization=False)["ingested"] == 100
+    request = adapter.request_history[-1]
+    assert request.headers['Content-Encoding'] == 'gzip'
+    assert len(request.body) * 5 < len(json.dumps(batch(100)))
+
+    connection.post("/events/ingest/0", json=batch(1), sendauthorization=False)
+    assert 'Content-Encoding' not in adapter.request_history[-1].headers
+
+
+def test_compression_is_off_by_default():
+    connection, adapter = connect()
+    connection.post("/events/ingest/0", json=batch(100), sendauthorization=False)
+    assert 'Content-Encoding' not in adapter.request_history[-1].headers
+
+
+def test_falls_back_when_server_refuses_compressed_bodies():
+    connection, adapter = connect(compress_threshold=1024)
+    adapter.accept_compressed_bodies = False
+
+    assert connection.post("/events/ingest/0", json=batch(100), sendauthorization=False)["ingested"] == 100
+    assert [r.headers.get('Content-Encoding') for r in adapter.request_history] == ['gzip', None]
+
+    assert connection.post("/events/ingest/0", json=batch(100), sendauthorization=False)["ingested"] == 100
+    assert len(adapter.request_history) == 3  # No second attempt at compression
+
+
+def test_compressed_responses_are_accepted():
+    connection, adapter = connect()
+    body = json.dumps({"events": [{"text": "compressed", "timestamp": 0, "fields": []}] * 50}).encode("utf-8")
+    adapter.register_uri('GET', '/api/v1/events/text/CONTAINS%20compressed', content=gzip_compress(body),
+                         headers={'Content-Encoding': 'gzip', 'Content-Type': 'application/json'})
+
+    assert len(connection.get("/events/text/CONTAINS%20compressed", sendauthorization=False)["events"]) == 50
+    assert len(list(connection.stream("/events/text/CONTAINS%20compressed", "events", sendauthorization=False))) == 50
+    assert 'gzip' in adapter.request_history[-1].headers['Accept-Encoding']
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import pytest
+import threading
+import time
+
+
+pytestmark = pytest.mark.exampleapi  # Inspects the mock server's request history
+
+"""Session renewal: the TTL is honored ahead of time, and concurrent renewals collapse into a single login."""
+
+
+def history(connection):
+    adapter = connection._requestsession.get_adapter(connection._apiroot)
+    return [(r.method, r.path) for r in adapter.request_history]
+
+
+def logins(connection):
+    return [h for h in history(connection) if h == ("POST", "/api/v1/sessions")]
+
+
+def test_login_records_ttl(mocked):
+    connection, _ = mocked
+    before = time.time()
+    connection.get("/sessions/current")
+    assert connection._authprovider.sessionId
+    assert before + 1800 <= connection._authprovider.expires <= time.time() + 1800
+    assert not connection._authprovider.expired
+
+
+def test_first_request_logs_in_without_a_401(mocked):
+    connection, _ = mocked
+    connection.get("/sessions/current")
+    assert history(connection) == [("POST", "/api/v1/sessions"), ("GET", "/api/v1/sessions/current")]
+
+
+def test_session_renewed_before_ttl(mocked):
+    connection, _ = mocked
+    connection.get("/sessions/current")
+    first = connection._authprovider.sessionId
+
+    connection._authprovider.expires = time.time() + 30  # Inside the default 60-second renewal window
+    assert connection._authprovider.expired
+    connection.get("/sessions/current")
+
+    assert connection._authprovider.sessionId != first
+    assert len(logins(connection)) == 2
+    assert len(history(connection)) == 4  # No request was rejected
+
+
+def test_rejected_session_still_recovers(mocked):
+    connection, _ = mocked
+    connection._authprovider.sessionId = "not-a-real-session"
+    assert connection.get("/sessions/current")
+    assert len(logins(connection)) == 1
+
+
+def test_concurrent_renewal_is_single_flight(mocked):
+    connection, _ = mocked
+    errors = []
+
+    def worker():
+        try:
+            connection.get("/sessions/current")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(logins(connection)) == 1
+
+
+def test_login_ahead_of_a_request_uses_the_session_proxies_and_certificate(mocked):
+    connection, adapter = mocked
+    connection._requestsession.proxies = {'https': 'http://proxy.local:3128'}
+    connection._requestsession.cert = '/path/to/client.pem'
+    connection.get("/sessions/current")
+    assert [(r.path, r.proxies, r.cert) for r in adapter.request_history] == [
+        ("/api/v1/sessions", {'https': 'http://proxy.local:3128'}, '/path/to/client.pem'),
+        ("/api/v1/sessions/current", {'https': 'http://proxy.local:3128'}, '/path/to/client.pem')]
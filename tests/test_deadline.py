@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import time
+
+import pytest
+import requests
+
+from mock_loginsight_server import MockedConnection, LogInsightMockAdapter
+from pyloginsight import deadline, operator
+from pyloginsight.connection import Credentials, DEFAULT_TIMEOUT
+from pyloginsight.deadline import Deadline
+from pyloginsight.exceptions import DeadlineExceeded, TransportError
+from pyloginsight.query import Constraint
+from pyloginsight.retry import RetryPolicy, CircuitBreaker, CLOSED
+
+
+pytestmark = pytest.mark.exampleapi  # Slows down the mock server
+
+
+class SlowAdapter(LogInsightMockAdapter):
+    """Takes `delay` seconds to answer each API request, timing out like a real socket would. Logins are instant."""
+    def __init__(self, delay=0.0, **kwargs):
+        super(SlowAdapter, self).__init__(**kwargs)
+        self.delay = delay
+        self.timeouts = []
+
+    def send(self, request, **kwargs):
+        if request.path_url != "/api/v1/sessions":
+            timeout = kwargs.get('timeout')
+            self.timeouts.append(timeout)
+            read = timeout[1] if isinstance(timeout, tuple) else timeout
+            if read is not None and read < self.delay:
+                time.sleep(read)
+                raise requests.ReadTimeout("Read timed out. (read timeout={0})".format(read))
+            if self.delay:
+                time.sleep(self.delay)
+        return super(SlowAdapter, self).send(request, **kwargs)
+
+
+def connect(adapter, **kwargs):
+    connection = MockedConnection("mockserverlocal", auth=Credentials("admin", "VMware123!", "Local"), verify=False, **kwargs)
+    connection._requestsession.mount("https://", adapter)
+    return connection
+
+
+def test_nested_deadlines_only_shorten():
+    assert deadline.expiry() is None
+    with Deadline(10):
+        outer = deadline.expiry()
+        with Deadline(100):
+            assert deadline.expiry() == outer
+        with Deadline(None):
+            assert deadline.expiry() == outer
+        with Deadline(1):
+            assert deadline.expiry() < outer
+        assert deadline.expiry() == outer
+    assert deadline.expiry() is None
+
+
+def test_timeouts_passed_to_every_request():
+    adapter = SlowAdapter()
+    connection = connect(adapter)
+    connection.get("/version")
+    assert adapter.timeouts[-1] == DEFAULT_TIMEOUT
+
+    with Deadline(5):
+        connection.get("/version")
+    connect_timeout, read_timeout = adapter.timeouts[-1]
+    assert 4 < connect_timeout <= 5 and 4 < read_timeout <= 5
+
+    connect(adapter, timeout=3).get("/version")
+    assert adapter.timeouts[-1] == 3
+
+
+def test_expired_deadline_fails_without_a_request():
+    adapter = SlowAdapter()
+    connection = connect(adapter)
+    with Deadline(-1):
+        with pytest.raises(DeadlineExceeded):
+            connection.get("/version")
+    assert adapter.timeouts == []
+
+
+def test_multi_request_operation_shares_one_budget():
+    adapter = SlowAdapter(delay=0.05)
+    connection = connect(adapter)
+    started = time.time()
+    with pytest.raises(DeadlineExceeded):
+        with Deadline(0.22):
+            for _ in range(10):
+                connection.get("/version")
+    assert time.time() - started < 0.5
+    assert 1 < len(adapter.timeouts) <= 5  # The last request was cut short
+
+
+def test_cut_short_request_does_not_trip_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1)
+    connection = connect(SlowAdapter(delay=0.5), circuit_breaker=breaker)
+    with Deadline(0.05):
+        with pytest.raises(DeadlineExceeded):
+            connection.get("/version")
+    assert breaker.state("/version") == CLOSED
+
+
+def test_no_retry_past_the_deadline(monkeypatch):
+    class Unavailable(SlowAdapter):
+        def send(self, request, **kwargs):
+            r = super(Unavailable, self).send(request, **kwargs)
+            if request.path_url != "/api/v1/sessions":
+                r.status_code = 503
+                r.headers['Retry-After'] = "60"
+            return r
+
+    monkeypatch.setattr(time, "sleep", lambda s: pytest.fail("Should not wait for a retry"))
+    adapter = Unavailable()
+    connection = connect(adapter, retry=RetryPolicy(total=3))
+    with Deadline(5):
+        with pytest.raises(TransportError):
+            connection.get("/version")
+    assert len(adapter.timeouts) == 1
+
+
+def test_deadline_propagates_to_submitted_calls():
+    connection = connect(SlowAdapter())
+    with Deadline(5):
+        expected = deadline.expiry()
+        assert connection.submit(deadline.expiry).result() == expected
+    assert connection.submit(deadline.expiry).result() is None
+    connection.close()
+
+
+def test_server_events_timeout():
+    adapter = SlowAdapter()
+    connection = connect(adapter)
+    conditions = [Constraint("text", operator.CONTAINS, "time")]
+    connection.server.events(conditions, timeout=2)
+    assert all(t <= 2 for t in adapter.timeouts[-1])
+    list(connection.server.events(conditions, timeout=2, stream=True))
+    assert all(t <= 2 for t in adapter.timeouts[-1])
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import threading
+import time
+
+import pytest
+import requests
+
+from mock_loginsight_server import MockedConnection, LogInsightMockAdapter
+from pyloginsight.connection import Connection, Credentials
+from pyloginsight.exceptions import ResourceNotFound
+from pyloginsight.models import Users, User
+
+
+pytestmark = pytest.mark.exampleapi  # Counts concurrent requests in the mock server
+
+
+class ConcurrencyCountingAdapter(LogInsightMockAdapter):
+    """Holds each request briefly, recording the most requests which were in flight at once."""
+    def __init__(self, **kwargs):
+        super(ConcurrencyCountingAdapter, self).__init__(**kwargs)
+        self.in_flight = 0
+        self.peak = 0
+        self._counter = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._counter:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(0.01)
+            return super(ConcurrencyCountingAdapter, self).send(request, **kwargs)
+        finally:
+            with self._counter:
+                self.in_flight -= 1
+
+
+def test_map_returns_results_in_order(mocked):
+    connection, _ = mocked
+    users = Users(connection)
+    for n in range(10):
+        users.append(User(username="testuser-{0}".format(n), email="testuser@local.localdom", password="abc!-DEF!-123!"))
+    ids = list(users.keys())
+
+    fetched = list(connection.map(users.__getitem__, ids))
+    assert [u.username for u in fetched] == [users[i].username for i in ids]
+
+
+def test_map_unordered(mocked):
+    connection, _ = mocked
+    urls = ["/version", "/sessions/current", "/licenses"] * 3
+    assert sorted(map(repr, connection.map(connection.get, urls, ordered=False))) == sorted(repr(connection.get(u)) for u in urls)
+
+
+def test_map_collects_exceptions(mocked):
+    connection, _ = mocked
+    urls = ["/version", "/users/00000000-0000-0000-0000-000000000000", "/version"]
+    results = list(connection.map(connection.get, urls, return_exceptions=True))
+    assert isinstance(results[1], ResourceNotFound)
+    assert results[0] == results[2]
+
+    with pytest.raises(ResourceNotFound):
+        list(connection.map(connection.get, urls))
+
+
+def test_submit(mocked):
+    connection, _ = mocked
+    future = connection.submit(connection.get, "/version")
+    assert "version" in future.result()
+
+
+def test_concurrency_capped_per_host():
+    adapter = ConcurrencyCountingAdapter()
+    connection = MockedConnection("mockserverlocal", auth=Credentials("admin", "VMware123!", "Local"), verify=False, max_workers=8, max_per_host=3)
+    connection._requestsession.mount("https://", adapter)
+
+    assert len(list(connection.map(connection.get, ["/version"] * 24))) == 24
+    assert 1 < adapter.peak <= 3
+    connection.close()
+
+
+def test_connection_pools_fit_the_thread_pool():
+    connection = Connection("loginsight.example.com", max_workers=32)
+    adapter = connection._requestsession.get_adapter("https://loginsight.example.com")
+    assert isinstance(adapter, requests.adapters.HTTPAdapter)
+    assert adapter._pool_maxsize == 32
+    connection.executor
+    assert connection._requestsession.get_adapter("https://loginsight.example.com") is adapter
+
+    session = requests.Session()
+    Connection("loginsight.example.com", existing_session=session, max_workers=32)
+    assert session.get_adapter("https://loginsight.example.com")._pool_maxsize == requests.adapters.DEFAULT_POOLSIZE
+    connection.close()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+from __future__ import print_function
+import time
+from datetime import datetime
+
+import pytest
+import pytz
+
+from pyloginsight.filters import Pipeline, RateLimiter, Sampler, Deduplicator
+from pyloginsight.ingestion import BatchIngestor, BackgroundIngestor, serialize_cfapi_event
+from pyloginsight.models import Event
+
+pytestmark = pytest.mark.exampleapi  # Inspects requests made to the mock server
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def event(text, **fields):
+    return serialize_cfapi_event(text, 1514764800000, fields)
+
+
+def fields(e):
+    return dict((f['name'], f['content']) for f in e.get('fields', ()))
+
+
+def test_rate_limiter_per_key(clock):
+    pipeline = Pipeline(RateLimiter(2, burst=3, key='hostname'))
+    passed = [pipeline.process(event("x", hostname="a")) for _ in range(5)]
+    assert [len(p) for p in passed] == [1, 1, 1, 0, 0]
+    assert pipeline.process(event("x", hostname="b")) != []
+
+    clock[0] += 1  # Two more tokens for each key
+    assert sum(len(pipeline.process(event("x", hostname="a"))) for _ in range(5)) == 2
+    assert pipeline.stats()['rate_limited'] == 5
+
+
+def test_rate_limiter_forgets_the_least_recently_used_key(clock):
+    limiter = RateLimiter(1, key='hostname', max_keys=2)
+    for host in "abcab":
+        limiter.process(event("x", hostname=host), clock[0])
+    assert len(limiter._buckets) == 2
+
+
+def test_sampler_records_rate():
+    sampler = Pipeline(Sampler(4, deterministic=True))
+    kept = [e for n in range(20) for e in sampler.process(event("n {0}".format(n)))]
+    assert [e['text'] for e in kept] == ["n 0", "n 4", "n 8", "n 12", "n 16"]
+    assert all(fields(e) == {'sample_rate': '4'} for e in kept)
+    assert sampler.stats() == {'sampled_out': 15, 'received': 20, 'passed': 5}
+
+    random_sampler = Sampler(4, seed=1)
+    kept = sum(len(random_sampler.process(event("x"), 0)) for _ in range(4000))
+    assert 800 < kept < 1200
+
+
+def test_sampler_by_key_keeps_related_events_together():
+    sampler = Sampler(3, key='request')
+    for request in range(30):
+        kept = [len(sampler.process(event("step {0}".format(n), request=request), 0)) for n in range(4)]
+        assert kept in ([1] * 4, [0] * 4)
+
+
+def test_deduplicator_collapses_repeats(clock):
+    pipeline = Pipeline(Deduplicator(window=10))
+    storm = event("disk full", hostname="a")
+    assert pipeline.process(storm) == [storm]
+    for _ in range(99):
+        assert pipeline.process(event("disk full", hostname="a")) == []
+    assert pipeline.process(event("disk full", hostname="b")) != []  # Different fields
+    assert pipeline.expire() == []
+
+    clock[0] += 10
+    repeats = pipeline.expire()
+    assert [fields(e) for e in repeats] == [{'hostname': 'a', 'repeat_count': '99'}]
+    assert fields(storm) == {'hostname': 'a'}  # Unchanged
+    assert pipeline.process(storm) == [storm]  # A new window
+    assert pipeline.drain() == []
+    assert pipeline.stats()['deduplicated'] == 99
+
+
+def test_deduplicator_memory_is_bounded(clock):
+    deduplicator = Deduplicator(max_keys=3)
+    passed = []
+    for n in range(10):
+        passed.extend(deduplicator.process(event("a {0}".format(n % 5)), clock[0]))
+    assert len(deduplicator._windows) == 3
+    assert sum(int(fields(e).get('repeat_count', 1)) for e in passed + deduplicator.drain()) == 10
+
+
+def test_batch_ingestor_with_pipeline(clock, mocked):
+    connection, _ = mocked
+    pipeline = Pipeline(Deduplicator(window=60), RateLimiter(100))
+    with BatchIngestor(connection, pipeline=pipeline) as batch:
+        batch.extend(Event(text="repeated", timestamp=datetime(2018, 1, 1, tzinfo=pytz.utc)) for _ in range(1000))
+        batch.append(Event(text="other"))
+    assert batch.ingested == 3  # The first, the other, and the repeat count
+
+    with BackgroundIngestor(connection, pipeline=Pipeline(Deduplicator(window=60)), max_delay=0.01) as ingestor:
+        for _ in range(100):
+            ingestor.log(Event(text="repeated"))
+    stats = ingestor.stats()
+    assert stats['ingested'] == 2
+    assert stats['filtered'] == {'deduplicated': 99, 'received': 100, 'passed': 2}
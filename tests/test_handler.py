@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import logging
+
+import pytest
+import six
+
+import pyloginsight.handler
+from pyloginsight.handler import LogInsightHandler
+
+
+pytestmark = pytest.mark.exampleapi  # Inspects requests made to the mock server
+
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger("pyloginsight test.handler")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    yield logger
+    logger.handlers = []
+
+
+def sent(adapter):
+    return [e for r in adapter.request_history if r.path == "/api/v1/events/ingest/1" for e in r.json()['events']]
+
+
+def test_records_become_events(mocked, logger):
+    connection, adapter = mocked
+    handler = LogInsightHandler(connection, fields={'appname': 'pyloginsight test'}, record_fields=['request_id'], max_delay=0.01)
+    logger.addHandler(handler)
+
+    logger.info("Hello %s", "world", extra={'request_id': 42})
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception("Failed")
+    logger.debug("Not sent")
+    handler.close()
+
+    events = sent(adapter)
+    assert [e['text'] for e in events] == ["Hello world", "Failed"]
+    fields = [dict((f['name'], f['content']) for f in e['fields']) for e in events]
+    assert fields[0] == {'appname': 'pyloginsight test', 'level': 'INFO', 'logger': 'pyloginsight test.handler',
+                         'module': 'test_handler', 'request_id': '42'}
+    assert fields[1]['level'] == 'ERROR'
+    assert 'ZeroDivisionError' in fields[1]['exception']
+    assert all(isinstance(e['timestamp'], int) for e in events)
+
+
+def test_records_are_left_as_logged_for_other_handlers(mocked, logger):
+    connection, adapter = mocked
+    handler = LogInsightHandler(connection, max_delay=0.01)
+    handler.setFormatter(logging.Formatter("[%(name)s] %(message)s"))
+    logger.addHandler(handler)
+    stream = six.StringIO()
+    other = logging.StreamHandler(stream)
+    other.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    logger.addHandler(other)
+
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception("Failed %d", 1)
+    handler.close()
+
+    assert stream.getvalue().startswith("ERROR Failed 1\nTraceback")
+    assert stream.getvalue().count("ZeroDivisionError") == 1
+    event, = sent(adapter)
+    assert event['text'] == "[pyloginsight test.handler] Failed 1"
+    assert 'ZeroDivisionError' in dict((f['name'], f['content']) for f in event['fields'])['exception']
+
+
+def test_field_names_are_crushed_once(mocked, logger, monkeypatch):
+    connection, adapter = mocked
+    calls = []
+    crush = pyloginsight.ingestion.crush_invalid_field_name
+    monkeypatch.setattr(pyloginsight.ingestion, "crush_invalid_field_name", lambda name: calls.append(name) or crush(name))
+
+    handler = LogInsightHandler(connection, fields={'App Name': 'x'}, max_delay=0.01)
+    logger.addHandler(handler)
+    for n in range(100):
+        logger.warning("Record %d", n)
+    handler.close()
+
+    assert len(sent(adapter)) == 100
+    assert sorted(calls) == ['App Name', 'level', 'logger', 'module']
+    assert sent(adapter)[0]['fields'][0]['name'] == 'app_name'
+
+
+def test_emitting_does_not_wait_for_the_server(mocked, logger):
+    connection, adapter = mocked
+    handler = LogInsightHandler(connection, workers=0, max_queue=10, when_full="drop")
+    logger.addHandler(handler)
+    for n in range(20):
+        logger.info("Record %d", n)
+    assert handler.ingestor.stats()['dropped'] == 10
+    assert sent(adapter) == []
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import json
+import time
+from datetime import datetime
+
+import pytest
+import pytz
+import requests
+
+from pyloginsight.exceptions import IngestionIncomplete, ServerError, TransportError
+from pyloginsight.ingestion import BatchIngestor, BackgroundIngestor, DROP, SPILL, MAXIMUM_BYTES_TEXT_FIELD
+from pyloginsight.ingestion import serialize_cfapi_event, serialize_columns, datetime_in_milliseconds, truncate_utf8
+from pyloginsight.models import Event
+
+
+pytestmark = pytest.mark.exampleapi  # Inspects requests made to the mock server
+
+
+def event(n):
+    return Event(text="batched {0}".format(n), fields={'appname': 'pyloginsight test'}, timestamp=datetime(2018, 1, 1, tzinfo=pytz.utc))
+
+
+def ingestions(adapter):
+    return [len(r.json()['events']) for r in adapter.request_history if r.path.startswith("/api/v1/events/ingest/")]
+
+
+def test_batches_by_count(mocked):
+    connection, adapter = mocked
+    with BatchIngestor(connection, max_events=10) as batch:
+        assert batch.extend(event(n) for n in range(25)) == 20
+        assert len(batch) == 5
+    assert ingestions(adapter) == [10, 10, 5]
+    assert batch.ingested == 25
+    assert batch.batches == 3
+    assert batch.flush() == 0
+
+
+def test_batches_by_size(mocked):
+    connection, adapter = mocked
+    big = Event(text="x" * MAXIMUM_BYTES_TEXT_FIELD)
+    with BatchIngestor(connection, max_bytes=3 * MAXIMUM_BYTES_TEXT_FIELD) as batch:
+        for _ in range(7):
+            batch.append(big)
+    assert ingestions(adapter) == [2, 2, 2, 1]
+    assert all(len(r.body) < 3 * MAXIMUM_BYTES_TEXT_FIELD for r in adapter.request_history if r.method == "POST")
+
+
+def test_batches_by_age(mocked, monkeypatch):
+    connection, adapter = mocked
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    batch = BatchIngestor(connection, max_delay=2)
+    batch.append(event(1))
+    now[0] += 1
+    batch.append(event(2))
+    assert ingestions(adapter) == []
+    now[0] += 1
+    assert batch.append(event(3)) == 3
+    assert ingestions(adapter) == [3]
+
+
+def test_server_log_accepts_a_list(mocked):
+    connection, adapter = mocked
+    assert connection.server.log([event(n) for n in range(3)]) == 3
+    assert connection.server.log(event(4)) == 1
+    assert ingestions(adapter) == [3, 1]
+
+
+def test_partial_and_failed_ingestion(mocked):
+    connection, adapter = mocked
+    adapter.register_uri("POST", "https://mockserverlocal:9543/api/v1/events/ingest/1",
+                         text=json.dumps({'status': 'ok', 'ingested': 1}))
+    batch = BatchIngestor(connection)
+    batch.extend([event(1), event(2)])
+    with pytest.raises(IngestionIncomplete) as e:
+        batch.flush()
+    assert (e.value.sent, e.value.ingested) == (2, 1)
+    assert len(batch) == 0
+
+    adapter.register_uri("POST", "https://mockserverlocal:9543/api/v1/events/ingest/1",
+                         text=json.dumps({'status': 'failed', 'ingested': 0}))
+    with pytest.raises(ServerError):
+        with BatchIngestor(connection) as batch:
+            batch.append(event(3))
+
+
+def test_background_ingestion(mocked):
+    connection, adapter = mocked
+    with BackgroundIngestor(connection, workers=2, max_events=10, max_delay=0.05) as ingestor:
+        for n in range(45):
+            assert ingestor.log(event(n))
+        ingestor.flush()
+        assert sum(ingestions(adapter)) == 45
+    assert all(n <= 10 for n in ingestions(adapter))
+
+    stats = ingestor.stats()
+    assert stats['queued'] == stats['ingested'] == 45
+    assert stats['batches'] == len(ingestions(adapter))
+    assert stats['depth'] == stats['dropped'] == stats['failed'] == 0
+    assert stats['latency_p50'] <= stats['latency_p99']
+
+    with pytest.raises(ValueError):
+        ingestor.log(event(46))
+
+
+def test_background_ingestion_when_full(mocked):
+    connection, adapter = mocked
+    dropping = BackgroundIngestor(connection, workers=0, max_queue=2, when_full=DROP)
+    assert [dropping.log(event(n)) for n in range(3)] == [True, True, False]
+    assert dropping.stats()['dropped'] == 1
+    assert dropping.stats()['depth'] == 2
+
+    spilled = []
+    spilling = BackgroundIngestor(connection, workers=0, max_queue=1, when_full=SPILL, spill=spilled.extend)
+    assert [spilling.log(event(n)) for n in range(2)] == [True, False]
+    assert [e['text'] for e in spilled] == ["batched 1"]
+
+    blocking = BackgroundIngestor(connection, workers=0, max_queue=1, put_timeout=0.01)
+    assert [blocking.log(event(n)) for n in range(2)] == [True, False]
+    assert blocking.stats()['dropped'] == 1
+
+
+def test_background_ingestion_counts_only_unsent_events_as_failed(mocked):
+    connection, adapter = mocked
+
+    def serialize(e):
+        if e['text'] == "batched 2":
+            raise ValueError("Unserializable")
+        return serialize_cfapi_event(e['text'], None, None)
+    with BackgroundIngestor(connection, max_events=3, max_delay=0.05, serialize=serialize) as ingestor:
+        for n in range(6):
+            ingestor.log(event(n))
+    stats = ingestor.stats()
+    assert (stats['ingested'], stats['failed']) == (5, 1)
+    assert sum(ingestions(adapter)) == 5
+
+
+def test_background_ingestion_spills_unsent_batches(mocked):
+    connection, adapter = mocked
+    adapter.register_uri("POST", "https://mockserverlocal:9543/api/v1/events/ingest/1", exc=requests.ConnectionError)
+    spilled = []
+    with BackgroundIngestor(connection, spill=spilled.extend, max_delay=0.01) as ingestor:
+        for n in range(5):
+            ingestor.log(event(n))
+    assert sorted(e['text'] for e in spilled) == ["batched {0}".format(n) for n in range(5)]
+    assert ingestor.stats()['spilled'] == 5
+
+    with BackgroundIngestor(connection, max_delay=0.01) as ingestor:
+        ingestor.log(event(1))
+    assert ingestor.stats()['failed'] == 1
+
+
+def test_serialize_columns_matches_serialize_cfapi_event():
+    when = [datetime(2018, 1, 1, tzinfo=pytz.utc), datetime(2018, 1, 2, tzinfo=pytz.utc), None]
+    columns = {
+        'text': ["first", "second", ""],
+        'timestamp': when,
+        'App Name': ["a", "b", "c"],
+        'count': [1, None, 3.5],
+    }
+    expected = [serialize_cfapi_event(columns['text'][n], when[n] and datetime_in_milliseconds(when[n]),
+                                      dict((k, columns[k][n]) for k in ('App Name', 'count') if columns[k][n] is not None))
+                for n in range(3)]
+    assert serialize_columns(columns) == expected
+
+    with pytest.raises(ValueError):
+        serialize_columns({'text': ["a"], 'b': [1, 2]})
+    assert serialize_columns({'text': ["a", "b"]}, timestamp=None) == [{'text': "a"}, {'text': "b"}]
+
+
+def test_serialize_columns_from_numpy():
+    numpy = pytest.importorskip("numpy")
+    columns = {
+        'message': numpy.array(["x", "y", "z"]),
+        'when': numpy.array(["2018-01-01T00:00:00.250", "NaT", "1970-01-01T00:00:01"], dtype="datetime64[ns]"),
+        'value': numpy.array([1.5, numpy.nan, 2.0]),
+    }
+    events = serialize_columns(columns, text="message", timestamp="when")
+    assert [e.get('timestamp') for e in events] == [1514764800250, None, 1000]
+    assert [e['text'] for e in events] == ["x", "y", "z"]
+    assert [e.get('fields') for e in events] == [[{'name': 'value', 'content': '1.5'}], None, [{'name': 'value', 'content': '2.0'}]]
+
+
+def test_serialize_columns_treats_nan_as_missing():
+    nan = float("nan")
+    events = serialize_columns({'text': ["a", nan, None], 'timestamp': [1514764800000.0, nan, 1514764800250]})
+    assert events == [{'text': "a", 'timestamp': 1514764800000}, {}, {'timestamp': 1514764800250}]
+
+    numpy = pytest.importorskip("numpy")
+    events = serialize_columns({'text': numpy.array(["a", nan, "c"], dtype=object),
+                                'timestamp': numpy.array([1514764800000, nan, 1000])})
+    assert [e.get('timestamp') for e in events] == [1514764800000, None, 1000]
+    assert [e.get('text') for e in events] == ["a", None, "c"]
+
+
+def test_truncate_utf8():
+    assert truncate_utf8(u"short", 5) == u"short"
+    assert truncate_utf8(u"é" * 5, 5) == u"éé"  # 2 bytes each; the third would be cut in half
+    assert truncate_utf8(u"€" * 5, 7) == u"€€"
+    assert truncate_utf8(u"a\U0001F600", 4) == u"a"
+
+    e = serialize_cfapi_event(u"€" * MAXIMUM_BYTES_TEXT_FIELD, None, None)
+    assert len(e['text'].encode('utf-8')) <= MAXIMUM_BYTES_TEXT_FIELD
+    assert len(e['text']) == MAXIMUM_BYTES_TEXT_FIELD // 3
+
+
+def test_batches_rejected_as_too_large_are_split(mocked):
+    connection, adapter = mocked
+    sizes = []
+
+    def limited(request, context):
+        events = request.json()['events']
+        sizes.append(len(events))
+        if len(events) > 3:
+            context.status_code = 413
+            return json.dumps({'errorMessage': 'Request entity too large'})
+        return json.dumps({'status': 'ok', 'ingested': len(events)})
+    adapter.register_uri("POST", "https://mockserverlocal:9543/api/v1/events/ingest/1", text=limited)
+
+    with BatchIngestor(connection) as batch:
+        batch.extend(event(n) for n in range(10))
+    assert batch.ingested == 10
+    assert sizes == [10, 5, 2, 3, 5, 2, 3]
+
+    adapter.register_uri("POST", "https://mockserverlocal:9543/api/v1/events/ingest/1", status_code=413,
+                         text=json.dumps({'errorMessage': 'Request entity too large'}))
+    with pytest.raises(TransportError) as e:
+        with BatchIngestor(connection) as batch:
+            batch.append(event(1))
+    assert e.value.args[0] == 413
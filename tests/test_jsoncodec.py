@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import json
+
+import pytest
+
+from pyloginsight import jsoncodec
+from pyloginsight.models import Event
+
+
+def available():
+    names = []
+    for name, loader in jsoncodec.BACKENDS:
+        try:
+            loader()
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+
+@pytest.fixture(params=available())
+def backend(request):
+    previous = jsoncodec.backend
+    jsoncodec.use(request.param)
+    yield request.param
+    jsoncodec.use(previous)
+
+
+DOCUMENT = {"events": [{"text": u"Ünïcode ☃ </script>", "timestamp": 1514764800000,
+                        "fields": [{"name": "appname", "content": "pyloginsight"}]}],
+            "complete": True, "ratio": 0.25, "nothing": None}
+
+
+def test_round_trip(backend):
+    encoded = jsoncodec.encode(DOCUMENT)
+    assert isinstance(encoded, bytes)
+    assert jsoncodec.decode(encoded) == DOCUMENT
+    assert jsoncodec.decode(encoded.decode("utf-8")) == DOCUMENT
+
+
+def test_output_is_identical_across_backends(backend):
+    expected = json.dumps(DOCUMENT, separators=(',', ':'), ensure_ascii=False, sort_keys=True).encode("utf-8")
+    assert jsoncodec.encode(DOCUMENT, sort_keys=True) == expected
+    assert jsoncodec.dumps(DOCUMENT, sort_keys=True) == expected.decode("utf-8")
+
+
+def test_malformed_input_raises_valueerror(backend):
+    with pytest.raises(ValueError):
+        jsoncodec.decode(b'{"events": [')
+    with pytest.raises(ValueError):
+        jsoncodec.decode(b'')
+
+
+def test_unknown_backend():
+    with pytest.raises(ImportError):
+        jsoncodec.use("simplejsonx")
+
+
+@pytest.mark.exampleapi
+def test_request_bodies_are_encoded_by_the_codec(backend, mocked):
+    connection, adapter = mocked
+    assert connection.server.log(Event(text=u"café", fields={'appname': 'pyloginsight test'})) == 1
+
+    request = adapter.request_history[-1]
+    assert request.headers['Content-Type'] == 'application/json'
+    assert request.body == jsoncodec.encode({"events": [{"text": u"café", "fields": [{"name": "appname", "content": "pyloginsight test"}]}]})
+
+
+def test_content_pack_export_formatting_is_unchanged(backend):
+    from pyloginsight.content import ExtractedFieldSchema
+    field = {'displayName': u"Ünïcode", 'preContext': "a", 'postContext': "b", 'regexValue': ".*", 'internalName': "x",
+             'constraints': json.dumps({'searchTerms': u"café", 'filters': []})}
+    dumped = ExtractedFieldSchema().dump(ExtractedFieldSchema().load(field).data).data
+    assert dumped['constraints'] == json.dumps({'searchTerms': u"café", 'filters': []}, sort_keys=True)
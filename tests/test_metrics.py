@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import socket
+
+import pytest
+import requests
+
+from mock_loginsight_server import MockedConnection, LogInsightMockAdapter
+from pyloginsight.metrics import MetricsRegistry, StatsdExporter
+from pyloginsight.models import Users, User
+
+
+pytestmark = pytest.mark.exampleapi  # Inspects requests made to the mock server
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+@pytest.fixture
+def mocked_options(registry):
+    return {'metrics': registry}
+
+
+def test_requests_are_counted_per_endpoint_template(mocked, registry):
+    connection, _ = mocked
+    users = Users(connection)
+    ids = [users.append(User(username="metrics-{0}".format(n), email="m@local.localdom", password="abc!-DEF!-123!")) for n in range(3)]
+    for i in ids:
+        users[i]
+
+    assert registry.value('requests_total', method="GET", endpoint="/users/{id}", status="200") == 3
+    assert registry.value('request_duration_seconds', method="GET", endpoint="/users/{id}") == 3
+    assert registry.value('response_bytes_total', method="GET", endpoint="/users/{id}") > 0
+    assert registry.value('request_bytes_total', method="POST", endpoint="/users") > 0
+    assert registry.value('requests_in_flight', method="GET", endpoint="/users/{id}") == 0
+
+
+def test_logins_are_counted(mocked, registry):
+    connection, _ = mocked
+    connection.get("/sessions/current")
+    assert registry.value('authentications_total', reason="initial") == 1
+
+    connection._authprovider.sessionId = "not-a-real-session"
+    connection.get("/sessions/current")
+    assert registry.value('authentications_total', reason="rejected") == 1
+
+
+def test_errors_are_counted(registry):
+    class RefusingAdapter(LogInsightMockAdapter):
+        def send(self, request, **kwargs):
+            raise requests.ConnectionError("Connection refused")
+
+    connection = MockedConnection("mockserverlocal", verify=False, metrics=registry)
+    connection._requestsession.mount("https://", RefusingAdapter())
+    with pytest.raises(requests.ConnectionError):
+        connection.get("/version", sendauthorization=False)
+
+    assert registry.value('requests_total', method="GET", endpoint="/version", status="error") == 1
+    assert registry.value('request_errors_total', method="GET", endpoint="/version", error="ConnectionError") == 1
+    assert registry.value('requests_in_flight', method="GET", endpoint="/version") == 0
+
+
+def test_prometheus_exposition(registry):
+    registry.record_request("GET", '/weird"endpoint', 200, 0.02, received=10)
+    registry.record_request("GET", '/weird"endpoint', 200, 0.3, received=10)
+    text = registry.prometheus()
+    print(text)
+
+    assert "# TYPE pyloginsight_requests_total counter\n" in text
+    assert '# TYPE pyloginsight_request_duration_seconds histogram\n' in text
+    assert 'pyloginsight_requests_total{method="GET",endpoint="/weird\\"endpoint",status="200"} 2\n' in text
+    assert 'pyloginsight_request_duration_seconds_bucket{method="GET",endpoint="/weird\\"endpoint",le="0.025"} 1\n' in text
+    assert 'pyloginsight_request_duration_seconds_bucket{method="GET",endpoint="/weird\\"endpoint",le="+Inf"} 2\n' in text
+    assert 'pyloginsight_request_duration_seconds_count{method="GET",endpoint="/weird\\"endpoint"} 2\n' in text
+    assert 'pyloginsight_response_bytes_total{method="GET",endpoint="/weird\\"endpoint"} 20\n' in text
+    assert "authentications_total" not in text  # Families with no series are left out
+
+
+def test_statsd_exporter(registry):
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(2)
+    exporter = StatsdExporter("127.0.0.1", receiver.getsockname()[1])
+    registry.add_listener(exporter)
+
+    registry.record_request("GET", "/users/{id}", 200, 0.25)
+    received = [receiver.recv(1024).decode("utf-8") for _ in range(2)]
+    assert received == ["pyloginsight.requests_total.GET.users_id.200:1|c",
+                        "pyloginsight.request_duration_seconds.GET.users_id:250.000|ms"]
+
+    with registry.in_flight("GET", "/version"):
+        assert receiver.recv(1024) == b"pyloginsight.requests_in_flight.GET.version:+1|g"
+    assert receiver.recv(1024) == b"pyloginsight.requests_in_flight.GET.version:-1|g"
+
+    exporter.close()
+    receiver.close()
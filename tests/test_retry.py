@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import pytest
+import requests
+import time
+
+from mock_loginsight_server import MockedConnection, LogInsightMockAdapter
+from pyloginsight.connection import Credentials, endpoint_template
+from pyloginsight.exceptions import CircuitOpen, TransportError
+from pyloginsight.retry import RetryPolicy, CircuitBreaker, parse_retry_after, CLOSED, OPEN, HALF_OPEN
+
+
+pytestmark = pytest.mark.exampleapi  # Injects failures into the mock server
+
+
+class SheddingAdapter(LogInsightMockAdapter):
+    """Answers the first `failures` API requests with 503 (or a connection error), then behaves. Logins always succeed."""
+    def __init__(self, failures, retry_after=None, refuse=False, **kwargs):
+        super(SheddingAdapter, self).__init__(**kwargs)
+        self.failures = failures
+        self.retry_after = retry_after
+        self.refuse = refuse
+        self.attempts = 0
+
+    def send(self, request, **kwargs):
+        if request.path_url == "/api/v1/sessions":
+            return super(SheddingAdapter, self).send(request, **kwargs)
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            if self.refuse:
+                raise requests.ConnectionError("Connection reset by peer")
+            r = super(SheddingAdapter, self).send(request, **kwargs)
+            r.status_code = 503
+            if self.retry_after is not None:
+                r.headers['Retry-After'] = self.retry_after
+            return r
+        return super(SheddingAdapter, self).send(request, **kwargs)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waits = []
+    monkeypatch.setattr(time, "sleep", waits.append)
+    return waits
+
+
+def connect(adapter, **kwargs):
+    connection = MockedConnection("mockserverlocal", auth=Credentials("admin", "VMware123!", "Local"), verify=False, **kwargs)
+    connection._requestsession.mount("https://", adapter)
+    return connection
+
+
+def test_endpoint_template():
+    assert endpoint_template("/users/012345678-9ab-cdef-0123-456789abcdef") == "/users/{id}"
+    assert endpoint_template("/events/text/CONTAINS%20ERROR/timestamp/%3E0") == "/events/{constraints}"
+    assert endpoint_template("/events/ingest/1") == "/events/ingest/{id}"
+    assert endpoint_template("/version") == "/version"
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+
+
+def test_get_retried_after_503_honors_retry_after(sleeps):
+    observed = []
+    policy = RetryPolicy(total=3, on_retry=lambda *args: observed.append(args))
+    connection = connect(SheddingAdapter(2, retry_after="7"), retry=policy)
+
+    assert connection.get("/version")
+    assert sleeps == [7.0, 7.0]
+    assert policy.retries == 2 and policy.waited == 14.0
+    assert [o[2] for o in observed] == [0, 1]
+
+
+def test_retry_after_is_capped(sleeps):
+    connection = connect(SheddingAdapter(1, retry_after="86400"), retry=RetryPolicy(max_backoff=5))
+    assert connection.get("/version")
+    assert sleeps == [5.0]
+
+
+def test_backoff_is_bounded_and_jittered(sleeps):
+    policy = RetryPolicy(total=4, backoff_factor=1, max_backoff=3)
+    connection = connect(SheddingAdapter(4, refuse=True), retry=policy)
+
+    assert connection.get("/version")
+    assert len(sleeps) == 4
+    for attempt, wait in enumerate(sleeps):
+        assert 0 <= wait <= min(3, 2 ** attempt)
+
+
+def test_retries_exhausted(sleeps):
+    connection = connect(SheddingAdapter(10), retry=RetryPolicy(total=2))
+    with pytest.raises(TransportError):
+        connection.get("/version")
+    assert len(sleeps) == 2
+
+
+def test_post_not_retried_by_default(sleeps):
+    adapter = SheddingAdapter(1)
+    connection = connect(adapter, retry=RetryPolicy())
+    with pytest.raises(TransportError):
+        connection.post("/events/ingest/0", json={"events": []}, sendauthorization=False)
+    assert adapter.attempts == 1
+
+    connection.retry = RetryPolicy(methods=["POST"])
+    assert connection.post("/events/ingest/0", json={"events": []}, sendauthorization=False)
+
+
+def test_circuit_opens_fails_fast_and_recovers(sleeps):
+    changes = []
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60, on_state_change=lambda *args: changes.append(args))
+    adapter = SheddingAdapter(3)
+    connection = connect(adapter, circuit_breaker=breaker)
+
+    for _ in range(3):
+        with pytest.raises(TransportError):
+            connection.get("/version")
+    assert breaker.state("/version") == OPEN
+
+    with pytest.raises(CircuitOpen):
+        connection.get("/version")
+    assert adapter.attempts == 3  # Failed fast, without a request
+
+    assert breaker.state("/licenses") == CLOSED  # Other endpoints are unaffected
+
+    breaker.reset_timeout = 0
+    assert connection.get("/version")
+    assert breaker.states() == {"/version": CLOSED}
+    assert changes == [("/version", CLOSED, OPEN), ("/version", OPEN, HALF_OPEN), ("/version", HALF_OPEN, CLOSED)]
+
+
+def test_state_change_callback_may_inspect_the_breaker(sleeps):
+    seen = []
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0,
+                             on_state_change=lambda endpoint, old, new: seen.append(breaker.states()))
+    connection = connect(SheddingAdapter(1), circuit_breaker=breaker)
+    with pytest.raises(TransportError):
+        connection.get("/version")
+    assert connection.get("/version")
+    assert seen == [{"/version": OPEN}, {"/version": HALF_OPEN}, {"/version": CLOSED}]
+
+
+def test_failed_trial_reopens_circuit(sleeps):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    connection = connect(SheddingAdapter(2, refuse=True), circuit_breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            connection.get("/version")
+        assert breaker.state("/version") == OPEN
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import os
+import stat
+import time
+import pytest
+
+from mock_loginsight_server import MockedConnection
+from pyloginsight.connection import Credentials
+from pyloginsight.sessioncache import SessionCache
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return SessionCache(str(tmpdir.join("cache", "sessions.json")))
+
+
+def test_roundtrip_and_permissions(cache):
+    key = SessionCache.key("loginsight:9543", "admin", "Local")
+    assert cache.get(key) is None
+
+    cache.put(key, "abc", time.time() + 60)
+    assert cache.get(key)[0] == "abc"
+    assert stat.S_IMODE(os.stat(cache.path).st_mode) == 0o600
+
+    cache.discard(key)
+    assert cache.get(key) is None
+
+
+def test_expired_entries_are_ignored_and_pruned(cache):
+    cache.put("old", "abc", time.time() - 1)
+    assert cache.get("old") is None
+    cache.put("new", "def", None)
+    assert cache.get("new") == ("def", None)
+    assert "old" not in cache._read()
+
+
+def test_keys_distinguish_server_port_user_and_provider():
+    keys = set([SessionCache.key("a:9543", "admin", "Local"), SessionCache.key("b:9543", "admin", "Local"),
+                SessionCache.key("a:443", "admin", "Local"), SessionCache.key("a:9543", "other", "Local"),
+                SessionCache.key("a:9543", "admin", "ActiveDirectory")])
+    assert len(keys) == 5
+
+
+def requests_made(connection):
+    adapter = connection._requestsession.get_adapter(connection._apiroot)
+    return [(r.method, r.path) for r in adapter.request_history]
+
+
+@pytest.mark.exampleapi
+def test_second_process_reuses_cached_session(cache):
+    first = MockedConnection("mockserverlocal", auth=Credentials("admin", "VMware123!", "Local", cache=cache))
+    first.get("/sessions/current")
+
+    # A new process: fresh Credentials, same server
+    second = MockedConnection("mockserverlocal", auth=Credentials("admin", "VMware123!", "Local", cache=cache))
+    second._requestsession.mount("https://", first._requestsession.get_adapter(first._apiroot))
+    first._requestsession.get_adapter(first._apiroot).reset()
+
+    second.get("/sessions/current")
+    assert second._authprovider.sessionId == first._authprovider.sessionId
+    assert ("POST", "/api/v1/sessions") not in requests_made(second)
+
+
+@pytest.mark.exampleapi
+def test_rejected_cached_session_falls_back_to_login(cache):
+    key = SessionCache.key("mockserverlocal:9543", "admin", "Local")
+    cache.put(key, "revoked-session", time.time() + 600)
+
+    connection = MockedConnection("mockserverlocal", auth=Credentials("admin", "VMware123!", "Local", cache=cache))
+    connection.get("/sessions/current")
+
+    assert requests_made(connection)[:2] == [("GET", "/api/v1/sessions/current"), ("POST", "/api/v1/sessions")]
+    assert cache.get(key)[0] == connection._authprovider.sessionId != "revoked-session"
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import json
+import os
+import threading
+
+import pytest
+import requests
+
+from pyloginsight.exceptions import TransportError
+from pyloginsight.ingestion import transmit, BackgroundIngestor
+from pyloginsight.models import Event
+from pyloginsight.spool import Spool
+
+
+pytestmark = pytest.mark.exampleapi  # Inspects requests made to the mock server
+
+INGEST = "https://mockserverlocal:9543/api/v1/events/ingest/1"
+
+
+def batch(start, count):
+    return [{'text': "spooled {0}".format(n), 'timestamp': 1514764800000 + n} for n in range(start, start + count)]
+
+
+def ingested(adapter):
+    return [e['text'] for r in adapter.request_history if r.path == "/api/v1/events/ingest/1" for e in r.json()['events']]
+
+
+def test_replay_in_order_across_segments(tmpdir, mocked):
+    connection, adapter = mocked
+    spool = Spool(str(tmpdir), segment_bytes=200)
+    for start in range(0, 20, 4):
+        spool.append(batch(start, 4))
+    assert len(spool.segments()) > 1
+    assert len(spool) == 20
+
+    assert spool.replay(connection) == 20
+    assert ingested(adapter) == ["spooled {0}".format(n) for n in range(20)]
+    assert spool.segments() == []
+    assert len(spool) == 0
+    assert spool.replay(connection) == 0
+
+
+def test_survives_restart_and_resumes_after_failure(tmpdir, mocked):
+    connection, adapter = mocked
+    spool = Spool(str(tmpdir))
+    for start in range(0, 9, 3):
+        spool.append(batch(start, 3))
+    spool.close()
+
+    calls = []
+
+    def flaky(request, context):
+        calls.append(request)
+        if len(calls) == 2:
+            raise requests.ConnectionError("Server went away")
+        return json.dumps({'status': 'ok', 'ingested': len(request.json()['events'])})
+    adapter.register_uri("POST", INGEST, text=flaky)
+
+    with pytest.raises(requests.ConnectionError):
+        Spool(str(tmpdir)).replay(connection)
+
+    restarted = Spool(str(tmpdir))
+    assert len(restarted) == 6
+    restarted.append(batch(9, 1))
+    assert restarted.replay(connection) == 7
+    assert [r.json()['events'][0]['text'] for r in calls] == ["spooled 0", "spooled 3", "spooled 3", "spooled 6", "spooled 9"]
+
+
+def test_damaged_records_are_skipped(tmpdir):
+    spool = Spool(str(tmpdir))
+    spool.append(batch(0, 2))
+    spool.append(batch(2, 2))
+    spool.close()
+    path = spool._path(spool.segments()[0])
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)  # A write cut short when the process died
+    assert [events for _, events in Spool(str(tmpdir)).read(Spool(str(tmpdir)).segments()[0])] == [batch(0, 2)]
+
+
+def test_size_cap_discards_oldest(tmpdir):
+    spool = Spool(str(tmpdir), segment_bytes=100, max_bytes=400)
+    for start in range(0, 40, 2):
+        spool.append(batch(start, 2))
+    assert spool.size <= 400 + 100
+    assert spool.discarded > 0
+    assert spool.discarded + len(spool) == 40
+
+
+def test_size_cap_counts_discarded_events_without_reading_segments(tmpdir, monkeypatch):
+    spool = Spool(str(tmpdir), segment_bytes=100)
+    for start in range(0, 6, 2):
+        spool.append(batch(start, 2))
+    spool.close()
+    os.remove(os.path.join(str(tmpdir), "{0:020d}.count".format(spool.segments()[0])))  # As if the process had died
+
+    restarted = Spool(str(tmpdir), segment_bytes=100, max_bytes=400)
+    monkeypatch.setattr(restarted, "read", None)
+    for start in range(6, 40, 2):
+        restarted.append(batch(start, 2))
+    monkeypatch.undo()
+    assert restarted.discarded > 0 and restarted.discarded + len(restarted) == 40
+    assert sorted(name for name in os.listdir(str(tmpdir)) if name.endswith(".count")) == \
+        ["{0:020d}.count".format(s) for s in restarted.segments()[:-1]]
+
+
+def test_transmit_and_background_ingestion_spool(tmpdir, mocked):
+    connection, adapter = mocked
+    adapter.register_uri("POST", INGEST, exc=requests.ConnectionError)
+    spool = Spool(str(tmpdir))
+    assert transmit(connection, Event(text="first"), spool=spool) == 0
+    with BackgroundIngestor(connection, spill=spool.append, max_delay=0.01) as ingestor:
+        ingestor.log(Event(text="second"))
+    assert len(spool) == 2
+
+
+def test_only_transient_failures_are_spooled(tmpdir, mocked):
+    connection, adapter = mocked
+    spool = Spool(str(tmpdir))
+    adapter.register_uri("POST", INGEST, status_code=503, text=json.dumps({'errorMessage': 'Service unavailable'}))
+    assert transmit(connection, Event(text="overloaded"), spool=spool) == 0
+    adapter.register_uri("POST", INGEST, status_code=400, text=json.dumps({'errorMessage': 'Bad request'}))
+    with pytest.raises(TransportError):
+        transmit(connection, Event(text="rejected"), spool=spool)
+    assert len(spool) == 1
+
+
+def test_replay_skips_rejected_records_without_blocking_appends(tmpdir, mocked):
+    connection, adapter = mocked
+    rejected = []
+    spool = Spool(str(tmpdir), on_rejected=lambda events, e: rejected.append(events))
+    spool.append(batch(0, 2))
+    spool.append([{'text': "poison"}])
+    spool.append(batch(2, 2))
+
+    appended = []
+
+    def ingest(request, context):
+        events = request.json()['events']
+        appender = threading.Thread(target=lambda: appended.append(spool.append(batch(10, 1))))
+        appender.start()
+        appender.join(2)
+        if events[0]['text'] == "poison":
+            context.status_code = 400
+            return json.dumps({'errorMessage': 'Bad request'})
+        return json.dumps({'status': 'ok', 'ingested': len(events)})
+    adapter.register_uri("POST", INGEST, text=ingest)
+
+    assert spool.replay(connection) == 4
+    assert len(appended) == 3
+    assert rejected == [[{'text': "poison"}]]
+    assert spool.rejected == 1
+    assert len(spool) == 3  # Appended during the replay, so left for the next
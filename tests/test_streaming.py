@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import json
+import types
+from datetime import datetime
+
+import pytest
+import pytz
+
+from pyloginsight.exceptions import Unauthorized
+from pyloginsight.models import Event
+from pyloginsight.query import Constraint
+from pyloginsight import operator
+from pyloginsight.streaming import iter_json_array
+
+
+def chunked(document, size):
+    data = json.dumps(document).encode("utf-8")
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 4096])
+def test_iter_json_array_across_chunk_boundaries(size):
+    document = {"complete": True, "events": [{"text": u"café ☃", "timestamp": 1234567890123}, {"fields": []}, 12345], "numResults": 3}
+    assert list(iter_json_array(chunked(document, size), "events")) == document["events"]
+
+
+def test_iter_json_array_is_lazy():
+    consumed = []
+
+    def chunks():
+        for chunk in chunked({"events": [{"n": n} for n in range(100)]}, 16):
+            consumed.append(chunk)
+            yield chunk
+
+    items = iter_json_array(chunks(), "events")
+    assert next(items) == {"n": 0}
+    assert len(consumed) < 5
+
+
+def test_iter_json_array_empty_and_missing():
+    assert list(iter_json_array(chunked({"events": []}, 3), "events")) == []
+    assert list(iter_json_array(chunked({"events": None}, 3), "events")) == []
+    with pytest.raises(KeyError):
+        list(iter_json_array(chunked({"other": [1, 2]}, 3), "events"))
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"events": [{"text": '], "events"))
+
+
+@pytest.mark.exampleapi
+def test_server_events_stream(mocked):
+    connection, _ = mocked
+    for n in range(5):
+        connection.server.log(Event(text="streamed {0}".format(n), fields={'appname': 'pyloginsight test'}, timestamp=datetime.now(pytz.utc).replace(microsecond=0)))
+    conditions = [Constraint("text", operator.CONTAINS, "streamed")]
+
+    streamed = connection.server.events(conditions, stream=True)
+    assert isinstance(streamed, types.GeneratorType)
+    streamed = list(streamed)
+    assert len(streamed) == 5
+    assert all(isinstance(e, Event) for e in streamed)
+    assert streamed == connection.server.events(conditions)
+
+
+@pytest.mark.exampleapi
+def test_stream_raises_errors(mocked):
+    connection, _ = mocked
+    with pytest.raises(Unauthorized):
+        next(connection.stream("/events/text/CONTAINS%20x", "events", sendauthorization=False))
+
+
+@pytest.mark.exampleapi
+def test_server_iter_events_pages_through_ties(mocked):
+    connection, adapter = mocked
+    # A run of 9 events at one timestamp, longer than a page, and two events identical in every way
+    timestamps = [1000, 1000, 2000] + [3000] * 9 + [4000, 5000, 5000, 6000]
+    events = [Event(text="paged {0}".format(n), timestamp=datetime.fromtimestamp(t, pytz.utc)) for n, t in enumerate(timestamps)]
+    events.append(Event(text="paged 1", timestamp=datetime.fromtimestamp(1000, pytz.utc)))
+    connection.server.log(events)
+    conditions = [Constraint("text", operator.CONTAINS, "paged")]
+
+    requests_before = len(adapter.request_history)
+    iterator = connection.server.iter_events(conditions, page_size=4)
+    assert isinstance(iterator, types.GeneratorType)
+    assert len(adapter.request_history) == requests_before  # Nothing is requested until the first event is wanted
+
+    ascending = list(iterator)
+    assert sorted((e.text, e.timestamp) for e in ascending) == sorted((e.text, e.timestamp) for e in events)
+    assert [e.timestamp for e in ascending] == sorted(e.timestamp for e in events)
+
+    descending = list(connection.server.iter_events(conditions, order="DESC", page_size=3))
+    assert sorted(e.text for e in descending) == sorted(e.text for e in events)
+    assert [e.timestamp for e in descending] == sorted((e.timestamp for e in events), reverse=True)
+
+    bounded = connection.server.iter_events(conditions, start=datetime.fromtimestamp(2000, pytz.utc), end=5000000, page_size=2)
+    assert [e.timestamp for e in bounded] == [datetime.fromtimestamp(t, pytz.utc) for t in [2000] + [3000] * 9 + [4000]]
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import re
+import socket
+import ssl
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+import pytest
+import pytz
+
+from pyloginsight.models import Event
+from pyloginsight.syslog import SyslogSender, TCP, TLS, UDP, MAXIMUM_DATAGRAM
+
+
+class Listener(object):
+    """A local syslog receiver which records octet-counted messages, one connection at a time."""
+
+    def __init__(self, context=None):
+        self.context = context  # For TLS, the server's SSLContext
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(5)
+        self.port = self.server.getsockname()[1]
+        self.messages = []
+        self.connections = 0
+        self.drop_after = None  # Close each connection after this many messages
+        self.thread = threading.Thread(target=self._serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except (socket.error, OSError):
+                return
+            self.connections += 1
+            if self.context is not None:
+                conn = self.context.wrap_socket(conn, server_side=True)
+            data, received = b"", 0
+            while True:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+                while b" " in data:
+                    length, rest = data.split(b" ", 1)
+                    if len(rest) < int(length):
+                        break
+                    self.messages.append(rest[:int(length)].decode("utf-8"))
+                    data = rest[int(length):]
+                    received += 1
+                if self.drop_after and received >= self.drop_after:
+                    break
+            conn.close()
+
+    def wait_for(self, count, timeout=5):
+        import time
+        deadline = time.time() + timeout
+        while len(self.messages) < count and time.time() < deadline:
+            time.sleep(0.01)
+        return self.messages
+
+
+@pytest.fixture
+def listener():
+    l = Listener()
+    yield l
+    l.server.close()
+
+
+def test_rfc5424_format():
+    sender = SyslogSender("localhost", hostname="my host", app_name="app")
+    e = Event(text=u"héllo", fields={'App Name': 'a"b]c\\'}, timestamp=datetime(2018, 1, 2, 3, 4, 5, 678000, tzinfo=pytz.utc))
+    assert sender.format(e) == u'<14>1 2018-01-02T03:04:05.678Z myhost app - - [fields@6876 app_name="a\\"b\\]c\\\\"] héllo'.encode("utf-8")
+    assert sender.format(Event(text="bare")) == b"<14>1 - myhost app - - - bare"
+
+
+def test_tcp_batches_and_reconnects(listener):
+    sender = SyslogSender("127.0.0.1", listener.port, transport=TCP, batch_bytes=1024, reconnect_backoff=0)
+    sender.send_many(Event(text="message {0}".format(n)) for n in range(100))
+    sender.flush()
+    assert len(listener.wait_for(100)) == 100
+    assert listener.connections == 1
+    assert re.match(r"<14>1 - \S+ pyloginsight - - - message 0$", listener.messages[0])
+
+    listener.drop_after = 1
+    sender.send(Event(text="closes the connection"))
+    sender.flush()
+    listener.wait_for(101)
+    sender.send(Event(text="after reconnecting"))
+    sender.close()
+    assert listener.wait_for(102)[-1].endswith("after reconnecting")
+    assert listener.connections == 2
+    assert sender.sent == 102
+
+
+def test_udp():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(2)
+    with SyslogSender("127.0.0.1", receiver.getsockname()[1], transport=UDP) as sender:
+        sender.send(Event(text="datagram", fields={'appname': 'x'}))
+        assert receiver.recv(65536).endswith(b'[fields@6876 appname="x"] datagram')
+    receiver.close()
+
+
+def test_udp_over_ipv6_truncates_on_a_character_boundary():
+    if not socket.has_ipv6:
+        pytest.skip("No IPv6")
+    receiver = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+    try:
+        receiver.bind(("::1", 0))
+    except (socket.error, OSError):
+        pytest.skip("No IPv6 loopback")
+    receiver.settimeout(2)
+    with SyslogSender("::1", receiver.getsockname()[1], transport=UDP) as sender:
+        sender.send(Event(text=u"é" * MAXIMUM_DATAGRAM))
+        datagram = receiver.recv(65536)
+    receiver.close()
+    assert MAXIMUM_DATAGRAM - 1 <= len(datagram) <= MAXIMUM_DATAGRAM
+    assert datagram.decode("utf-8").endswith(u"éé")
+
+
+@pytest.fixture
+def certificate(tmpdir):
+    cert, key = str(tmpdir.join("cert.pem")), str(tmpdir.join("key.pem"))
+    try:
+        subprocess.check_call(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+                               "-keyout", key, "-out", cert], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("openssl is needed to make a certificate")
+    return cert, key
+
+
+def test_tls_session_tickets_are_not_taken_for_a_close(certificate):
+    server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_context.load_cert_chain(*certificate)
+    listener = Listener(context=server_context)
+    client_context = ssl.create_default_context(cafile=certificate[0])
+    client_context.check_hostname = False
+
+    sender = SyslogSender("127.0.0.1", listener.port, transport=TLS, ssl_context=client_context, timeout=3)
+    sender.send(Event(text="first"))
+    sender.flush()
+    listener.wait_for(1)
+    time.sleep(0.1)  # For any session tickets to arrive
+
+    started = time.time()
+    sender.send(Event(text="second"))
+    sender.flush()
+    assert time.time() - started < 1
+    sender.close()
+    assert [m.split(" - ")[-1] for m in listener.wait_for(2)] == ["first", "second"]
+    assert listener.connections == 1
+    listener.server.close()
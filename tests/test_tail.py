@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import json
+import os
+import threading
+
+import pytest
+
+from pyloginsight.cli.tail import parser
+from pyloginsight.tail import TailAgent, FileFollower, MultilineAssembler
+
+
+pytestmark = pytest.mark.exampleapi  # Inspects requests made to the mock server
+
+
+def shipped(adapter):
+    return [e['text'] for r in adapter.request_history if r.path == "/api/v1/events/ingest/1" for e in r.json()['events']]
+
+
+def write(path, data, mode="ab"):
+    with open(path, mode) as f:
+        f.write(data)
+
+
+def test_follows_appends_and_rotation(tmpdir):
+    path = str(tmpdir.join("app.log"))
+    write(path, b"one\r\ntwo\npart")
+    follower = FileFollower(path, chunk_size=4)
+
+    def read(calls=10):
+        return sum((follower.read_lines() for _ in range(calls)), [])
+    assert read() == [(b"one", 5), (b"two", 9)]
+
+    write(path, b"ial\n")
+    assert read() == [(b"partial", 17)]
+
+    write(path, b"last words")
+    os.rename(path, path + ".1")
+    write(path, b"new file\n")
+    assert read(4) == [(b"last words", 27)]
+    assert follower.offset == 0
+    assert read() == [(b"new file", 9)]
+
+    write(path, b"cut\n", mode="wb")  # Truncated in place, as by copytruncate
+    assert read() == [(b"cut", 4)]
+
+
+def test_multiline_records():
+    assembler = MultilineAssembler(r'\d{4}-')
+    records = []
+    for n, line in enumerate([b"2018-01-01 Failed", b"Traceback:", b"  File x", b"2018-01-02 OK"]):
+        records.extend(assembler.feed(line, n))
+    assert records == [(b"2018-01-01 Failed\nTraceback:\n  File x", 2)]
+    assert assembler.flush() == [(b"2018-01-02 OK", 3)]
+
+
+def test_agent_ships_and_resumes_from_checkpoint(tmpdir, mocked):
+    connection, adapter = mocked
+    path = str(tmpdir.join("app.log"))
+    checkpoint = str(tmpdir.join("checkpoint.json"))
+    write(path, u"first\nsecond ünïcode\n".encode("utf-8"))
+
+    agent = TailAgent(connection, [path], checkpoint=checkpoint, fields={'appname': 'pyloginsight test'})
+    assert agent.poll() == 2
+    assert agent.poll() == 0
+    agent.close()
+    request = [r for r in adapter.request_history if r.method == "POST"][-1]
+    fields = request.json()['events'][0]['fields']
+    assert sorted((f['name'], f['content']) for f in fields) == [('appname', 'pyloginsight test'), ('filepath', path)]
+
+    write(path, b"third\n")
+    restarted = TailAgent(connection, [path], checkpoint=checkpoint)
+    assert restarted.poll() == 1
+    assert shipped(adapter) == ["first", u"second ünïcode", "third"]
+
+
+def test_agent_retries_unsent_events(tmpdir, mocked):
+    connection, adapter = mocked
+    path = str(tmpdir.join("app.log"))
+    write(path, b"2018 start\n  continued\n2018 next\n")
+    adapter.register_uri("POST", "https://mockserverlocal:9543/api/v1/events/ingest/1", status_code=503, text="")
+    agent = TailAgent(connection, [path], multiline=r'2018', multiline_timeout=0)
+    with pytest.raises(Exception):
+        agent.poll()
+
+    adapter.register_uri("POST", "https://mockserverlocal:9543/api/v1/events/ingest/1", text='{"status": "ok", "ingested": 1}')
+    assert agent.poll() == 1
+    assert agent.poll() == 1  # The last record, once no more lines joined it
+    assert agent.checkpoint.get(path)[1] == os.path.getsize(path)
+
+
+def test_agent_run_backs_off_after_a_failed_send(tmpdir, mocked):
+    connection, adapter = mocked
+    path = str(tmpdir.join("app.log"))
+    write(path, b"one\ntwo\n")
+    stop = threading.Event()
+    statuses = iter([503, 200])
+
+    def ingest(request, context):
+        context.status_code = next(statuses)
+        if context.status_code == 200:
+            stop.set()
+            return json.dumps({'status': 'ok', 'ingested': 2})
+        return json.dumps({'errorMessage': "Service unavailable"})
+    adapter.register_uri("POST", "https://mockserverlocal:9543/api/v1/events/ingest/1", text=ingest)
+
+    agent = TailAgent(connection, [path])
+    agent.run(interval=0, stop=stop, retry_interval=0)
+    assert shipped(adapter) == ["one", "two"] * 2
+    assert agent.ingested == 2
+
+
+def test_agent_skips_a_rejected_batch(tmpdir, mocked):
+    connection, adapter = mocked
+    path, checkpoint = str(tmpdir.join("app.log")), str(tmpdir.join("tail.json"))
+    write(path, b"malformed\n")
+    statuses = iter([400, 200])
+
+    def ingest(request, context):
+        context.status_code = next(statuses)
+        if context.status_code == 400:
+            return json.dumps({'errorMessage': "Invalid field"})
+        return json.dumps({'status': 'ok', 'ingested': len(request.json()['events'])})
+    adapter.register_uri("POST", "https://mockserverlocal:9543/api/v1/events/ingest/1", text=ingest)
+
+    rejected = []
+    agent = TailAgent(connection, [path], checkpoint=checkpoint, on_rejected=lambda events, e: rejected.append(events))
+    assert agent.poll() == 0
+    assert [[e['text'] for e in events] for events in rejected] == [["malformed"]]
+    assert agent.rejected == 1
+
+    write(path, b"next\n")
+    assert agent.poll() == 1
+    assert shipped(adapter) == ["malformed", "next"]
+    assert TailAgent(connection, [path], checkpoint=checkpoint).poll() == 0  # The checkpoint moved past both
+
+
+def test_cli_arguments():
+    args = parser().parse_args(["--server", "li", "--field", "appname=x", "--multiline", "^\\d", "a.log", "b.log"])
+    assert args.paths == ["a.log", "b.log"]
+    assert dict(args.field) == {'appname': 'x'}
+    with pytest.raises(SystemExit):
+        parser().parse_args(["--server", "li", "--field", "novalue", "a.log"])